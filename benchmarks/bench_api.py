@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# -------------------------------------------------
+# API LATENCY / THROUGHPUT BENCHMARK
+# -------------------------------------------------
+# p50/p95/p99 and requests/sec per concurrency level for /predict and
+# /predict/batch, in-process (httpx ASGI) and over uvicorn, plus the bare
+# model call and a per-stage split of one /predict. Payloads are random so
+# the score cache never short-circuits; server settings come from the env.
+#   python benchmarks/bench_api.py --json run.json
+#   python benchmarks/bench_api.py --baseline main.json --threshold 0.15   # exit 1 on regression
+
+PERCENTILES = (50, 95, 99)
+# metric -> direction that counts as a regression
+GATED_METRICS = {"p50_ms": "up", "p95_ms": "up", "p99_ms": "up", "rps": "down", "us": "up"}
+
+
+def random_payloads(n, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.uniform(1, 25000, n).round(2)
+    hours = rng.integers(0, 24, n)
+    extra = rng.standard_normal((n, 5)).round(4)
+    return [
+        {"amount": float(a), "hour": int(h), **{f"feature_{i + 3}": float(v) for i, v in enumerate(row)}}
+        for a, h, row in zip(amounts, hours, extra)
+    ]
+
+
+def summarize(latencies, elapsed, errors):
+    lat = np.asarray(latencies) * 1000
+    out = {f"p{p}_ms": round(float(np.percentile(lat, p)), 3) for p in PERCENTILES} if len(lat) else {}
+    out.update({
+        "mean_ms": round(float(lat.mean()), 3) if len(lat) else None,
+        "rps": round(len(lat) / elapsed, 1) if elapsed else None,
+        "requests": len(lat),
+        "errors": errors,
+    })
+    return out
+
+
+# -------------------------------------------------
+# LOAD GENERATOR
+# -------------------------------------------------
+async def drive(client, path, bodies, concurrency, n_requests):
+    # bodies: shared iterator, so later levels never replay (cached) payloads
+    latencies, errors = [], 0
+    sent = 0
+
+    async def worker():
+        nonlocal sent, errors
+        while sent < n_requests:
+            body = next(bodies)
+            sent += 1
+            started = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run_target(client, args):
+    levels = len(args.concurrency)
+    singles = random_payloads(args.warmup + args.requests * levels, seed=1)
+    batches = [
+        {"transactions": random_payloads(args.batch_rows, seed=100 + i)}
+        for i in range(16)
+    ]
+    paths = {
+        "single": ("/predict", iter(singles)),
+        "batch": ("/predict/batch", itertools.cycle(batches)),
+    }
+
+    results = {}
+    for name in args.paths:
+        if name not in paths:
+            continue
+        path, bodies = paths[name]
+        await drive(client, path, bodies, 4, args.warmup)
+        results[name] = {}
+        for c in args.concurrency:
+            n = args.requests if name == "single" else max(args.requests // 10, c)
+            results[name][f"c{c}"] = stats = await drive(client, path, bodies, c, n)
+            print(f"  {name:<6} c={c:<4} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                  f"p99 {stats['p99_ms']:8.2f} ms  {stats['rps']:9.1f} req/s  errors {stats['errors']}",
+                  file=sys.stderr)
+    return results
+
+
+def bench_asgi(args):
+    import httpx
+    from inference_api.main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async with app.router.lifespan_context(app):
+                # the model loads in the background after startup
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.05)
+                return await run_target(client, args)
+
+    print("🧪 In-process ASGI", file=sys.stderr)
+    return asyncio.run(run())
+
+
+def bench_uvicorn(args):
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "inference_api.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+         "--workers", str(args.uvicorn_workers)],
+        cwd=ROOT_DIR, env=dict(os.environ, PYTHONWARNINGS="ignore"),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(base_url + "/ready", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("uvicorn did not become ready")
+            time.sleep(0.2)
+
+        async def run():
+            limits = httpx.Limits(max_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+                return await run_target(client, args)
+
+        print(f"🌐 uvicorn ({args.uvicorn_workers} worker(s)) on {base_url}", file=sys.stderr)
+        return asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+# -------------------------------------------------
+# RAW MODEL + STAGE BREAKDOWN (IN-PROCESS)
+# -------------------------------------------------
+def time_calls(fn, items, repeat):
+    # per-call latency in microseconds
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        item = items[i % len(items)]
+        started = time.perf_counter()
+        fn(item)
+        samples[i] = time.perf_counter() - started
+    samples *= 1e6
+    return {
+        "us": round(float(np.median(samples)), 2),
+        **{f"p{p}_us": round(float(np.percentile(samples, p)), 2) for p in PERCENTILES},
+    }
+
+
+def bench_in_process(args):
+    from inference_api.registry import ModelRegistry
+    from inference_api.schemas import FraudResponse, TransactionInput
+    from inference_api.scoring import build_matrix, features_from_input, score_matrix
+
+    registry = ModelRegistry()
+    loaded = registry.load(registry.active_version(), engine=args.engine)
+    scorer, policy = loaded.scorer, loaded.policy
+    payloads = random_payloads(1000, seed=2)
+    inputs = [TransactionInput(**p) for p in payloads]
+    matrices = [build_matrix([features_from_input(x)]) for x in inputs]
+    probs = [float(score_matrix(scorer, m, policy)[0]) for m in matrices]
+    batch = build_matrix([features_from_input(x) for x in inputs[:args.batch_rows]])
+
+    def serialize(p):
+        arr = np.array([p])
+        return FraudResponse(
+            fraud=bool(policy.fraud_flags(arr)[0]), probability=round(p, 4),
+            risk_level=str(policy.risk_levels(arr)[0]), model_version=loaded.version,
+        ).model_dump_json()
+
+    n = args.stage_repeat
+    stages = {
+        "validation": time_calls(lambda p: TransactionInput(**p), payloads, n),
+        "feature_assembly": time_calls(lambda x: build_matrix([features_from_input(x)]), inputs, n),
+        "predict_proba": time_calls(lambda m: score_matrix(scorer, m, policy), matrices, n),
+        "serialization": time_calls(serialize, probs, n),
+    }
+    total = sum(s["us"] for s in stages.values())
+    for name, s in stages.items():
+        s["share"] = round(s["us"] / total, 3)
+        print(f"  stage {name:<17} {s['us']:8.1f} µs  ({s['share']:.0%})", file=sys.stderr)
+
+    raw = {
+        "single": time_calls(lambda m: score_matrix(scorer, m), matrices, n),
+        f"batch_{args.batch_rows}": time_calls(lambda m: score_matrix(scorer, m), [batch], max(n // 20, 10)),
+    }
+    for name, s in raw.items():
+        print(f"  raw   {name:<17} {s['us']:8.1f} µs", file=sys.stderr)
+    return {"engine": loaded.engine, "model_version": loaded.version, "stages": stages, "raw": raw}
+
+
+# -------------------------------------------------
+# REGRESSION GATE
+# -------------------------------------------------
+def flatten(tree, prefix=""):
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, name)
+        else:
+            yield name, value
+
+
+def compare(baseline, current, threshold):
+    # Returns regressions: gated metrics worse than baseline by more than threshold
+    base = dict(flatten(baseline.get("results", {})))
+    regressions = []
+    for name, value in flatten(current.get("results", {})):
+        metric = name.rsplit(".", 1)[-1]
+        direction = GATED_METRICS.get(metric)
+        old = base.get(name)
+        if direction is None or not isinstance(old, (int, float)) or not isinstance(value, (int, float)) or not old:
+            continue
+        change = (value - old) / old
+        if (direction == "up" and change > threshold) or (direction == "down" and -change > threshold):
+            regressions.append({"metric": name, "baseline": old, "current": value, "change": round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency / throughput of the inference API")
+    parser.add_argument("--targets", nargs="+", default=["inprocess", "asgi", "uvicorn"],
+                        choices=("inprocess", "asgi", "uvicorn"))
+    parser.add_argument("--paths", nargs="+", default=["single", "batch"], choices=("single", "batch"))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=2000, help="single-row requests per level")
+    parser.add_argument("--batch-rows", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--stage-repeat", type=int, default=5000)
+    parser.add_argument("--engine", default=os.getenv("INFERENCE_ENGINE", "native"))
+    parser.add_argument("--uvicorn-workers", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    if "inprocess" in args.targets:
+        print("🔬 In-process stages / raw model", file=sys.stderr)
+        results["inprocess"] = bench_in_process(args)
+    if "asgi" in args.targets:
+        results["asgi"] = bench_asgi(args)
+    if "uvicorn" in args.targets:
+        results["uvicorn"] = bench_uvicorn(args)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"❌ {r['metric']}: {r['baseline']} -> {r['current']} ({r['change']:+.0%})", file=sys.stderr)
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"✅ No metric regressed by more than {args.threshold:.0%}", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(exit_code)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+if __name__ == "__main__":
+    main()
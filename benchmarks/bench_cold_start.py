@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# -------------------------------------------------
+# COLD START BENCHMARK
+# -------------------------------------------------
+# A fresh uvicorn per run, polled from spawn: live (/health), ready
+# (/ready) and the first /predict, plus the server's own timings and the
+# import time / heavy packages of inference_api.main in a clean interpreter.
+#   python benchmarks/bench_cold_start.py --runs 5 [--json out.json]
+
+POLL_INTERVAL = 0.005
+PAYLOAD = {"amount": 250.0, "hour": 3}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cold_start(timeout):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "inference_api.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT_DIR, env=dict(os.environ, PYTHONWARNINGS="ignore"),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    live = ready = None
+    try:
+        with httpx.Client(base_url=base_url, timeout=5) as client:
+            while ready is None:
+                if time.perf_counter() - started > timeout or server.poll() is not None:
+                    raise RuntimeError("server did not become ready")
+                try:
+                    if live is None and client.get("/health").status_code == 200:
+                        live = time.perf_counter() - started
+                    if live is not None:
+                        response = client.get("/ready")
+                        if response.status_code == 200:
+                            ready = time.perf_counter() - started
+                            reported = response.json()
+                except httpx.TransportError:
+                    pass
+                time.sleep(POLL_INTERVAL)
+
+            t = time.perf_counter()
+            assert client.post("/predict", json=PAYLOAD).status_code == 200
+            first = time.perf_counter() - t
+            t = time.perf_counter()
+            client.post("/predict", json=PAYLOAD)
+            second = time.perf_counter() - t
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    return {
+        "live_ms": round(live * 1000, 1),
+        "ready_ms": round(ready * 1000, 1),
+        "first_predict_ms": round(first * 1000, 2),
+        "second_predict_ms": round(second * 1000, 2),
+        "server_import_ms": round(reported["import_seconds"] * 1000, 1),
+        "server_load_ms": round(reported["load_seconds"] * 1000, 1),
+        "server_ready_ms": round(reported["ready_seconds"] * 1000, 1),
+    }
+
+
+IMPORT_PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import inference_api.main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_ms": round(elapsed * 1000, 1),
+    "heavy_modules": [m for m in ("sklearn", "joblib", "scipy", "sqlalchemy", "pandas") if m in sys.modules],
+}))
+"""
+
+
+def import_profile():
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR, PYTHONWARNINGS="ignore")
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start of the API server: time to live, time to ready, first request")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for /ready")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    imports = import_profile()
+    print(f"📦 import inference_api.main: {imports['import_ms']} ms, heavy modules: "
+          f"{', '.join(imports['heavy_modules']) or 'none'}", file=sys.stderr)
+
+    runs = []
+    for i in range(args.runs):
+        runs.append(cold_start(args.timeout))
+        r = runs[-1]
+        print(f"  run {i + 1}: live {r['live_ms']:7.1f} ms  ready {r['ready_ms']:7.1f} ms  "
+              f"first /predict {r['first_predict_ms']:6.2f} ms  second {r['second_predict_ms']:6.2f} ms",
+              file=sys.stderr)
+
+    results = {
+        "engine": os.getenv("INFERENCE_ENGINE", "native"),
+        "runs": args.runs,
+        "import": imports,
+        "median": {k: round(float(np.median([r[k] for r in runs])), 2) for k in runs[0]},
+        "all": runs,
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
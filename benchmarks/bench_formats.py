@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# -------------------------------------------------
+# REQUEST FORMAT BENCHMARK
+# -------------------------------------------------
+# The same matrix through the in-process app as JSON records, JSON columns,
+# raw float32 (JSON or binary response) and .npy, in us/row next to the bare
+# model call. Server settings come from the environment.
+#   python benchmarks/bench_formats.py --rows 100 1000 10000 [--json out.json]
+
+RAW = "application/octet-stream"
+NPY = "application/x-npy"
+
+
+def random_matrix(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(1, 25000, n).round(2),
+        rng.integers(0, 24, n),
+        rng.standard_normal((n, 5)).round(4),
+    ]).astype(np.float32)
+
+
+def encode_formats(X, names):
+    # format -> (path, body bytes, request headers)
+    columns = X.astype(np.float64).T.tolist()
+    npy = io.BytesIO()
+    np.save(npy, X)
+    json_headers = {"Content-Type": "application/json"}
+    return {
+        "json-records": ("/predict/batch", json.dumps({
+            "transactions": [dict(zip(names, row)) for row in X.astype(np.float64).tolist()]
+        }).encode(), json_headers),
+        "json-columns": ("/predict/batch", json.dumps({"columns": dict(zip(names, columns))}).encode(), json_headers),
+        "f32-json": ("/predict/matrix", X.tobytes(), {"Content-Type": RAW}),
+        "f32-binary": ("/predict/matrix", X.tobytes(), {"Content-Type": RAW, "Accept": RAW}),
+        "npy-binary": ("/predict/matrix", npy.getvalue(), {"Content-Type": NPY, "Accept": RAW}),
+    }
+
+
+async def time_format(client, path, body, headers, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.post(path, content=body, headers=headers)
+        samples.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row cost of each scoring request format, in-process")
+    parser.add_argument("--rows", nargs="+", type=int, default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    import httpx
+    from inference_api.main import app, _current_model
+    from inference_api.scoring import FEATURE_NAMES, score_matrix
+
+    async def run():
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            async with app.router.lifespan_context(app):
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.05)
+                current = _current_model()
+                for n in args.rows:
+                    X = random_matrix(n, seed=n)
+                    repeat = max(3, min(args.repeat, args.repeat * 1000 // n))
+                    model = []
+                    for _ in range(repeat):
+                        started = time.perf_counter()
+                        score_matrix(current.scorer, X, current.policy)
+                        model.append(time.perf_counter() - started)
+                    row = {"model": {"us_per_row": round(float(np.median(model)) / n * 1e6, 3)}}
+                    for name, (path, body, headers) in encode_formats(X, FEATURE_NAMES).items():
+                        await client.post(path, content=body, headers=headers)  # warm-up
+                        seconds = await time_format(client, path, body, headers, repeat)
+                        row[name] = {"us_per_row": round(seconds / n * 1e6, 3), "request_bytes": len(body)}
+                    results[n] = row
+                    print(f"  rows={n:<6} " + "  ".join(
+                        f"{name} {r['us_per_row']:8.2f}" for name, r in row.items()
+                    ) + "  (us/row)", file=sys.stderr)
+        return results
+
+    results = asyncio.run(run())
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# -------------------------------------------------
+# MODEL LOAD BENCHMARK
+# -------------------------------------------------
+# N live worker processes per mode, like uvicorn --workers, so shared pages
+# show up in PSS.
+#   python benchmarks/bench_model_load.py --workers 4 [--json out.json]
+
+WORKER = r"""
+import json, sys, time
+started = time.perf_counter()
+import numpy as np
+from inference_api.model_loader import MODEL_PATH, load_model
+
+mode = sys.argv[1]
+if mode == "pickle":
+    # previous serving path: unpickle the estimator, compile it in-process
+    import joblib
+    from inference_api.forest import compile_forest
+    scorer = compile_forest(joblib.load(MODEL_PATH))
+else:
+    scorer = load_model(MODEL_PATH, engine="native").scorer
+scorer.predict_proba(np.zeros((1, scorer.n_features_in_)))
+ready = time.perf_counter() - started
+print(json.dumps({"time_to_first_prediction_ms": round(ready * 1000, 1),
+                  "sklearn_imported": "sklearn" in sys.modules}), flush=True)
+
+sys.stdin.readline()  # wait until every worker is up
+
+def memory_kb():
+    fields = {}
+    for name in ("/proc/self/status", "/proc/self/smaps_rollup"):
+        try:
+            with open(name) as f:
+                for line in f:
+                    key, _, rest = line.partition(":")
+                    if key in ("VmRSS", "RssAnon", "RssFile", "Pss"):
+                        fields[key] = int(rest.split()[0])
+        except OSError:
+            pass
+    return fields
+
+print(json.dumps(memory_kb()), flush=True)
+"""
+
+
+def run_mode(mode, workers):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR, PYTHONWARNINGS="ignore")
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER, mode],
+            cwd=ROOT_DIR, env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(workers)
+    ]
+    timings = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.stdin.write("\n")
+        p.stdin.flush()
+    memory = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.wait()
+
+    def mean(rows, key):
+        values = [r[key] for r in rows if key in r]
+        return round(sum(values) / len(values), 1) if values else None
+
+    return {
+        "workers": workers,
+        "time_to_first_prediction_ms": mean(timings, "time_to_first_prediction_ms"),
+        "sklearn_imported": any(t["sklearn_imported"] for t in timings),
+        "rss_kb_per_worker": mean(memory, "VmRSS"),
+        "rss_anon_kb_per_worker": mean(memory, "RssAnon"),
+        "pss_kb_per_worker": mean(memory, "Pss"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory and time-to-first-prediction: pickle vs mmap .forest")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = {mode: run_mode(mode, args.workers) for mode in ("pickle", "mmap")}
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# -------------------------------------------------
+# TRAINING PIPELINE MEMORY BENCHMARK
+# -------------------------------------------------
+# Each path runs in its own process and reports its own VmHWM (ru_maxrss
+# would carry the parent's peak across fork/exec). Without --csv a synthetic
+# creditcard_2023.csv-shaped file is generated first.
+#   python benchmarks/bench_training_pipeline.py --rows 1000000 [--csv data.csv] [--json out.json]
+
+WORKER = r"""
+import json, sys, time
+started = time.perf_counter()
+import pandas as pd
+from feature_engineering import load_training_data
+
+mode, path = sys.argv[1], sys.argv[2]
+if mode == "one_shot":
+    # previous path: whole CSV, full-frame copy, then column selection
+    df = pd.read_csv(path)
+    df = df.copy()
+    df["hour"] = (df["Time"] // 3600) % 24 if "Time" in df.columns else 0
+    numeric_cols = [c for c in df.select_dtypes(include=["int64", "float64"]).columns if c != "Class"]
+    df = df[numeric_cols[:7] + ["Class"]]
+    df = df.rename(columns={"Class": "is_fraud"})
+    X = df.drop("is_fraud", axis=1)
+    y = df["is_fraud"]
+    matrix_mb = X.memory_usage(index=False).sum() / 1e6
+    checksum = float(X.to_numpy(dtype="float64").sum())
+else:
+    X, y, _ = load_training_data(path, chunksize=int(sys.argv[3]))
+    matrix_mb = X.nbytes / 1e6
+    checksum = float(X.sum(dtype="float64"))
+
+with open("/proc/self/status") as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+
+print(json.dumps({
+    "wall_s": round(time.perf_counter() - started, 2),
+    "peak_rss_mb": round(peak_kb / 1024, 1),
+    "rows": int(len(y)),
+    "matrix_mb": round(matrix_mb, 1),
+    "checksum": checksum,
+}))
+"""
+
+
+def make_csv(path, rows, block=200_000):
+    rng = np.random.default_rng(0)
+    header = ",".join(["id"] + [f"V{i}" for i in range(1, 29)] + ["Amount", "Class"])
+    with open(path, "w") as f:
+        f.write(header + "\n")
+        for start in range(0, rows, block):
+            n = min(block, rows - start)
+            ids = np.arange(start, start + n)
+            v = rng.standard_normal((n, 28))
+            amount = rng.uniform(50, 25000, n)
+            cls = rng.integers(0, 2, n)
+            cols = [ids.astype(str)] + [np.char.mod("%.15f", v[:, i]) for i in range(28)] \
+                + [np.char.mod("%.2f", amount), cls.astype(str)]
+            f.write("\n".join(",".join(r) for r in zip(*cols)) + "\n")
+
+
+def run_mode(mode, path, chunksize):
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT_DIR, "training_service"))
+    out = subprocess.run(
+        [sys.executable, "-c", WORKER, mode, path, str(chunksize)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS and wall time of the training data pipeline: one-shot vs chunked")
+    parser.add_argument("--csv", help="existing CSV to load (default: generate one)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if path is None:
+            path = os.path.join(tmp, "synthetic.csv")
+            make_csv(path, args.rows)
+
+        results = {
+            "csv_mb": round(os.path.getsize(path) / 1e6, 1),
+            "one_shot": run_mode("one_shot", path, args.chunksize),
+            "chunked": run_mode("chunked", path, args.chunksize),
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
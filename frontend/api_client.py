@@ -0,0 +1,152 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --------------------------------------------------
+# FRAUD API CLIENT (SHARED BY EVERY STREAMLIT SESSION)
+# --------------------------------------------------
+# One keep-alive requests.Session with a connection pool sized for the bulk
+# workers, so reruns and chunk uploads reuse TCP/TLS connections. Transient
+# failures are retried with exponential backoff, honouring Retry-After:
+# GETs on connection errors and 502/503/504; scoring POSTs only when the
+# request cannot have been scored (connection errors, 429 and 503, which
+# the API returns from admission control / model loading before scoring),
+# since a scored request writes audit rows and velocity history. Health and
+# decision cutoffs are cached for a few seconds instead of being fetched on
+# every rerun.
+
+API_BASE_URL = os.getenv("FRAUD_API_URL", "https://fraud-detection-fastapi-ouqr.onrender.com")
+INPUT_FIELDS = (
+    "amount", "hour", "feature_3", "feature_4", "feature_5", "feature_6", "feature_7",
+    "card_id", "timestamp",
+)
+RETRY_STATUSES = (429, 502, 503, 504)
+POST_RETRY_STATUSES = (429, 503)
+
+
+class ScoringRetry(Retry):
+    # urllib3 retries connection errors for any method; status retries for
+    # POST are limited to responses sent before scoring
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method == "POST":
+            return status_code in POST_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class FraudApiClient:
+    def __init__(self, base_url=API_BASE_URL, timeout=10.0, retries=3, backoff=0.5,
+                 pool_size=8, cache_ttl=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.pool_size = pool_size
+
+        retry = ScoringRetry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),  # read errors / timeouts: GET only
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._cache = {}  # name -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    # ---------------- cached lookups ----------------
+    def _cached(self, name, fetch):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(name)
+            if hit is not None and hit[0] > now:
+                return hit[1]
+        value = fetch()
+        with self._lock:
+            self._cache[name] = (now + self.cache_ttl, value)
+        return value
+
+    def health(self):
+        # "ok" | "unhealthy" | "down"
+        def fetch():
+            try:
+                response = self.session.get(f"{self.base_url}/health", timeout=3)
+                return "ok" if response.status_code == 200 else "unhealthy"
+            except requests.RequestException:
+                return "down"
+        return self._cached("health", fetch)
+
+    def decision(self, default=None):
+        # the active model's fraud threshold and risk cutoffs
+        def fetch():
+            try:
+                decision = self.session.get(f"{self.base_url}/model/decision", timeout=3).json()
+                decision["risk_cutoffs"]["HIGH"]
+                return decision
+            except Exception:
+                return default
+        return self._cached("decision", fetch)
+
+    # ---------------- scoring ----------------
+    def predict(self, payload, explain=False):
+        # raw Response, the caller decides how to render errors
+        params = {"explain": "true"} if explain else None
+        return self.session.post(f"{self.base_url}/predict", params=params, json=payload, timeout=self.timeout)
+
+    def score_chunk(self, records):
+        response = self.session.post(
+            f"{self.base_url}/predict/batch", json={"transactions": records}, timeout=self.timeout * 3
+        )
+        response.raise_for_status()
+        return response.json()["results"]
+
+    def score_records(self, records, chunk_rows=500, workers=4, progress=None):
+        # Scores records through /predict/batch in chunks, `workers` chunks in
+        # flight. Returns one result dict per record, in input order
+        # ({"fraud", "probability", "risk_level", "model_version"} or
+        # {"error"}); a chunk that still fails after retries marks its rows.
+        # progress(done_rows, total_rows) runs in the calling thread.
+        total = len(records)
+        results = [None] * total
+        starts = range(0, total, chunk_rows)
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, self.pool_size))) as pool:
+            futures = {pool.submit(self.score_chunk, records[s:s + chunk_rows]): s for s in starts}
+            for future in as_completed(futures):
+                start = futures[future]
+                size = min(chunk_rows, total - start)
+                try:
+                    for item in future.result():
+                        results[start + item["index"]] = item["result"] or {"error": item["error"]}
+                except Exception as e:
+                    for i in range(start, start + size):
+                        results[i] = {"error": f"Request failed: {e}"}
+                done += size
+                if progress is not None:
+                    progress(done, total)
+        return results
+
+
+def clean_records(rows):
+    # API fields only; missing / NaN cells are left out so optional features
+    # take their defaults and a missing amount / hour is a per-row error
+    records = []
+    for row in rows:
+        record = {}
+        for name in INPUT_FIELDS:
+            value = row.get(name)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            value = value.item() if hasattr(value, "item") else value
+            record[name] = str(value) if name == "card_id" else value
+        records.append(record)
+    return records
@@ -145,17 +145,22 @@
 #     "and compliance policies."
 # )
 import streamlit as st
+import pandas as pd
 import requests
 from datetime import datetime
 import uuid
 import time
 
+from api_client import FraudApiClient, clean_records
+
 # --------------------------------------------------
 # CONFIG
 # --------------------------------------------------
-API_URL = "https://fraud-detection-fastapi-ouqr.onrender.com/predict"
-HEALTH_URL = "https://fraud-detection-fastapi-ouqr.onrender.com/health"
-FRAUD_THRESHOLD = 50  # %
+TOP_SIGNALS = 4
+BULK_CHUNK_ROWS = 500     # rows per /predict/batch call
+BULK_WORKERS = 4          # chunks in flight
+# used when the API cannot tell us the active model's cutoffs
+DEFAULT_DECISION = {"fraud_threshold": 0.5, "risk_cutoffs": {"MEDIUM": 0.3, "HIGH": 0.7}}
 
 # --------------------------------------------------
 # PAGE CONFIG
@@ -165,6 +170,15 @@ st.set_page_config(
     layout="centered"
 )
 
+
+@st.cache_resource
+def get_client():
+    # one pooled client per server process, reused across reruns and sessions
+    return FraudApiClient()
+
+
+client = get_client()
+
 # --------------------------------------------------
 # HEADER
 # --------------------------------------------------
@@ -175,15 +189,20 @@ st.caption("Real-time, explainable transaction risk assessment powered by Machin
 # HEALTH CHECK
 # --------------------------------------------------
 with st.spinner("Checking system status..."):
-    try:
-        health = requests.get(HEALTH_URL, timeout=3)
-        if health.status_code == 200:
-            st.success("🟢 Fraud Detection API Operational")
-        else:
-            st.warning("🟡 API reachable but unhealthy")
-    except Exception:
+    health = client.health()
+    if health == "ok":
+        st.success("🟢 Fraud Detection API Operational")
+    elif health == "unhealthy":
+        st.warning("🟡 API reachable but unhealthy")
+    else:
         st.error("🔴 Backend service unavailable")
 
+decision = client.decision(default=DEFAULT_DECISION)
+
+FRAUD_THRESHOLD = round(decision["fraud_threshold"] * 100, 2)  # %
+MEDIUM_CUTOFF = round(decision["risk_cutoffs"]["MEDIUM"] * 100, 2)  # %
+HIGH_CUTOFF = round(decision["risk_cutoffs"]["HIGH"] * 100, 2)  # %
+
 st.divider()
 
 # --------------------------------------------------
@@ -222,7 +241,7 @@ if st.button("🔍 Analyze Transaction", disabled=(amount <= 0)):
 
     try:
         start_time = time.time()
-        response = requests.post(API_URL, json=payload, timeout=10)
+        response = client.predict(payload, explain=True)
         latency_ms = int((time.time() - start_time) * 1000)
 
         if response.status_code == 200:
@@ -237,16 +256,14 @@ if st.button("🔍 Analyze Transaction", disabled=(amount <= 0)):
             trace_id = f"FRD-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{str(uuid.uuid4())[:4].upper()}"
 
             # --------------------------------------------------
-            # RISK BAND LOGIC
+            # RISK BAND LOGIC (SAME CUTOFFS AS THE API)
             # --------------------------------------------------
-            if fraud_pct <= 10:
-                risk_band = "0–10% (Very Low)"
-            elif fraud_pct <= 30:
-                risk_band = "10–30% (Low)"
-            elif fraud_pct <= 60:
-                risk_band = "30–60% (Medium)"
+            if risk == "LOW":
+                risk_band = f"0–{MEDIUM_CUTOFF}% (Low)"
+            elif risk == "MEDIUM":
+                risk_band = f"{MEDIUM_CUTOFF}–{HIGH_CUTOFF}% (Medium)"
             else:
-                risk_band = "60–100% (High)"
+                risk_band = f"{HIGH_CUTOFF}–100% (High)"
 
             # --------------------------------------------------
             # DECISION + POLICY
@@ -302,15 +319,18 @@ if st.button("🔍 Analyze Transaction", disabled=(amount <= 0)):
             # --------------------------------------------------
             st.subheader("Key Risk Signals")
 
-            if amount >= 100000:
-                st.write(f"⚠ High transaction amount detected (₹{amount})")
-            else:
-                st.write(f"✔ Amount within expected behavioral range (₹{amount})")
-
-            if hour < 6 or hour > 22:
-                st.write(f"⚠ Transaction occurred outside normal hours ({hour}:00)")
+            # per-feature contributions from the model (positive = towards fraud)
+            explanation = result.get("explanation")
+            if explanation:
+                drivers = sorted(explanation["contributions"].items(), key=lambda kv: abs(kv[1]), reverse=True)
+                for name, contribution in drivers[:TOP_SIGNALS]:
+                    if contribution > 0:
+                        st.write(f"⚠ {name} raises fraud risk (+{contribution * 100:.2f} pts)")
+                    else:
+                        st.write(f"✔ {name} lowers fraud risk ({contribution * 100:.2f} pts)")
+                st.caption(f"Baseline risk {explanation['base_value'] * 100:.2f}% before this transaction's features.")
             else:
-                st.write(f"✔ Transaction timing consistent with user history ({hour}:00)")
+                st.caption("Explanations are not available for the active model.")
 
             # --------------------------------------------------
             # RECOMMENDED ACTION
@@ -344,6 +364,68 @@ if st.button("🔍 Analyze Transaction", disabled=(amount <= 0)):
         st.error("Unexpected error occurred")
         st.code(str(e))
 
+# --------------------------------------------------
+# BULK TRIAGE (CSV / JSONL UPLOAD)
+# --------------------------------------------------
+st.divider()
+st.subheader("Bulk Triage")
+st.caption("Upload flagged transactions (CSV or JSON Lines with at least `amount` and `hour` columns) "
+           "to score them all in one pass.")
+
+upload = st.file_uploader("Transactions file", type=["csv", "jsonl", "ndjson"])
+
+if upload is not None:
+    try:
+        if upload.name.endswith(".csv"):
+            frame = pd.read_csv(upload)
+        else:
+            frame = pd.read_json(upload, lines=True)
+    except Exception as e:
+        frame = None
+        st.error("Could not read the uploaded file")
+        st.code(str(e))
+
+    if frame is not None:
+        missing = {"amount", "hour"} - set(frame.columns)
+        if missing:
+            st.error(f"Missing required columns: {', '.join(sorted(missing))}")
+        elif st.button(f"🔍 Score {len(frame):,} Transactions", disabled=frame.empty):
+            progress_bar = st.progress(0, text="Scoring...")
+
+            def show_progress(done, total):
+                progress_bar.progress(done / total, text=f"Scored {done:,} / {total:,} transactions")
+
+            start_time = time.time()
+            results = client.score_records(
+                clean_records(frame.to_dict("records")),
+                chunk_rows=BULK_CHUNK_ROWS,
+                workers=BULK_WORKERS,
+                progress=show_progress
+            )
+            elapsed = time.time() - start_time
+
+            scored = frame.copy()
+            for column in ("fraud", "probability", "risk_level", "error"):
+                scored[column] = [r.get(column) for r in results]
+            scored = scored.sort_values("probability", ascending=False, na_position="last")
+
+            counts = scored["risk_level"].value_counts()
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("HIGH", int(counts.get("HIGH", 0)))
+            col2.metric("MEDIUM", int(counts.get("MEDIUM", 0)))
+            col3.metric("LOW", int(counts.get("LOW", 0)))
+            col4.metric("Errors", int(scored["error"].notna().sum()))
+            st.caption(f"{len(scored):,} transactions scored in {elapsed:.1f} s "
+                       f"({len(scored) / max(elapsed, 1e-9):,.0f} rows/s)")
+
+            st.dataframe(scored, use_container_width=True, hide_index=True)
+            st.download_button(
+                "⬇ Download Results (CSV)",
+                scored.to_csv(index=False),
+                file_name=f"scored-{upload.name.rsplit('.', 1)[0]}.csv",
+                mime="text/csv"
+            )
+
 # --------------------------------------------------
 # COMPLIANCE DISCLAIMER
 # --------------------------------------------------
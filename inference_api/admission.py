@@ -0,0 +1,118 @@
+import asyncio
+from collections import deque
+
+# -------------------------------------------------
+# ADMISSION CONTROL (BOUNDED IN-FLIGHT WORK, FAST 503s)
+# -------------------------------------------------
+# At most max_in_flight requests hold a slot (i.e. are in or queued for
+# the model threadpool) at once. The rest wait in one FIFO queue per lane;
+# a freed slot goes to the highest lane with a waiter. A request is shed
+# (the caller answers 503 + Retry-After) when the queues are full or it
+# waited longer than max_queue_wait, so a burst costs a few fast rejections
+# instead of unbounded queueing for everyone. A full queue first sheds the
+# newest waiter of a lower lane to make room.
+#
+# The "high" lane is never shed: it is admitted at once, over the limit
+# if need be, and still counts toward in-flight.
+#
+# Runs on the event loop only (no locks): acquire/release must be called
+# from coroutines on the same loop.
+
+LANES = ("high", "normal", "bulk")  # highest priority first
+
+
+class Overloaded(Exception):
+    def __init__(self, lane, reason):
+        super().__init__(f"{lane} request shed: {reason}")
+        self.lane = lane
+        self.reason = reason  # "queue_full", "timeout" or "preempted"
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=16, max_queue=64, max_queue_wait=0.05, retry_after=1):
+        self.max_in_flight = int(max_in_flight)
+        self.max_queue = int(max_queue)
+        self.max_queue_wait = float(max_queue_wait)
+        self.retry_after = int(retry_after)
+
+        self.in_flight = 0
+        self._queues = {lane: deque() for lane in LANES}
+        self._queued = 0
+        self.admitted = {lane: 0 for lane in LANES}
+        self.shed = {(lane, reason): 0 for lane in LANES for reason in ("queue_full", "timeout", "preempted")}
+
+    async def acquire(self, lane="normal"):
+        # Returns once a slot is held; raises Overloaded when shed
+        if lane == "high" or (self.in_flight < self.max_in_flight and not self._queued):
+            self.in_flight += 1
+            self.admitted[lane] += 1
+            return
+
+        if self._queued >= self.max_queue and not self._preempt(lane):
+            self.shed[(lane, "queue_full")] += 1
+            raise Overloaded(lane, "queue_full")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._queues[lane].append(waiter)
+        self._queued += 1
+        timer = loop.call_later(self.max_queue_wait, self._expire, lane, waiter)
+        try:
+            await waiter  # result: slot handed over by release(); exception: shed
+        except asyncio.CancelledError:
+            # client went away; give back a slot that was already handed over
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release()
+            elif waiter in self._queues[lane]:
+                self._queues[lane].remove(waiter)
+                self._queued -= 1
+            raise
+        finally:
+            timer.cancel()
+
+    def release(self):
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue:
+                waiter = queue.popleft()
+                self._queued -= 1
+                if not waiter.done():
+                    waiter.set_result(None)  # the slot moves on, in_flight unchanged
+                    self.admitted[lane] += 1
+                    return
+        self.in_flight -= 1
+
+    def _expire(self, lane, waiter):
+        if waiter.done():
+            return
+        self._queues[lane].remove(waiter)
+        self._queued -= 1
+        self.shed[(lane, "timeout")] += 1
+        waiter.set_exception(Overloaded(lane, "timeout"))
+
+    def _preempt(self, lane):
+        # Sheds the newest waiter of the lowest lane below `lane`, if any
+        for lower in reversed(LANES[LANES.index(lane) + 1:]):
+            queue = self._queues[lower]
+            while queue:
+                waiter = queue.pop()
+                self._queued -= 1
+                if not waiter.done():
+                    self.shed[(lower, "preempted")] += 1
+                    waiter.set_exception(Overloaded(lower, "preempted"))
+                    return True
+        return False
+
+    def queued(self):
+        return {lane: len(queue) for lane, queue in self._queues.items()}
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "max_queue_wait_ms": self.max_queue_wait * 1000,
+            "in_flight": self.in_flight,
+            "queued": self.queued(),
+            "admitted": dict(self.admitted),
+            "shed": {f"{lane}.{reason}": n for (lane, reason), n in self.shed.items() if n},
+        }
@@ -0,0 +1,314 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+from .models import FraudPrediction
+from .rollups import upsert_rollups
+
+# -------------------------------------------------
+# ASYNCHRONOUS PREDICTION AUDIT LOG
+# -------------------------------------------------
+# Request handlers only append to a bounded in-memory buffer. A single
+# background thread turns the buffer into bulk INSERTs, flushing when
+# batch_size rows are waiting or flush_interval has passed since the
+# oldest one arrived.
+#
+# When the buffer is full the overflow policy decides what happens:
+#   drop_newest  reject the incoming rows
+#   drop_oldest  evict the oldest buffered rows
+#   block        wait up to block_timeout (per record() call) for room, then
+#                drop the new rows; never waits on an event loop thread,
+#                where it behaves like drop_newest
+#   spill        append the new rows to a JSONL file (written by a second
+#                background thread, never by the caller), replayed into
+#                the DB once the buffer has drained
+# Failed flushes are spilled (spill policy) or put back at the front of
+# the buffer, so a slow or unavailable database never fails a request.
+#
+# With rollups on, each flush also folds its rows into the per-minute /
+# per-hour rollup tables in the same transaction (see rollups.py), so raw
+# rows and aggregates are never out of step.
+
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block", "spill")
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        session_factory,
+        max_queue=10000,
+        batch_size=500,
+        flush_interval=0.5,
+        policy="drop_oldest",
+        spill_path="audit_spill.jsonl",
+        block_timeout=0.005,
+        retry_interval=1.0,
+        rollups=True,
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {OVERFLOW_POLICIES}")
+
+        self.session_factory = session_factory
+        self.max_queue = int(max_queue)
+        self.batch_size = int(batch_size)
+        self.flush_interval = float(flush_interval)
+        self.policy = policy
+        self.spill_path = spill_path
+        self.block_timeout = float(block_timeout)
+        self.retry_interval = float(retry_interval)
+        self.rollups = rollups
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._spill_queue = deque()
+        self._spill_cond = threading.Condition()
+        self._thread = None
+        self._spill_thread = None
+        self._closing = False
+        self._last_failure = 0.0
+
+        self.counters = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+        }
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        if self.policy == "spill":
+            self._spill_thread = threading.Thread(target=self._run_spill, name="audit-spill", daemon=True)
+            self._spill_thread.start()
+
+    def stop(self, timeout=10.0):
+        # Flush everything still buffered, then stop the worker
+        if self._thread is None:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+        if self._spill_thread is not None:
+            with self._spill_cond:
+                self._spill_cond.notify_all()
+            self._spill_thread.join(timeout)
+            self._spill_thread = None
+
+    # ---------------- request side ----------------
+    def record(self, rows):
+        # rows: list of dicts with amount / probability / fraud / risk_level
+        if self._thread is None:
+            self.start()
+
+        now = datetime.utcnow()
+        for row in rows:
+            row.setdefault("created_at", now)
+
+        overflow = []
+        deadline = time.monotonic() + self.block_timeout
+        may_block = self.policy == "block" and not _on_event_loop()
+        with self._cond:
+            was_empty = not self._buffer
+            for row in rows:
+                if len(self._buffer) < self.max_queue:
+                    self._buffer.append(row)
+                elif self.policy == "drop_oldest":
+                    self._buffer.popleft()
+                    self._buffer.append(row)
+                    self.counters["dropped"] += 1
+                elif may_block and self._cond.wait_for(
+                    lambda: len(self._buffer) < self.max_queue, deadline - time.monotonic()
+                ):
+                    self._buffer.append(row)
+                else:
+                    overflow.append(row)
+
+            self.counters["enqueued"] += len(rows) - len(overflow)
+            if was_empty or len(self._buffer) >= self.batch_size:
+                # first rows start the flush timer; a full batch flushes now
+                self._cond.notify_all()
+
+        if not overflow:
+            return
+        if self.policy == "spill":
+            # file I/O stays off the caller's (event loop) thread
+            with self._spill_cond:
+                self._spill_queue.append(overflow)
+                self._spill_cond.notify()
+        else:
+            self.counters["dropped"] += len(overflow)
+
+    def depth(self):
+        return len(self._buffer)
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "rollups": self.rollups,
+            "queue_depth": len(self._buffer),
+            "max_queue": self.max_queue,
+            "spill_pending": self.policy == "spill" and (bool(self._spill_queue) or self._spill_pending()),
+            **self.counters,
+        }
+
+    # ---------------- worker side ----------------
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                closing = self._closing
+
+            if batch:
+                self._flush(batch)
+            elif closing:
+                return
+            else:
+                self._replay_spill()
+
+    def _next_batch(self):
+        # Called with the lock held; waits for a size or time trigger
+        deadline = None
+        while not self._closing and len(self._buffer) < self.batch_size:
+            if self._buffer:
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            else:
+                self._cond.wait(self.retry_interval)
+                if not self._buffer:
+                    return []
+
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if batch:
+            self._cond.notify_all()  # wake producers blocked on a full buffer
+        return batch
+
+    def _flush(self, batch):
+        if time.monotonic() - self._last_failure < self.retry_interval and not self._closing:
+            # database just failed; give it a moment instead of hammering it
+            time.sleep(self.retry_interval)
+
+        if self._insert(batch):
+            self.counters["written"] += len(batch)
+            return
+
+        if self.policy == "spill" or self._closing:
+            self._overflow(batch)
+            return
+
+        with self._cond:
+            room = self.max_queue - len(self._buffer)
+            self._buffer.extendleft(reversed(batch[:room]))
+        self.counters["dropped"] += max(0, len(batch) - room)
+
+    def _insert(self, batch):
+        session = self.session_factory()
+        try:
+            session.execute(FraudPrediction.__table__.insert(), batch)
+            if self.rollups:
+                upsert_rollups(session, batch)
+            session.commit()
+            self.counters["flushes"] += 1
+            return True
+        except Exception as e:
+            session.rollback()
+            self.counters["failed_flushes"] += 1
+            self._last_failure = time.monotonic()
+            print("⚠️ Audit flush failed:", str(e))
+            return False
+        finally:
+            session.close()
+
+    # ---------------- overflow / spill ----------------
+    def _run_spill(self):
+        while True:
+            with self._spill_cond:
+                self._spill_cond.wait_for(lambda: self._spill_queue or self._closing)
+                if not self._spill_queue:
+                    return
+                rows = []
+                while self._spill_queue:
+                    rows.extend(self._spill_queue.popleft())
+            self._overflow(rows)
+
+    def _overflow(self, rows):
+        if self.policy != "spill":
+            self.counters["dropped"] += len(rows)
+            return
+
+        try:
+            with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({**row, "created_at": row["created_at"].isoformat()}) + "\n")
+            self.counters["spilled"] += len(rows)
+        except OSError as e:
+            print("⚠️ Audit spill failed:", str(e))
+            self.counters["dropped"] += len(rows)
+
+    def _replay_spill(self):
+        replay_path = self.spill_path + ".replay"
+        if self.policy != "spill" or not self._spill_pending():
+            return
+        if time.monotonic() - self._last_failure < self.retry_interval:
+            return
+
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                os.replace(self.spill_path, replay_path)
+
+        pending_path = None
+        with open(replay_path, encoding="utf-8") as f:
+            while True:
+                lines = list(islice(f, self.batch_size))
+                if not lines:
+                    break
+                if not self._insert([self._parse_spilled(line) for line in lines]):
+                    # keep only what is still unwritten, retry later
+                    pending_path = replay_path + ".pending"
+                    with open(pending_path, "w", encoding="utf-8") as out:
+                        out.writelines(lines)
+                        shutil.copyfileobj(f, out)
+                    break
+                self.counters["replayed"] += len(lines)
+
+        if pending_path is not None:
+            os.replace(pending_path, replay_path)
+        else:
+            os.remove(replay_path)
+
+    def _spill_pending(self):
+        return os.path.exists(self.spill_path) or os.path.exists(self.spill_path + ".replay")
+
+    @staticmethod
+    def _parse_spilled(line):
+        row = json.loads(line)
+        row["created_at"] = datetime.fromisoformat(row["created_at"])
+        return row
+
+
+def _on_event_loop():
+    # async handlers call record() on the loop thread, which must not wait
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import numpy as np
+
+from .metrics import Histogram
+
+# -------------------------------------------------
+# DYNAMIC MICRO-BATCHER
+# -------------------------------------------------
+# Concurrent single-row requests are queued and scored together as one
+# matrix. A batch is flushed when it reaches max_batch_size or when the
+# oldest request has waited max_wait_ms. While a flush is running, new
+# requests keep accumulating, so batch size grows with load on its own
+# and an idle service pays at most max_wait_ms extra.
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+QUEUE_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+class MicroBatcher:
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=2.0, max_concurrent_flushes=1):
+        # score_fn: (N, F) float matrix -> one result per row, run off the event loop
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_concurrent_flushes = max(1, int(max_concurrent_flushes))
+
+        self.batch_size = Histogram(
+            "batcher_batch_size", "Rows per flushed batch", BATCH_SIZE_BUCKETS
+        )
+        self.queue_wait = Histogram(
+            "batcher_queue_wait_seconds", "Time a request waited before its batch was scored", QUEUE_WAIT_BUCKETS
+        )
+
+        self._loop = None
+        self._queue = None
+        self._slots = None
+        self._task = None
+        self._flushes = set()
+        self._batch = []  # rows _run has taken off the queue but not flushed yet
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_flushes)
+        self._flushes = set()
+        self._batch = []
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Score whatever _run was collecting or was still queued so no caller
+        # is left hanging
+        pending, self._batch = self._batch, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for i in range(0, len(pending), self.max_batch_size):
+            await self._flush(pending[i:i + self.max_batch_size], hold_slot=False)
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    # ---------------- request side ----------------
+    async def submit(self, row):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._loop is not loop:
+            # first request, or a new event loop (e.g. test clients)
+            self.start()
+
+        future = loop.create_future()
+        self._queue.put_nowait((row, future, time.perf_counter()))
+        return await future
+
+    # ---------------- worker side ----------------
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            self._batch = []
+            task = loop.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch, hold_slot=True):
+        try:
+            now = time.perf_counter()
+            self.batch_size.observe(len(batch))
+            for _, _, enqueued in batch:
+                self.queue_wait.observe(now - enqueued)
+
+            features = np.array([row for row, _, _ in batch], dtype=np.float64)
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    None, self.score_fn, features
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future, _), result in zip(batch, results):
+                # caller may have gone away (client disconnect -> cancelled)
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            if hold_slot:
+                self._slots.release()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
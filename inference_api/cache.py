@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+# -------------------------------------------------
+# SCORE CACHE (BOUNDED LRU + TTL)
+# -------------------------------------------------
+# Retries and double-posts send the exact same feature vector again. The
+# cache maps (model_version, canonical feature tuple) -> probability so a
+# repeat is a dict lookup. Including the version in the key means a model
+# swap can never serve a stale score; clear() additionally frees the old
+# entries right away.
+
+
+def canonical_key(version, row):
+    # float() folds 200 / 200.0 / numpy scalars onto one key; +0.0 folds -0.0
+    return (version,) + tuple(float(v) + 0.0 for v in row)
+
+
+class ScoreCache:
+    def __init__(self, max_entries=100000, ttl_seconds=300.0):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl_seconds)
+        self._entries = OrderedDict()  # key -> (expires_at, probability)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, probability):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, probability)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
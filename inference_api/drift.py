@@ -0,0 +1,240 @@
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+# -------------------------------------------------
+# STREAMING DRIFT MONITORING
+# -------------------------------------------------
+# train.py stores a reference profile with every model version: for each
+# input column and the model score, quantile bin edges from the held-out
+# split and the share of rows in each bin. Serving counts every scored row
+# into those same bins, inside a ring of time buckets covering the window
+# (same layout as the velocity store), so memory is fixed by
+# buckets x columns x bins and an update is a handful of bisects.
+#
+# Counts over the same edges simply add up, so sketches from several
+# workers merge bucket by bucket (aligned on absolute bucket number).
+# PSI and KS are computed from the window counts against the reference
+# shares; KS is evaluated at the bin edges, so it is a lower bound of the
+# exact two-sample statistic.
+
+SCORE_COLUMN = "score"
+DEFAULT_BINS = 10
+DEFAULT_WINDOW_SECONDS = 3600
+DEFAULT_BUCKET_SECONDS = 300
+PSI_EPSILON = 1e-4
+PROFILE_VERSION = 1
+SNAPSHOT_PREFIX = "drift-"
+
+
+def build_profile(X, scores, features, bins=DEFAULT_BINS):
+    # Reference profile for one model: quantile edges + shares per column,
+    # model input columns in order, then the score
+    X = np.asarray(X, dtype=np.float64)
+    columns = []
+    for name, values in zip(list(features) + [SCORE_COLUMN], list(X.T) + [np.asarray(scores, dtype=np.float64)]):
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        columns.append({
+            "name": str(name),
+            "edges": edges.tolist(),
+            "proportions": (counts / max(len(values), 1)).tolist(),
+        })
+    return {"version": PROFILE_VERSION, "rows": int(len(X)), "columns": columns}
+
+
+def psi(expected, actual, eps=PSI_EPSILON):
+    # population stability index of two share vectors
+    expected = np.clip(expected, eps, None)
+    actual = np.clip(actual, eps, None)
+    return float(((actual - expected) * np.log(actual / expected)).sum())
+
+
+def ks(expected, actual):
+    return float(np.abs(np.cumsum(expected) - np.cumsum(actual)).max())
+
+
+class DriftSketch:
+    def __init__(self, profile, window_seconds=DEFAULT_WINDOW_SECONDS, bucket_seconds=DEFAULT_BUCKET_SECONDS,
+                 key=None):
+        self.profile = profile
+        self.key = key  # what the counts belong to (model version); only equal keys merge
+        self.window_seconds = float(window_seconds)
+        self.bucket_seconds = float(bucket_seconds)
+        self.n_buckets = max(1, math.ceil(self.window_seconds / self.bucket_seconds))
+
+        columns = profile["columns"]
+        self.names = [c["name"] for c in columns]
+        self._edges = [list(c["edges"]) for c in columns]
+        self._edge_arrays = [np.asarray(c["edges"], dtype=np.float64) for c in columns]
+        self._reference = [np.asarray(c["proportions"], dtype=np.float64) for c in columns]
+        self.n_bins = max(len(e) + 1 for e in self._edges)
+
+        # (bucket slot, column, bin); a column's bins past its own count stay 0
+        self._counts = np.zeros((self.n_buckets, len(columns), self.n_bins), dtype=np.int64)
+        self._offsets = [c * self.n_bins for c in range(len(columns))]
+        self._flat = memoryview(self._counts.reshape(-1))  # scalar updates without numpy dispatch
+        self._head = None  # newest absolute bucket number
+        self._lock = threading.Lock()
+        self.observations = 0
+
+    @property
+    def n_features(self):
+        return len(self.names) - 1  # last column is the score
+
+    # ---------------- request path ----------------
+    def observe(self, row, score, now=None):
+        # row: the n_features model inputs
+        index = [offset + bisect_right(edges, value) for offset, edges, value in zip(self._offsets, self._edges, row)]
+        index[self.n_features:] = [self._offsets[-1] + bisect_right(self._edges[-1], score)]
+        flat = self._flat
+        with self._lock:
+            base = self._advance(int((now if now is not None else time.time()) // self.bucket_seconds))
+            base *= self._counts[0].size
+            for i in index:
+                flat[base + i] += 1
+            self.observations += 1
+
+    def observe_many(self, X, scores, now=None):
+        X = np.asarray(X, dtype=np.float64)
+        columns = list(X.T[:self.n_features]) + [np.asarray(scores, dtype=np.float64)]
+        counts = np.zeros((len(self.names), self.n_bins), dtype=np.int64)
+        for c, (edges, values) in enumerate(zip(self._edge_arrays, columns)):
+            counts[c] = np.bincount(np.searchsorted(edges, values, side="right"), minlength=self.n_bins)
+        with self._lock:
+            self._counts[self._advance(int((now if now is not None else time.time()) // self.bucket_seconds))] += counts
+            self.observations += len(X)
+
+    def _advance(self, bucket):
+        # moves the ring forward to `bucket`, returns that bucket's ring slot
+        if self._head is None:
+            self._head = bucket
+        elif bucket > self._head:
+            for b in range(self._head + 1, min(bucket, self._head + self.n_buckets) + 1):
+                self._counts[b % self.n_buckets] = 0
+            self._head = bucket
+        elif bucket <= self._head - self.n_buckets:
+            bucket = self._head - self.n_buckets + 1  # older than the window, count as oldest
+        return bucket % self.n_buckets
+
+    # ---------------- merging ----------------
+    def buckets(self, now=None):
+        # {absolute bucket number: counts} for the buckets inside the window
+        now_bucket = int((now if now is not None else time.time()) // self.bucket_seconds)
+        with self._lock:
+            if self._head is None:
+                return {}
+            return {
+                b: self._counts[b % self.n_buckets].copy()
+                for b in range(max(self._head, now_bucket) - self.n_buckets + 1, self._head + 1)
+            }
+
+    # ---------------- drift stats ----------------
+    def window_counts(self, buckets, window_seconds=None, now=None):
+        window = min(window_seconds or self.window_seconds, self.window_seconds)
+        now_bucket = int((now if now is not None else time.time()) // self.bucket_seconds)
+        first = now_bucket - max(1, math.ceil(window / self.bucket_seconds)) + 1
+        total = np.zeros((len(self.names), self.n_bins), dtype=np.int64)
+        for b, counts in buckets.items():
+            if first <= b <= now_bucket:
+                total += counts
+        return total
+
+    def report(self, counts, psi_alert=0.2):
+        rows = int(counts[-1].sum())
+        columns = {}
+        for name, reference, column in zip(self.names, self._reference, counts):
+            n = int(column.sum())
+            if n == 0:
+                columns[name] = {"rows": 0, "psi": None, "ks": None}
+                continue
+            actual = column[:len(reference)] / n
+            columns[name] = {"rows": n, "psi": round(psi(reference, actual), 6), "ks": round(ks(reference, actual), 6)}
+        return {
+            "rows": rows,
+            "psi_alert": psi_alert,
+            "drifted": [name for name, c in columns.items() if c["psi"] is not None and c["psi"] >= psi_alert],
+            "columns": columns,
+        }
+
+    # ---------------- shared snapshots ----------------
+    def save(self, path):
+        with self._lock:
+            head = self._head
+            counts = self._counts.copy()
+        header = json.dumps({
+            "key": self.key,
+            "head": head,
+            "names": self.names,
+            "edges": self._edges,
+            "bucket_seconds": self.bucket_seconds,
+            "saved_at": time.time(),
+        })
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, header=np.array(header), counts=counts)
+        os.replace(tmp_path, path)
+
+    def load_buckets(self, path, now=None):
+        # The window buckets of a snapshot written by a compatible sketch,
+        # or {} when it belongs to another model / settings or is too old
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            counts = data["counts"]
+        now = now if now is not None else time.time()
+        if (header["key"] != self.key or header["head"] is None or header["names"] != self.names
+                or header["edges"] != self._edges or header["bucket_seconds"] != self.bucket_seconds
+                or header["saved_at"] < now - self.window_seconds or counts.shape[1:] != self._counts.shape[1:]):
+            return {}
+        n = len(counts)
+        head = header["head"]
+        first = max(head, int(now // self.bucket_seconds)) - self.n_buckets + 1
+        return {b: counts[b % n] for b in range(max(first, head - n + 1), head + 1)}
+
+    def stats(self):
+        return {
+            "columns": len(self.names),
+            "bins": self.n_bins,
+            "window_seconds": self.window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "memory_bytes": self._counts.nbytes,
+            "observations": self.observations,
+        }
+
+
+def merge_buckets(*bucket_maps):
+    merged = {}
+    for buckets in bucket_maps:
+        for b, counts in buckets.items():
+            if b in merged:
+                merged[b] = merged[b] + counts
+            else:
+                merged[b] = counts
+    return merged
+
+
+def snapshot_path(directory, worker_id):
+    return os.path.join(directory, f"{SNAPSHOT_PREFIX}{worker_id}.npz")
+
+
+def shared_buckets(sketch, directory, exclude=None, now=None):
+    # Buckets from every other worker's snapshot in `directory`, plus how
+    # many snapshots were merged
+    maps = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not (name.startswith(SNAPSHOT_PREFIX) and name.endswith(".npz")) or path == exclude:
+                continue
+            try:
+                buckets = sketch.load_buckets(path, now)
+            except Exception:
+                continue  # half-written or foreign file
+            if buckets:
+                maps.append(buckets)
+    return merge_buckets(*maps), len(maps)
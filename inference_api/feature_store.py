@@ -0,0 +1,281 @@
+import json
+import math
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+# -------------------------------------------------
+# PER-CARD VELOCITY FEATURE STORE
+# -------------------------------------------------
+# Every card / account key owns one slot: a ring of `n_buckets` time
+# buckets (transaction count + amount sum per bucket) plus running window
+# totals and the time of its last transaction. Moving the window forward
+# only clears the buckets that fell out of it, so an update or a query is
+# O(1) however many transactions the card has. All slots live in a few
+# preallocated flat arrays, so memory is fixed by max_keys; the least
+# recently seen key gives up its slot when the store is full and keys idle
+# for longer than idle_seconds are dropped as new keys arrive. "Idle" is
+# measured against `clock()` when one is given (the server passes
+# time.time, so a client timestamp cannot age out other cards) and against
+# the transaction's own time otherwise (training replays history).
+#
+# observe() returns the features *before* adding the transaction, and is
+# what both /predict and training_service/feature_engineering.py call, so
+# the model is trained on exactly what serving computes.
+
+VELOCITY_FEATURES = (
+    "card_txn_count",           # transactions on the key inside the window
+    "card_amount_mean",         # their mean amount (0 without history)
+    "card_amount_ratio",        # amount / that mean (1 without history)
+    "card_seconds_since_last",  # capped at idle_seconds
+)
+DEFAULT_WINDOW_SECONDS = 3600
+DEFAULT_BUCKET_SECONDS = 300
+DEFAULT_MAX_KEYS = 100000
+DEFAULT_IDLE_SECONDS = 86400
+SNAPSHOT_VERSION = 1
+
+
+class VelocityStore:
+    def __init__(self, window_seconds=DEFAULT_WINDOW_SECONDS, bucket_seconds=DEFAULT_BUCKET_SECONDS,
+                 max_keys=DEFAULT_MAX_KEYS, idle_seconds=DEFAULT_IDLE_SECONDS, clock=None):
+        self.window_seconds = float(window_seconds)
+        self.bucket_seconds = float(bucket_seconds)
+        self.n_buckets = max(1, math.ceil(self.window_seconds / self.bucket_seconds))
+        self.max_keys = int(max_keys)
+        self.idle_seconds = float(idle_seconds)
+        self.clock = clock
+
+        nb = self.n_buckets
+        self._counts = array("I", bytes(4 * nb * self.max_keys))
+        self._sums = array("d", bytes(8 * nb * self.max_keys))
+        self._total_count = array("I", bytes(4 * self.max_keys))
+        self._total_sum = array("d", bytes(8 * self.max_keys))
+        self._head = array("q", bytes(8 * self.max_keys))      # newest bucket index per slot
+        self._last = array("d", bytes(8 * self.max_keys))      # last transaction time per slot
+        self._zero_counts = array("I", bytes(4 * nb))
+        self._zero_sums = array("d", bytes(8 * nb))
+
+        self._slots = OrderedDict()  # key -> slot, least recently seen first
+        self._free = list(range(self.max_keys - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.observations = 0
+        self.evictions = 0
+        self.idle_evictions = 0
+
+    # ---------------- request path ----------------
+    def observe(self, key, ts, amount):
+        # Features of (key, ts, amount) against the key's history, then records it
+        with self._lock:
+            return self._observe(key, float(ts), float(amount))
+
+    def observe_many(self, keys, timestamps, amounts):
+        # (N, len(VELOCITY_FEATURES)) float32, rows processed in the given order
+        out = np.empty((len(keys), len(VELOCITY_FEATURES)), dtype=np.float32)
+        with self._lock:
+            for i, (key, ts, amount) in enumerate(zip(keys, np.asarray(timestamps, dtype=np.float64).tolist(),
+                                                      np.asarray(amounts, dtype=np.float64).tolist())):
+                out[i] = self._observe(key, ts, amount)
+        return out
+
+    def peek(self, key, ts, amount=0.0):
+        # Same features as observe(), without recording anything
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                return self._features(None, ts, amount)
+            bucket = int(ts // self.bucket_seconds)
+            count, total = self._window_totals(slot, bucket)
+            return self._features((count, total, self._last[slot]), ts, amount)
+
+    def _observe(self, key, ts, amount):
+        bucket = int(ts // self.bucket_seconds)
+        slot = self._slots.get(key)
+        if slot is None:
+            features = self._features(None, ts, amount)
+            slot = self._allocate(key, ts, bucket)
+        else:
+            self._slots.move_to_end(key)
+            self._advance(slot, bucket)
+            features = self._features((self._total_count[slot], self._total_sum[slot], self._last[slot]), ts, amount)
+
+        head = self._head[slot]
+        if head - bucket < self.n_buckets:  # later than the window start
+            i = slot * self.n_buckets + bucket % self.n_buckets
+            self._counts[i] += 1
+            self._sums[i] += amount
+            self._total_count[slot] += 1
+            self._total_sum[slot] += amount
+        if ts > self._last[slot]:
+            self._last[slot] = ts
+        self.observations += 1
+        return features
+
+    def _features(self, history, ts, amount):
+        if history is None or history[0] == 0:
+            since = self.idle_seconds if history is None else min(ts - history[2], self.idle_seconds)
+            return (0.0, 0.0, 1.0, max(since, 0.0))
+        count, total, last = history
+        mean = total / count
+        return (
+            float(count),
+            mean,
+            amount / mean if mean else 1.0,
+            max(min(ts - last, self.idle_seconds), 0.0),
+        )
+
+    # ---------------- ring buffer ----------------
+    def _advance(self, slot, bucket):
+        head = self._head[slot]
+        if bucket <= head:
+            return
+        nb = self.n_buckets
+        base = slot * nb
+        if bucket - head >= nb:
+            self._clear(slot)
+        else:
+            counts, sums = self._counts, self._sums
+            for b in range(head + 1, bucket + 1):
+                i = base + b % nb
+                self._total_count[slot] -= counts[i]
+                self._total_sum[slot] -= sums[i]
+                counts[i] = 0
+                sums[i] = 0.0
+            if self._total_count[slot] == 0:
+                self._total_sum[slot] = 0.0  # no float drift carried into the next window
+        self._head[slot] = bucket
+
+    def _window_totals(self, slot, bucket):
+        # totals as of `bucket` without moving the ring
+        head = self._head[slot]
+        if bucket <= head:
+            return self._total_count[slot], self._total_sum[slot]
+        if bucket - head >= self.n_buckets:
+            return 0, 0.0
+        nb = self.n_buckets
+        base = slot * nb
+        count, total = self._total_count[slot], self._total_sum[slot]
+        for b in range(head + 1, bucket + 1):
+            count -= self._counts[base + b % nb]
+            total -= self._sums[base + b % nb]
+        return count, total
+
+    def _clear(self, slot):
+        nb = self.n_buckets
+        base = slot * nb
+        self._counts[base:base + nb] = self._zero_counts
+        self._sums[base:base + nb] = self._zero_sums
+        self._total_count[slot] = 0
+        self._total_sum[slot] = 0.0
+
+    def _allocate(self, key, ts, bucket):
+        self._evict_idle(self.clock() if self.clock is not None else ts)
+        if self._free:
+            slot = self._free.pop()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            self.evictions += 1
+        self._clear(slot)
+        self._head[slot] = bucket
+        self._last[slot] = -math.inf
+        self._slots[key] = slot
+        return slot
+
+    def _evict_idle(self, now):
+        cutoff = now - self.idle_seconds
+        while self._slots:
+            key, slot = next(iter(self._slots.items()))
+            if self._last[slot] >= cutoff:
+                break
+            del self._slots[key]
+            self._free.append(slot)
+            self.idle_evictions += 1
+
+    def evict_idle(self, now):
+        with self._lock:
+            self._evict_idle(now)
+
+    # ---------------- snapshots ----------------
+    def settings(self):
+        # what the features mean; recorded with models trained on them
+        return {
+            "window_seconds": self.window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "idle_seconds": self.idle_seconds,
+        }
+
+    def _params(self):
+        return {"version": SNAPSHOT_VERSION, **self.settings()}
+
+    def save(self, path):
+        # Copies the used slots under the lock, writes outside it
+        with self._lock:
+            keys = list(self._slots)
+            slots = np.fromiter(self._slots.values(), dtype=np.intp, count=len(keys))
+            nb = self.n_buckets
+            state = {
+                "counts": np.frombuffer(self._counts, dtype=np.uint32).reshape(-1, nb)[slots],
+                "sums": np.frombuffer(self._sums, dtype=np.float64).reshape(-1, nb)[slots],
+                "total_count": np.frombuffer(self._total_count, dtype=np.uint32)[slots],
+                "total_sum": np.frombuffer(self._total_sum, dtype=np.float64)[slots],
+                "head": np.frombuffer(self._head, dtype=np.int64)[slots],
+                "last": np.frombuffer(self._last, dtype=np.float64)[slots],
+            }
+        header = json.dumps({**self._params(), "keys": keys})
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, header=np.array(header), **state)
+        os.replace(tmp_path, path)
+        return len(keys)
+
+    def load(self, path):
+        # Returns the number of keys restored; snapshots taken with other
+        # window settings are ignored (their buckets mean something else)
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            params = {k: header.get(k) for k in self._params()}
+            if params != self._params():
+                raise ValueError(f"Snapshot settings {params} do not match the store's {self._params()}")
+            keys = header["keys"][-self.max_keys:]
+            skip = len(header["keys"]) - len(keys)  # oldest keys first, drop them
+            arrays = {name: data[name][skip:] for name in ("counts", "sums", "total_count", "total_sum", "head", "last")}
+
+        with self._lock:
+            nb = self.n_buckets
+            n = len(keys)
+            np.frombuffer(self._counts, dtype=np.uint32).reshape(-1, nb)[:n] = arrays["counts"]
+            np.frombuffer(self._sums, dtype=np.float64).reshape(-1, nb)[:n] = arrays["sums"]
+            np.frombuffer(self._total_count, dtype=np.uint32)[:n] = arrays["total_count"]
+            np.frombuffer(self._total_sum, dtype=np.float64)[:n] = arrays["total_sum"]
+            np.frombuffer(self._head, dtype=np.int64)[:n] = arrays["head"]
+            np.frombuffer(self._last, dtype=np.float64)[:n] = arrays["last"]
+            self._slots = OrderedDict(zip(keys, range(n)))
+            self._free = list(range(self.max_keys - 1, n - 1, -1))
+        return n
+
+    def stats(self):
+        return {
+            "keys": len(self._slots),
+            "max_keys": self.max_keys,
+            **self.settings(),
+            "memory_bytes": sum(a.itemsize * len(a) for a in (
+                self._counts, self._sums, self._total_count, self._total_sum, self._head, self._last
+            )),
+            "observations": self.observations,
+            "evictions": self.evictions,
+            "idle_evictions": self.idle_evictions,
+        }
+
+
+def velocity_slots(features):
+    # (model input column, VELOCITY_FEATURES index) for every velocity
+    # feature in a model's training feature list
+    return tuple(
+        (i, VELOCITY_FEATURES.index(name))
+        for i, name in enumerate(features or ())
+        if name in VELOCITY_FEATURES
+    )
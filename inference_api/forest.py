@@ -0,0 +1,398 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import warnings
+
+import numpy as np
+
+# -------------------------------------------------
+# FLATTENED RANDOM FOREST
+# -------------------------------------------------
+# All trees of a fitted RandomForestClassifier are packed into one set of
+# contiguous node arrays. Leaves point to themselves, so a batch can walk
+# every tree in lock-step for max_depth steps with plain NumPy gathers and
+# no per-tree Python loop. sklearn is only needed to compile, never to
+# evaluate.
+
+TREE_LEAF = -1
+WALK_ARRAYS = ("feature2", "threshold2", "children2", "roots2", "value2")
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features, walk=None):
+        self.feature = feature        # int, split feature per node (0 on leaves)
+        self.threshold = threshold    # float64 (float32 when compacted), go left when x <= threshold
+        self.left = left              # int, global index of left child (self on leaves)
+        self.right = right            # int, global index of right child (self on leaves)
+        self.value = value            # float64 (float32 when compacted), positive-class probability per node
+        self.roots = roots            # int32, root node of each tree
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+
+        # Walk layout: node i is addressed as 2*i, so the next node is a single
+        # gather at 2*i + go_left and a level costs ~6 NumPy calls.
+        if walk is not None:
+            # prebuilt (e.g. memory-mapped) arrays, used as-is without copies
+            for name in WALK_ARRAYS:
+                setattr(self, "_" + name, walk[name])
+            return
+
+        self._feature2 = np.repeat(np.asarray(feature, dtype=np.intp), 2)
+        self._threshold2 = np.repeat(np.asarray(threshold), 2)
+        self._children2 = np.empty(2 * len(feature), dtype=np.intp)
+        self._children2[0::2] = 2 * np.asarray(right, dtype=np.intp)
+        self._children2[1::2] = 2 * np.asarray(left, dtype=np.intp)
+        self._roots2 = 2 * np.asarray(roots, dtype=np.intp)
+        self._value2 = np.repeat(np.asarray(value), 2)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def leaves(self, X):
+        # (N, n_trees) leaf index reached by each row in each tree
+        return self._walk(X) // 2
+
+    def predict_positive(self, X):
+        return self._value2.take(self._walk(X)).mean(axis=1, dtype=np.float64)
+
+    def predict_proba(self, X):
+        positive = self.predict_positive(X)
+        return np.column_stack((1.0 - positive, positive))
+
+    def predict(self, X):
+        return (self.predict_positive(X) > 0.5).astype(np.int64)
+
+    def _walk(self, X, roots2=None):
+        # X: raw input; roots2: walk only these trees (default: all, in order)
+        return self._walk_prepared(self._as_input(X), self._roots2 if roots2 is None else roots2)
+
+    def _walk_prepared(self, X, roots2):
+        n = X.shape[0]
+
+        if n == 1:
+            x = X[0]
+            node = roots2
+            for _ in range(self.max_depth):
+                go_left = x.take(self._feature2.take(node)) <= self._threshold2.take(node)
+                node = self._children2.take(node + go_left)
+            return node[None, :]
+
+        flat = X.ravel()
+        row_offset = np.arange(0, n * self.n_features_in_, self.n_features_in_, dtype=np.intp)[:, None]
+        node = np.broadcast_to(roots2, (n, len(roots2)))
+        for _ in range(self.max_depth):
+            go_left = flat.take(row_offset + self._feature2.take(node)) <= self._threshold2.take(node)
+            node = self._children2.take(node + go_left)
+        return node
+
+    def _as_input(self, X):
+        # sklearn trees round inputs to float32, then compare against float64
+        # thresholds; do the same so every split goes the same way (compacted
+        # forests hold float32 thresholds rounded down, which splits float32
+        # inputs identically)
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Expected input of shape (n, {self.n_features_in_}), got {X.shape}"
+            )
+        return X.astype(self._threshold2.dtype, copy=False)
+
+    def arrays(self):
+        # Everything needed to rebuild the forest without recomputation
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+        }
+        for name in WALK_ARRAYS:
+            arrays[name] = getattr(self, "_" + name)
+        return arrays
+
+
+# -------------------------------------------------
+# SUBTREE VALUE BOUNDS
+# -------------------------------------------------
+# Smallest / largest leaf value reachable below each node; the compact
+# export prunes subtrees whose leaves all lie within a tolerance.
+
+
+def subtree_value_bounds(forest):
+    # min / max leaf value below every node; leaves point to themselves
+    left = np.asarray(forest.left, dtype=np.intp)
+    right = np.asarray(forest.right, dtype=np.intp)
+    value = np.asarray(forest.value, dtype=np.float64)
+    is_leaf = left == np.arange(len(left))
+    lo = np.where(is_leaf, value, np.inf)
+    hi = np.where(is_leaf, value, -np.inf)
+    for _ in range(forest.max_depth):
+        lo = np.where(is_leaf, lo, np.minimum(lo[left], lo[right]))
+        hi = np.where(is_leaf, hi, np.maximum(hi[left], hi[right]))
+    return lo, hi
+
+
+# -------------------------------------------------
+# FEATURE ATTRIBUTIONS (TREE-PATH DECOMPOSITION)
+# -------------------------------------------------
+# Walking from a node to a child changes the tree's running value by
+# value[child] - value[node]; that change is credited to the feature the
+# node splits on. Summed along a row's path, each tree's leaf value is its
+# root value plus one contribution per feature, and averaging over trees
+# gives prediction = bias + sum(contributions).
+#
+# The per-feature sums from the root to every node are precomputed once
+# (n_nodes x n_features), so explaining a batch is the usual leaf walk plus
+# one gather of those rows per tree: about the cost of a prediction.
+
+class ForestExplainer:
+    def __init__(self, forest):
+        self.forest = forest
+        self.n_features_in_ = forest.n_features_in_
+        value = np.asarray(forest.value, dtype=np.float64)
+        self.bias = float(value[np.asarray(forest.roots, dtype=np.intp)].mean())
+        self._value = value
+        self._path = path_contributions(forest)
+
+    def explain(self, X):
+        # (scores (N,), contributions (N, n_features)); scores are the exact
+        # full-forest mean, bias + contributions.sum(axis=1) up to rounding
+        leaves = self.forest.leaves(X)
+        scores = self._value.take(leaves).mean(axis=1)
+        contributions = self._path[leaves].mean(axis=1)
+        return scores, contributions
+
+    @property
+    def nbytes(self):
+        return self._path.nbytes
+
+
+def path_contributions(forest):
+    # (n_nodes, n_features) per-feature value change from the tree root to each node
+    feature = np.asarray(forest.feature, dtype=np.intp)
+    left = np.asarray(forest.left, dtype=np.intp)
+    right = np.asarray(forest.right, dtype=np.intp)
+    value = np.asarray(forest.value, dtype=np.float64)
+    path = np.zeros((len(feature), forest.n_features_in_), dtype=np.float64)
+
+    frontier = np.asarray(forest.roots, dtype=np.intp)
+    for _ in range(forest.max_depth):
+        frontier = frontier[left[frontier] != frontier]  # internal nodes only
+        if len(frontier) == 0:
+            break
+        split = feature[frontier]
+        for children in (left[frontier], right[frontier]):
+            path[children] = path[frontier]
+            path[children, split] += value[children] - value[frontier]
+        frontier = np.concatenate((left[frontier], right[frontier]))
+    return path
+
+
+def compile_forest(model):
+    # model: fitted binary RandomForestClassifier (duck-typed, no sklearn import)
+    classes = list(getattr(model, "classes_", []))
+    if len(classes) != 2:
+        raise ValueError(f"Only binary classifiers can be compiled, got classes {classes}")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        index = np.arange(n)
+        is_leaf = tree.children_left == TREE_LEAF
+
+        counts = tree.value[:, 0, :]
+        probability = counts[:, 1] / counts.sum(axis=1)
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, index, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, index, tree.children_right) + offset)
+        values.append(probability)
+        roots.append(offset)
+
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledForest(
+        feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+        threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+        left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+        right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+        value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=max_depth,
+        n_features=model.n_features_in_,
+    )
+
+
+def verify_forest(compiled, model, n_samples=512, seed=0, atol=1e-9):
+    # Compare against sklearn on probes drawn around the forest's own split
+    # thresholds (including exact ties); True when the outputs agree
+    rng = np.random.default_rng(seed)
+    internal = compiled.left != np.arange(compiled.n_nodes)
+    X = rng.normal(size=(n_samples, compiled.n_features_in_))
+    for j in range(compiled.n_features_in_):
+        splits = compiled.threshold[internal & (compiled.feature == j)]
+        if len(splits):
+            picks = rng.choice(splits, n_samples)
+            jitter = rng.choice([-1e-3, 0.0, 1e-3], n_samples) * np.maximum(np.abs(picks), 1.0)
+            X[:, j] = picks + jitter
+
+    with warnings.catch_warnings():
+        # fitted with feature names, probed with a bare array
+        warnings.simplefilter("ignore", UserWarning)
+        expected = model.predict_proba(X)[:, 1]
+    return bool(np.allclose(compiled.predict_positive(X), expected, rtol=0.0, atol=atol))
+
+
+# -------------------------------------------------
+# MEMORY-MAPPABLE EXPORT (.forest)
+# -------------------------------------------------
+# Layout: 8-byte magic, uint64 little-endian header length, JSON header,
+# then each array as raw little-endian bytes at a 64-byte aligned offset.
+# Loading maps the file read-only and wraps each array in place, so every
+# worker process on a box shares one page-cache copy and startup does no
+# unpickling (and imports no sklearn). Arrays keep whatever dtype they were
+# saved with; a file without the walk arrays (see
+# training_service/compact_model.py) has them rebuilt in memory at load.
+
+FOREST_MAGIC = b"FRSTv001"
+FOREST_FORMAT_VERSION = 1
+_ALIGN = 64
+
+
+def save_forest(forest, path, metadata=None, walk=True):
+    # walk=False: base arrays only, ~5x smaller but rebuilt per process at load
+    arrays = {
+        name: np.ascontiguousarray(array, dtype=np.asarray(array).dtype.newbyteorder("<"))
+        for name, array in forest.arrays().items()
+        if walk or name not in WALK_ARRAYS
+    }
+
+    entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps({
+        "format_version": FOREST_FORMAT_VERSION,
+        "max_depth": forest.max_depth,
+        "n_features": forest.n_features_in_,
+        "arrays": entries,
+        "metadata": metadata or {},
+    }).encode("utf-8")
+    data_start = _aligned(len(FOREST_MAGIC) + 8 + len(header))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(FOREST_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + entries[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_forest_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(FOREST_MAGIC)) != FOREST_MAGIC:
+            raise ValueError(f"{path} is not a .forest file")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        return json.loads(f.read(header_len))
+
+
+def load_forest(path):
+    header = read_forest_header(path)
+    if header["format_version"] != FOREST_FORMAT_VERSION:
+        raise ValueError(f"Unsupported .forest format version {header['format_version']}")
+
+    with open(path, "rb") as f:
+        f.seek(len(FOREST_MAGIC))
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        data_start = _aligned(len(FOREST_MAGIC) + 8 + header_len)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=data_start + entry["offset"]
+        ).reshape(entry["shape"])
+
+    forest = CompiledForest(
+        feature=arrays["feature"],
+        threshold=arrays["threshold"],
+        left=arrays["left"],
+        right=arrays["right"],
+        value=arrays["value"],
+        roots=arrays["roots"],
+        max_depth=header["max_depth"],
+        n_features=header["n_features"],
+        walk={name: arrays[name] for name in WALK_ARRAYS} if set(WALK_ARRAYS) <= arrays.keys() else None,
+    )
+    forest.metadata = header["metadata"]
+    return forest
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def forest_path_for(model_file):
+    return os.path.splitext(model_file)[0] + ".forest"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_model(model, model_file, output=None):
+    # Write the .forest next to an already-saved pickle, tagged with its hash
+    # so a stale export is never served for a newer pickle
+    output = output or forest_path_for(model_file)
+    compiled = compile_forest(model)
+    if not verify_forest(compiled, model):
+        raise ValueError("Compiled forest disagrees with sklearn, not exporting")
+    save_forest(compiled, output, {"source_sha256": file_sha256(model_file)})
+    return output
+
+
+def main(argv=None):
+    # python -m inference_api.forest export artifacts/fraud_model.pkl [-o out.forest]
+    import argparse
+
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Export a fitted forest to the mmap .forest format")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export")
+    export.add_argument("model_file")
+    export.add_argument("-o", "--output")
+    args = parser.parse_args(argv)
+
+    output = export_model(joblib.load(args.model_file), args.model_file, args.output)
+    print("✅ Exported", output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,446 @@
-from fastapi import FastAPI, HTTPException
-from typing import Dict
-import joblib
+from time import perf_counter
+IMPORT_STARTED = perf_counter()  # cold-start timing, reported by /ready
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import asyncio
 import numpy as np
 import os
+import threading
+import time
 
-from .schemas import TransactionInput, FraudResponse
+from .schemas import (
+    TransactionInput,
+    FraudResponse,
+    BatchTransactionInput,
+    BatchItemResult,
+    BatchFraudResponse,
+    Explanation,
+    ModelActivateRequest,
+    ShadowConfigRequest,
+)
+from .admission import AdmissionController, Overloaded
+from .batcher import MicroBatcher
+from .cache import ScoreCache, canonical_key
+from .drift import DriftSketch, merge_buckets, shared_buckets, snapshot_path
+from .feature_store import VELOCITY_FEATURES, VelocityStore
+from .metrics import Counter, Gauge, Histogram, StageHistograms, render_prometheus
+from .profiler import SamplingProfiler
+from .registry import ActiveModel, ModelRegistry
+from .shadow import ShadowScorer
+from .streaming import DuplexStreamingResponse, NDJSONScorer
+from .scoring import (
+    EXPECTED_FEATURES,
+    FEATURE_NAMES,
+    JSON_TYPE,
+    NPY_MATRIX_TYPE,
+    RAW_MATRIX_TYPE,
+    REJECTED_CODE,
+    RISK_LABELS,
+    build_matrix,
+    columns_to_matrix,
+    decode_matrix,
+    encode_columns,
+    matrix_errors,
+    matrix_response_type,
+    features_from_input,
+    record_to_row,
+    score_matrix,
+)
 
 # -------------------------------------------------
 # APP CONFIG
 # -------------------------------------------------
+@asynccontextmanager
+async def lifespan(app):
+    # The model loads and warms in the background: the server accepts
+    # connections at once, /ready turns 200 when warm-up is done
+    threading.Thread(target=_start_up, name="model-startup", daemon=True).start()
+    if batcher is not None:
+        batcher.start()
+    if audit is not None:
+        audit.start()
+    shadow.start()
+    metric_tasks = [asyncio.ensure_future(_fold_metrics(METRICS_FOLD_INTERVAL))]
+    if LOOP_LAG_INTERVAL > 0:
+        metric_tasks.append(asyncio.ensure_future(_monitor_loop_lag(LOOP_LAG_INTERVAL)))
+    if DRIFT_SHARED_DIR and DRIFT_SHARE_INTERVAL > 0:
+        metric_tasks.append(asyncio.ensure_future(_share_drift(DRIFT_SHARE_INTERVAL)))
+    if feature_store is not None and FEATURE_STORE_SNAPSHOT_INTERVAL > 0:
+        metric_tasks.append(asyncio.ensure_future(_snapshot_feature_store(FEATURE_STORE_SNAPSHOT_INTERVAL)))
+    yield
+    for task in metric_tasks:
+        task.cancel()
+    profiler.stop()
+    shadow.stop()
+    if DRIFT_SHARED_DIR:
+        _remove_drift_snapshot()
+    if feature_store is not None:
+        await run_in_threadpool(_save_feature_store)
+    if batcher is not None:
+        await batcher.stop()
+    if audit is not None:
+        # drain buffered audit rows before the process exits
+        await run_in_threadpool(audit.stop)
+
+
 app = FastAPI(
     title="Real-Time Transaction Fraud Detection API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # -------------------------------------------------
-# LOAD MODEL (SAFE FOR LOCAL + RENDER)
+# METRICS (PROMETHEUS TEXT ON /metrics)
 # -------------------------------------------------
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(
-    os.path.dirname(BASE_DIR),
-    "artifacts",
-    "fraud_model.pkl"
+# /predict records one tuple of stage durations per request; folding into
+# histograms happens at scrape time (see StageHistograms). "framework" is
+# everything outside the handler: body parsing, pydantic validation,
+# routing and response serialization.
+METRICS_PREFIX = "fraud_api_"
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL_MS", "250")) / 1000.0
+METRICS_FOLD_INTERVAL = 1.0
+
+LATENCY_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+NAN = float("nan")
+PREDICT_STAGES = ("features", "cache", "admission", "model", "response", "audit", "framework", "total")
+
+model_call_seconds = Histogram(
+    "model_call_seconds", "Duration of one predict_proba call (any endpoint)", LATENCY_BUCKETS
+)
+loop_lag_seconds = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a periodic timer", LATENCY_BUCKETS
 )
+predictions_total = Counter(
+    "predictions", "Scored transactions by endpoint and risk level", ("endpoint", "risk_level")
+)
+# /predict's own predictions_total counts ride on its stage tuple
+predict_stages = StageHistograms(
+    "predict_stage_seconds", "Time spent in each /predict stage", PREDICT_STAGES, LATENCY_BUCKETS,
+    tally=predictions_total
+)
+errors_total = Counter(
+    "errors", "Rejected or failed requests by error type", ("type",)
+)
+profiler = SamplingProfiler()
+
+
+class StageTimingMiddleware:
+    # Pure ASGI (no BaseHTTPMiddleware task/stream overhead); only /predict
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != "/predict":
+            return await self.app(scope, receive, send)
+        started = perf_counter()
+        await self.app(scope, receive, send)
+        timed = scope.get("predict_stages")
+        if timed is not None:
+            stages, handler, label = timed
+            total = perf_counter() - started
+            predict_stages.record(stages + (total - handler, total), label)
+
+
+app.add_middleware(StageTimingMiddleware)
+
+# -------------------------------------------------
+# ADMISSION CONTROL (LOAD SHEDDING, SEE admission.py)
+# -------------------------------------------------
+# /predict takes a slot right before the model call (cache hits never
+# queue); its lane comes from the amount. Batch and stream requests hold a
+# "bulk" slot for the whole request.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "false").lower() in ("1", "true", "yes")
+ADMISSION_HIGH_VALUE_AMOUNT = float(os.getenv("ADMISSION_HIGH_VALUE_AMOUNT", "10000"))
+BULK_PATHS = ("/predict/batch", "/predict/matrix", "/predict/stream")
+
+admission = None
+if ADMISSION_ENABLED:
+    admission = AdmissionController(
+        max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+        max_queue_wait=float(os.getenv("ADMISSION_MAX_QUEUE_WAIT_MS", "50")) / 1000.0,
+        retry_after=int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+    )
+
+
+class AdmissionMiddleware:
+    # Pure ASGI; only the bulk paths, /predict admits inside the handler
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if admission is None or scope["type"] != "http" or scope["path"] not in BULK_PATHS:
+            return await self.app(scope, receive, send)
+        try:
+            await admission.acquire("bulk")
+        except Overloaded as e:
+            response = JSONResponse(
+                {"detail": f"Server overloaded ({e.reason}), retry later"},
+                status_code=503,
+                headers={"Retry-After": str(admission.retry_after)}
+            )
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
+
+
+app.add_middleware(AdmissionMiddleware)
 
-model = None
-EXPECTED_FEATURES = 7
 
-try:
-    if os.path.exists(MODEL_PATH):
-        model = joblib.load(MODEL_PATH)
-        print("✅ Fraud model loaded successfully")
-        if hasattr(model, "n_features_in_"):
-            print("📊 Model expects features:", model.n_features_in_)
+@app.exception_handler(RequestValidationError)
+async def count_validation_errors(request, exc):
+    errors_total.inc(("request_validation",))
+    return await request_validation_exception_handler(request, exc)
+
+# -------------------------------------------------
+# SCORE CACHE (REPEATED FEATURE VECTORS SKIP THE MODEL)
+# -------------------------------------------------
+SCORE_CACHE_ENABLED = os.getenv("SCORE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+score_cache = None
+if SCORE_CACHE_ENABLED:
+    score_cache = ScoreCache(
+        max_entries=int(os.getenv("SCORE_CACHE_MAX_ENTRIES", "50000")),
+        ttl_seconds=float(os.getenv("SCORE_CACHE_TTL_SECONDS", "300"))
+    )
+
+
+# -------------------------------------------------
+# VELOCITY FEATURE STORE (PER-CARD SLIDING WINDOWS)
+# -------------------------------------------------
+# Requests with a card_id are recorded in the store; models trained with
+# velocity features (see training_service/feature_engineering.py) get those
+# columns filled from it. State is per worker, snapshotted to disk.
+FEATURE_STORE_ENABLED = os.getenv("FEATURE_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+FEATURE_STORE_SNAPSHOT_PATH = os.getenv("FEATURE_STORE_SNAPSHOT_PATH", "feature_store.npz")
+FEATURE_STORE_SNAPSHOT_INTERVAL = float(os.getenv("FEATURE_STORE_SNAPSHOT_INTERVAL", "60"))
+FEATURE_STORE_MAX_SKEW = float(os.getenv("FEATURE_STORE_MAX_SKEW_SECONDS", "300"))
+
+feature_store = None
+if FEATURE_STORE_ENABLED:
+    feature_store = VelocityStore(
+        window_seconds=float(os.getenv("FEATURE_STORE_WINDOW_SECONDS", "3600")),
+        bucket_seconds=float(os.getenv("FEATURE_STORE_BUCKET_SECONDS", "300")),
+        max_keys=int(os.getenv("FEATURE_STORE_MAX_KEYS", "100000")),
+        idle_seconds=float(os.getenv("FEATURE_STORE_IDLE_SECONDS", "86400")),
+        clock=time.time,
+    )
+    if os.path.exists(FEATURE_STORE_SNAPSHOT_PATH):
+        try:
+            print("🧠 Feature store restored:", feature_store.load(FEATURE_STORE_SNAPSHOT_PATH), "keys")
+        except Exception as e:
+            print("⚠️ Feature store snapshot not restored:", str(e))
+
+# -------------------------------------------------
+# DRIFT MONITORING (STREAMING SKETCHES VS THE TRAINING PROFILE)
+# -------------------------------------------------
+# Every scored row is counted into the reference bins train.py stored with
+# the model (see drift.py). With DRIFT_SHARED_DIR set, each worker writes
+# its sketch there periodically and /drift merges all of them.
+DRIFT_ENABLED = os.getenv("DRIFT_ENABLED", "true").lower() in ("1", "true", "yes")
+DRIFT_WINDOW_SECONDS = float(os.getenv("DRIFT_WINDOW_SECONDS", "3600"))
+DRIFT_BUCKET_SECONDS = float(os.getenv("DRIFT_BUCKET_SECONDS", "300"))
+DRIFT_PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.2"))
+DRIFT_SHARED_DIR = os.getenv("DRIFT_SHARED_DIR", "")
+DRIFT_SHARE_INTERVAL = float(os.getenv("DRIFT_SHARE_INTERVAL", "10"))
+
+drift = None  # DriftSketch of the active model, replaced on every swap
+
+
+def _on_model_swap(previous, loaded):
+    global drift
+    # entries are keyed by version already; drop the old ones eagerly
+    if score_cache is not None:
+        score_cache.clear()
+    if DRIFT_ENABLED:
+        profile = loaded.metadata.get("reference_profile")
+        if profile is None:
+            print(f"⚠️ [{loaded.version}] No drift reference profile, drift monitoring off")
+        drift = DriftSketch(profile, DRIFT_WINDOW_SECONDS, DRIFT_BUCKET_SECONDS,
+                            key=loaded.version) if profile else None
+    # comparisons so far were against the previous primary
+    if previous is not None:
+        shadow.reset()
+    if loaded.velocity_slots:
+        trained = loaded.metadata.get("velocity")
+        if feature_store is None:
+            print(f"⚠️ [{loaded.version}] Model uses velocity features but FEATURE_STORE_ENABLED is off")
+        elif trained and trained != feature_store.settings():
+            print(f"⚠️ [{loaded.version}] Velocity features trained with {trained}, "
+                  f"store uses {feature_store.settings()}")
+
+# -------------------------------------------------
+# LOAD MODEL (VERSIONED REGISTRY, HOT-SWAPPABLE)
+# -------------------------------------------------
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "native").lower()
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# ?explain=true on /predict and /predict/batch; per-node attribution
+# tables are built at model load (n_nodes x n_features floats)
+EXPLAIN_ENABLED = os.getenv("EXPLAIN_ENABLED", "true").lower() in ("1", "true", "yes")
+
+registry = ModelRegistry()
+active = ActiveModel(
+    registry,
+    engine=INFERENCE_ENGINE,
+    on_swap=_on_model_swap,
+    explain=EXPLAIN_ENABLED
+)
+
+# -------------------------------------------------
+# SHADOW SCORING (CANDIDATES NEVER ON THE REQUEST PATH)
+# -------------------------------------------------
+# Scored rows are sampled into a bounded buffer; one background thread
+# scores them with every candidate version and compares against the
+# primary (see shadow.py). A full buffer drops samples, never waits.
+SHADOW_MODELS = [v.strip() for v in os.getenv("SHADOW_MODELS", "").split(",") if v.strip()]
+
+shadow = ShadowScorer(
+    registry,
+    engine=INFERENCE_ENGINE,
+    sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", "1.0")),
+    max_queue_rows=int(os.getenv("SHADOW_MAX_QUEUE_ROWS", "10000")),
+    batch_rows=int(os.getenv("SHADOW_BATCH_ROWS", "256"))
+)
+
+# -------------------------------------------------
+# MICRO-BATCHING (CONCURRENT /predict CALLS SHARE ONE MODEL CALL)
+# -------------------------------------------------
+BATCHER_ENABLED = os.getenv("BATCHER_ENABLED", "false").lower() in ("1", "true", "yes")
+
+batcher = None
+if BATCHER_ENABLED:
+    batcher = MicroBatcher(
+        lambda features: _score_batched(features),
+        max_batch_size=int(os.getenv("BATCHER_MAX_BATCH_SIZE", "64")),
+        max_wait_ms=float(os.getenv("BATCHER_MAX_WAIT_MS", "2")),
+        max_concurrent_flushes=int(os.getenv("BATCHER_MAX_CONCURRENT_FLUSHES", "1"))
+    )
+
+# -------------------------------------------------
+# AUDIT LOG (BUFFERED BULK INSERTS OFF THE REQUEST PATH)
+# -------------------------------------------------
+AUDIT_LOG_ENABLED = os.getenv("AUDIT_LOG_ENABLED", "false").lower() in ("1", "true", "yes")
+# per-minute / per-hour aggregates written with each flush, read by /stats/rollups
+AUDIT_ROLLUPS_ENABLED = os.getenv("AUDIT_ROLLUPS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+audit = None
+if AUDIT_LOG_ENABLED:
+    # SQLAlchemy is only imported when the database is used
+    from .audit import AuditWriter
+    from .database import SessionLocal, engine as db_engine
+    from .rollups import ensure_schema
+
+    if SessionLocal is None:
+        print("⚠️ AUDIT_LOG_ENABLED is set but DATABASE_URL is not, audit log disabled")
     else:
-        print("❌ Model file not found:", MODEL_PATH)
-except Exception as e:
-    print("❌ Model loading failed:", str(e))
+        ensure_schema(db_engine)
+        audit = AuditWriter(
+            SessionLocal,
+            max_queue=int(os.getenv("AUDIT_QUEUE_SIZE", "10000")),
+            batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "500")),
+            flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500")) / 1000.0,
+            policy=os.getenv("AUDIT_OVERFLOW_POLICY", "drop_oldest"),
+            spill_path=os.getenv("AUDIT_SPILL_PATH", "audit_spill.jsonl"),
+            block_timeout=float(os.getenv("AUDIT_BLOCK_TIMEOUT_MS", "5")) / 1000.0,
+            rollups=AUDIT_ROLLUPS_ENABLED
+        )
+        print("🗄️ Audit log enabled:", audit.policy)
+
+# -------------------------------------------------
+# STARTUP (BACKGROUND LOAD + WARM-UP, READINESS)
+# -------------------------------------------------
+# Importing this module loads no model. The lifespan hook starts
+# _start_up in a thread: load + warm the active model (first calls of
+# every scoring path, buffer allocation), then the shadow candidates and
+# the registry watcher. /health answers as soon as the process is up
+# (liveness); /ready only once warm-up is done, so a load balancer keeps
+# traffic off cold workers. Ready = start-up done and a model active, so
+# a worker whose first load failed turns ready after a successful reload.
+startup = {
+    "state": "starting",       # starting -> started (warm-up done or load failed)
+    "import_seconds": None,    # module import, model excluded
+    "load_seconds": None,      # model load + warm-up
+    "ready_seconds": None,     # module import start -> ready
+}
+
+
+def _start_up():
+    started = perf_counter()
+    active.load_initial()
+    current = active.current
+    if current is not None:
+        if current.n_features_in_:
+            print("📊 Model expects features:", current.n_features_in_)
+        try:
+            _warm_request_path(current)
+        except Exception as e:
+            print("⚠️ Request path warm-up failed:", str(e))
+    startup["load_seconds"] = round(perf_counter() - started, 3)
+    startup["state"] = "started"
+    if current is not None:
+        startup["ready_seconds"] = round(perf_counter() - IMPORT_STARTED, 3)
+        print(f"🚀 Ready in {startup['ready_seconds']} s (import {startup['import_seconds']} s, "
+              f"model {startup['load_seconds']} s)")
+
+    # not needed to serve; after readiness
+    if SHADOW_MODELS:
+        try:
+            print("🌓 Shadow models:", shadow.set_candidates(SHADOW_MODELS))
+        except Exception as e:
+            print("⚠️ Shadow models not loaded:", str(e))
+    active.start_watcher(MODEL_WATCH_INTERVAL)
+
+
+def _warm_request_path(current):
+    # One pass through what /predict and /predict/batch do around the model,
+    # on scratch rows (nothing reaches the cache, audit log, drift sketch or
+    # metrics)
+    policy = current.policy
+    row = features_from_input(TransactionInput(amount=1.0, hour=0))
+    probabilities = score_matrix(current.scorer, build_matrix([row]), policy)
+    FraudResponse(
+        fraud=bool(policy.fraud_flags(probabilities)[0]),
+        probability=round(float(probabilities[0]), 4),
+        risk_level=str(policy.risk_levels(probabilities)[0]),
+        model_version=current.version
+    ).model_dump_json()
+    rows = [record_to_row({"amount": 1.0, "hour": h})[0] for h in range(24)]
+    policy.risk_levels(score_matrix(current.scorer, build_matrix(rows), policy))
+    if current.explainer is not None:
+        raw, contributions = current.explainer.explain(build_matrix([row]))
+        _explanations(current, raw, contributions)
+
+
+def _is_ready():
+    return startup["state"] == "started" and active.current is not None
+
+
+@app.get("/ready")
+def ready():
+    # Readiness probe: 200 once the model is loaded and warm, 503 before
+    current = active.current
+    body = {
+        "ready": _is_ready(),
+        "model_version": current.version if current is not None else None,
+        "model_status": active.status,
+        **startup,
+    }
+    if not body["ready"]:
+        return JSONResponse(status_code=503, content=body, headers={"Retry-After": "1"})
+    return body
 
 # -------------------------------------------------
 # ROOT
@@ -54,76 +458,912 @@ def root():
 # -------------------------------------------------
 @app.get("/health", response_model=Dict[str, str])
 def health():
+    current = active.current
     return {
         "status": "OK",
         "service": "fraud-detection",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "model_version": current.version if current is not None else "none",
+        "engine": current.engine if current is not None else "none"
     }
 
 # -------------------------------------------------
 # PREDICT
 # -------------------------------------------------
-@app.post("/predict", response_model=FraudResponse)
-def predict(data: TransactionInput):
+@app.post("/predict", response_model=FraudResponse, response_model_exclude_unset=True)
+async def predict(data: TransactionInput, request: Request, explain: bool = False):
+    t0 = perf_counter()
 
-    # 1️⃣ Check model loaded
-    if model is None:
-        raise HTTPException(
-            status_code=500,
-            detail="Fraud model not loaded"
-        )
+    # 1️⃣ Check model loaded (pinned for the whole request)
+    current = _current_model()
+    if explain:
+        _check_explainer(current)
 
     # 2️⃣ Prepare features safely
     try:
-        features = np.array([[ 
-            float(data.amount),
-            float(data.hour),
-            float(data.feature_3),
-            float(data.feature_4),
-            float(data.feature_5),
-            float(data.feature_6),
-            float(data.feature_7)
-        ]])
+        row = features_from_input(data)
     except Exception as e:
+        errors_total.inc(("invalid_input",))
         raise HTTPException(
             status_code=400,
             detail=f"Invalid input values: {str(e)}"
         )
 
+    # Velocity features from the card's history (recorded even when the
+    # model does not use them, so the store is warm for one that does)
+    if feature_store is not None and data.card_id is not None:
+        _fill_velocity(current, row, data.card_id, data.timestamp)
+
     # 3️⃣ Validate feature count
-    if hasattr(model, "n_features_in_"):
-        if features.shape[1] != model.n_features_in_:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Model expects {model.n_features_in_} features but received {features.shape[1]}"
+    _check_feature_count(current, len(row))
+    t1 = perf_counter()
+
+    # 4️⃣ Make prediction safely (cache, then shared batch when enabled;
+    # explanations always walk the full forest)
+    explanation = None
+    cache_key = canonical_key(current.version, row) if score_cache is not None and not explain else None
+    # the clock is only read at boundaries of stages that get exported
+    probability = None
+    t2 = t1
+    if cache_key is not None:
+        probability = score_cache.get(cache_key)
+        t2 = perf_counter()
+
+    if probability is not None:
+        model_version = current.version
+        t2a = t3 = t2
+    else:
+        t2a = t2
+        if admission is not None:
+            await _admit("high" if data.amount >= ADMISSION_HIGH_VALUE_AMOUNT else "normal")
+            t2a = perf_counter()
+        try:
+            if explain:
+                probabilities, raw, contributions = await run_in_threadpool(_explain, current, build_matrix([row]))
+                probability, model_version = float(probabilities[0]), current.version
+                explanation = _explanations(current, raw, contributions)[0]
+            elif batcher is not None:
+                probability, model_version = await batcher.submit(row)
+            else:
+                probability = float((await run_in_threadpool(_score, current, build_matrix([row])))[0])
+                model_version = current.version
+        finally:
+            if admission is not None:
+                admission.release()
+        t3 = perf_counter()
+        if score_cache is not None and not explain:
+            score_cache.put(canonical_key(model_version, row), probability)
+    probabilities = np.array([probability])
+
+    # 5️⃣ Risk logic (cutoffs of the model that scored the row)
+    policy = current.policy if model_version == current.version else _current_model().policy
+    response = FraudResponse(
+        fraud=bool(policy.fraud_flags(probabilities)[0]),
+        probability=round(probability, 4),
+        risk_level=str(policy.risk_levels(probabilities)[0]),
+        model_version=model_version
+    )
+    if explanation is not None:
+        response.explanation = explanation
+    t4 = perf_counter()
+
+    # 6️⃣ Audit log, drift sketch + shadow sample (never block the response)
+    if audit is not None:
+        audit.record([{
+            "amount": row[0],
+            "probability": probability,
+            "fraud": response.fraud,
+            "risk_level": response.risk_level
+        }])
+    sketch = drift
+    if sketch is not None:
+        sketch.observe(row, probability)
+    if shadow.candidates:
+        shadow.offer(build_matrix([row]), probabilities, policy)
+    t5 = perf_counter()
+
+    # stage durations for StageTimingMiddleware (NaN = stage skipped)
+    request.scope["predict_stages"] = ((
+        t1 - t0,
+        t2 - t1 if cache_key is not None else NAN,
+        t2a - t2 if admission is not None and t3 != t2 else NAN,
+        t3 - t2a if t3 != t2 else NAN,
+        t4 - t3,
+        t5 - t4 if audit is not None else NAN,
+    ), t5 - t0, ("predict", response.risk_level))
+    return response
+
+# -------------------------------------------------
+# BATCH PREDICT
+# -------------------------------------------------
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "100000"))
+
+
+@app.post("/predict/batch", response_model=BatchFraudResponse, response_model_exclude_unset=True)
+def predict_batch(batch: BatchTransactionInput, explain: bool = False):
+
+    # 1️⃣ Check model loaded (pinned for the whole request)
+    current = _current_model()
+    if explain:
+        _check_explainer(current)
+
+    if (batch.transactions is None) == (batch.columns is None):
+        errors_total.inc(("invalid_input",))
+        raise HTTPException(
+            status_code=400,
+            detail="Provide exactly one of 'transactions' or 'columns'"
+        )
+
+    # 2️⃣ Build one (N, 7) matrix, remembering per-row errors
+    if batch.transactions is not None:
+        n_rows = len(batch.transactions)
+        _check_batch_size(n_rows)
+        errors = [None] * n_rows
+        rows, records = [], []
+        for i, record in enumerate(batch.transactions):
+            row, errors[i] = record_to_row(record)
+            if row is not None:
+                rows.append(row)
+                records.append(record)
+        features = build_matrix(rows)
+        fill = _velocity_filler(current)
+        if fill is not None:
+            fill(features, records)
+    else:
+        _check_no_velocity(current, "columnar input")
+        _check_batch_size(len(next(iter(batch.columns.values()), [])))
+        try:
+            features, errors = columns_to_matrix(batch.columns)
+        except ValueError as e:
+            errors_total.inc(("invalid_input",))
+            raise HTTPException(status_code=400, detail=str(e))
+        n_rows = len(errors)
+        features = features[[e is None for e in errors]]
+
+    valid_index = [i for i, e in enumerate(errors) if e is None]
+
+    # 3️⃣ Validate feature count
+    _check_feature_count(current, features.shape[1])
+
+    # 4️⃣ Single model call for every valid row
+    results = [BatchItemResult(index=i, result=None, error=e) for i, e in enumerate(errors)]
+    if valid_index:
+        explanations = None
+        if explain:
+            probabilities, raw, contributions = _explain(current, features)
+            explanations = _explanations(current, raw, contributions)
+        else:
+            probabilities = _score(current, features)
+
+        # 5️⃣ Risk logic, vectorized over the batch
+        flags = current.policy.fraud_flags(probabilities).tolist()
+        risk_array = current.policy.risk_levels(probabilities)
+        risks = risk_array.tolist()
+        rounded = np.round(probabilities, 4).tolist()
+        _count_predictions("predict_batch", risk_array)
+
+        for j, i in enumerate(valid_index):
+            results[i].result = FraudResponse(
+                fraud=flags[j],
+                probability=rounded[j],
+                risk_level=risks[j],
+                model_version=current.version
             )
+            if explanations is not None:
+                results[i].result.explanation = explanations[j]
 
-    # 4️⃣ Make prediction safely
+        # 6️⃣ Audit log, drift sketch + shadow sample
+        _record_scored(current, features, probabilities, flags, risks)
+
+    return BatchFraudResponse(
+        model_version=current.version,
+        count=n_rows,
+        errors=n_rows - len(valid_index),
+        results=results
+    )
+
+# -------------------------------------------------
+# MATRIX PREDICT (BINARY FEATURE MATRIX IN, COLUMNS OUT)
+# -------------------------------------------------
+# Body: the (N, 7) feature matrix as raw little-endian float32
+# (application/octet-stream) or a .npy file (application/x-npy), decoded
+# with one np.frombuffer. Response by Accept (q values honoured, see
+# scoring.matrix_response_type): columnar JSON (default) or packed binary
+# columns (application/octet-stream, see scoring.encode_columns). Same checks, audit, drift and shadow as
+# /predict/batch; explanations stay on the JSON endpoints.
+@app.post("/predict/matrix")
+async def predict_matrix(request: Request):
+    current = _current_model()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in (RAW_MATRIX_TYPE, NPY_MATRIX_TYPE):
+        errors_total.inc(("invalid_input",))
+        raise HTTPException(
+            status_code=415,
+            detail=f"Send the feature matrix as {RAW_MATRIX_TYPE} (float32) or {NPY_MATRIX_TYPE}"
+        )
+    response_type = matrix_response_type(request.headers.get("accept"))
+    if response_type is None:
+        errors_total.inc(("invalid_input",))
+        raise HTTPException(
+            status_code=406,
+            detail=f"/predict/matrix responds with {JSON_TYPE} or {RAW_MATRIX_TYPE}"
+        )
+    binary_response = response_type == RAW_MATRIX_TYPE
+    body = await request.body()
+    return await run_in_threadpool(_predict_matrix, current, body, content_type, binary_response)
+
+
+def _predict_matrix(current, body, content_type, binary_response):
+    _check_no_velocity(current, "/predict/matrix")
     try:
-        if hasattr(model, "predict_proba"):
-            probability = float(model.predict_proba(features)[0][1])
+        features = decode_matrix(body, content_type, current.n_features_in_ or EXPECTED_FEATURES)
+    except ValueError as e:
+        errors_total.inc(("invalid_input",))
+        raise HTTPException(status_code=400, detail=str(e))
+    n_rows = len(features)
+    _check_batch_size(n_rows)
+
+    row_errors = matrix_errors(features)
+    if row_errors:
+        valid = np.ones(n_rows, dtype=bool)
+        valid[list(row_errors)] = False
+        scored = features[valid]
+    else:
+        valid, scored = None, features
+
+    probabilities = np.full(n_rows, np.nan)
+    codes = np.full(n_rows, REJECTED_CODE, dtype=np.uint8)
+    flags = np.zeros(n_rows, dtype=bool)
+    if len(scored):
+        p = _score(current, scored)
+        risk_codes = current.policy.risk_codes(p)
+        fraud = current.policy.fraud_flags(p)
+        if valid is None:
+            probabilities, codes, flags = p, risk_codes, fraud
         else:
-            # fallback if model has no predict_proba
-            prediction = model.predict(features)[0]
-            probability = float(prediction)
+            probabilities[valid], codes[valid], flags[valid] = p, risk_codes, fraud
+        risk_array = RISK_LABELS[risk_codes]
+        _count_predictions("predict_matrix", risk_array)
+        _record_scored(current, scored, p, fraud.tolist() if audit is not None else None,
+                       risk_array.tolist() if audit is not None else None)
+
+    headers = {
+        "X-Model-Version": current.version,
+        "X-Rows": str(n_rows),
+        "X-Errors": str(len(row_errors)),
+        "X-Risk-Labels": ",".join(RISK_LABELS.tolist()),
+    }
+    if binary_response:
+        return Response(encode_columns(probabilities, codes, flags), media_type=RAW_MATRIX_TYPE, headers=headers)
+
+    probability = np.round(probabilities, 4).tolist()
+    risk_level = RISK_LABELS[np.minimum(codes, len(RISK_LABELS) - 1)].tolist()
+    fraud = flags.tolist()
+    for i in row_errors:
+        # rejected, not scored: no verdict either way
+        probability[i] = risk_level[i] = fraud[i] = None
+    return JSONResponse({
+        "model_version": current.version,
+        "count": n_rows,
+        "errors": len(row_errors),
+        "probability": probability,
+        "fraud": fraud,
+        "risk_level": risk_level,
+        "row_errors": {str(i): e for i, e in row_errors.items()},
+    }, headers=headers)
+
+# -------------------------------------------------
+# STREAMING PREDICT (NDJSON IN, NDJSON OUT)
+# -------------------------------------------------
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "1000"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+STREAM_SPOOL_MEMORY_BYTES = int(os.getenv("STREAM_SPOOL_MEMORY_BYTES", str(8 << 20)))
+
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    # One TransactionInput JSON object per line; one result line per input
+    # line ({"index", "fraud", "probability", "risk_level", "model_version"}
+    # or {"index", "error"}), streamed back chunk by chunk
+    current = _current_model()
+    scorer = NDJSONScorer(
+        current,
+        chunk_rows=STREAM_CHUNK_ROWS,
+        max_line_bytes=STREAM_MAX_LINE_BYTES,
+        spool_memory=STREAM_SPOOL_MEMORY_BYTES,
+        on_scored=_on_stream_scored,
+        fill=_velocity_filler(current)
+    )
+    return DuplexStreamingResponse(
+        scorer.stream(request.stream()),
+        media_type="application/x-ndjson"
+    )
+
+# -------------------------------------------------
+# BATCHER STATS
+# -------------------------------------------------
+@app.get("/batcher/stats")
+def batcher_stats():
+    if batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **batcher.stats()}
+
+# -------------------------------------------------
+# CACHE STATS
+# -------------------------------------------------
+@app.get("/cache/stats")
+def cache_stats():
+    if score_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **score_cache.stats()}
+
+# -------------------------------------------------
+# ADMISSION STATS
+# -------------------------------------------------
+@app.get("/admission/stats")
+def admission_stats():
+    if admission is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission.stats()}
+
+# -------------------------------------------------
+# DECISION POLICY (CUTOFFS CHOSEN AT TRAINING TIME)
+# -------------------------------------------------
+@app.get("/model/decision")
+def model_decision():
+    current = _current_model()
+    return {"model_version": current.version, **current.policy.describe()}
+
+# -------------------------------------------------
+# SHADOW MODELS
+# -------------------------------------------------
+@app.get("/shadow/stats")
+def shadow_stats():
+    if not shadow.candidates:
+        return {"enabled": False}
+    current = active.current
+    return {"enabled": True, "primary": current.version if current is not None else None, **shadow.stats()}
+
+
+@app.put("/admin/shadow")
+async def set_shadow_models(request: ShadowConfigRequest, x_admin_token: str = Header(None)):
+    # Replaces the candidate set (empty list = off); loading runs off the loop
+    _check_admin(x_admin_token)
+    unknown = [v for v in request.versions if v not in registry.versions() + ["baseline"]]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown model version(s) {unknown}")
+    try:
+        versions = await run_in_threadpool(shadow.set_candidates, request.versions)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Shadow models not loaded: {str(e)}")
+    return {"versions": versions}
+
+
+@app.post("/admin/shadow/reset")
+def reset_shadow_stats(x_admin_token: str = Header(None)):
+    _check_admin(x_admin_token)
+    shadow.reset()
+    return shadow_stats()
+
+# -------------------------------------------------
+# DRIFT
+# -------------------------------------------------
+@app.get("/drift")
+def drift_report(window_seconds: Optional[float] = None, local: bool = False):
+    # PSI / KS per input column and for the score over the last
+    # window_seconds (default: the whole window), all workers merged
+    # unless local=true
+    sketch = drift
+    if sketch is None:
+        return {"enabled": False}
+    report, workers = _drift_report(sketch, window_seconds, local)
+    return {
+        "enabled": True,
+        "model_version": sketch.key,
+        "workers": workers,
+        "window_seconds": min(window_seconds or sketch.window_seconds, sketch.window_seconds),
+        **report,
+        "sketch": sketch.stats(),
+    }
+
+# -------------------------------------------------
+# FEATURE STORE
+# -------------------------------------------------
+@app.get("/features/stats")
+def feature_store_stats():
+    if feature_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **feature_store.stats()}
+
+
+@app.get("/admin/features/{card_id}")
+def card_features(card_id: str, x_admin_token: str = Header(None)):
+    # Current velocity features of one card, without recording anything
+    _check_admin(x_admin_token)
+    if feature_store is None:
+        raise HTTPException(status_code=404, detail="Feature store is disabled")
+    return {"card_id": card_id, **dict(zip(VELOCITY_FEATURES, feature_store.peek(card_id, time.time())))}
+
+# -------------------------------------------------
+# AUDIT STATS
+# -------------------------------------------------
+@app.get("/audit/stats")
+def audit_stats():
+    if audit is None:
+        return {"enabled": False}
+    return {"enabled": True, **audit.stats()}
+
+# -------------------------------------------------
+# PREDICTION ROLLUPS (TIME-RANGE AGGREGATES)
+# -------------------------------------------------
+# The audit writer creates the schema at import; with the audit log off
+# this endpoint creates it on first use (rollups may come from other
+# workers, or rebuild_rollups)
+rollup_schema = {"ready": audit is not None, "lock": threading.Lock()}
+
+
+@app.get("/stats/rollups")
+def prediction_rollups(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = "hour",
+    risk_level: Optional[str] = None
+):
+    # Counts / fraud rate / mean probability per bucket and risk tier, read
+    # from the rollup tables (never scans fraud_predictions); default range
+    # is the last 24 hours, times are UTC
+    if not os.getenv("DATABASE_URL"):
+        raise HTTPException(status_code=404, detail="Database is not configured (DATABASE_URL)")
+    from .database import SessionLocal, engine as db_engine
+    from .rollups import RESOLUTIONS, ensure_schema, query_rollups
+
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown resolution '{resolution}', use one of {list(RESOLUTIONS)}"
+        )
+    if not rollup_schema["ready"]:
+        with rollup_schema["lock"]:
+            if not rollup_schema["ready"]:
+                ensure_schema(db_engine)
+                rollup_schema["ready"] = True
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(hours=24)
+    session = SessionLocal()
+    try:
+        return query_rollups(session, start, end, resolution, risk_level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        session.close()
+
+# -------------------------------------------------
+# PROMETHEUS METRICS
+# -------------------------------------------------
+def _metrics():
+    # Collected on every scrape; gauges read live state, nothing is cached
+    current = active.current
+    metrics = [
+        predict_stages,
+        model_call_seconds,
+        loop_lag_seconds,
+        predictions_total,
+        errors_total,
+        Gauge("model_info", "Model currently served by this worker",
+              lambda: {(current.version, current.engine): 1} if current is not None else {},
+              ("version", "engine")),
+        Gauge("ready", "1 once the model is loaded and warmed up",
+              lambda: 1 if _is_ready() else 0),
+        Gauge("startup_seconds", "Cold start: module import, model load + warm-up, import start to ready",
+              lambda: {(k[:-len("_seconds")],): v for k, v in startup.items() if k.endswith("_seconds") and v is not None},
+              ("phase",)),
+    ]
+    if score_cache is not None:
+        metrics += [
+            Gauge("score_cache_entries", "Entries in the score cache", lambda: score_cache.stats()["entries"]),
+            Gauge("score_cache_lookups", "Score cache lookups by result",
+                  lambda: {("hit",): score_cache.hits, ("miss",): score_cache.misses},
+                  ("result",), kind="counter"),
+        ]
+    if feature_store is not None:
+        metrics += [
+            Gauge("feature_store_keys", "Cards tracked by the velocity feature store",
+                  lambda: feature_store.stats()["keys"]),
+            Gauge("feature_store_evictions", "Cards dropped from the feature store by reason",
+                  lambda: {("capacity",): feature_store.evictions, ("idle",): feature_store.idle_evictions},
+                  ("reason",), kind="counter"),
+        ]
+    sketch = drift
+    if sketch is not None:
+        report, _ = _drift_report(sketch)
+        metrics += [
+            Gauge("drift_window_rows", "Rows in the drift window (all workers)", lambda: report["rows"]),
+            Gauge("drift_psi", "Population stability index vs the training profile",
+                  lambda: {(name,): c["psi"] for name, c in report["columns"].items() if c["psi"] is not None},
+                  ("column",)),
+            Gauge("drift_ks", "Binned Kolmogorov-Smirnov statistic vs the training profile",
+                  lambda: {(name,): c["ks"] for name, c in report["columns"].items() if c["ks"] is not None},
+                  ("column",)),
+        ]
+    if shadow.candidates:
+        metrics += [
+            Gauge("shadow_queued_rows", "Rows waiting for shadow scoring", shadow.queued_rows),
+            Gauge("shadow_rows", "Rows offered to shadow scoring by outcome",
+                  lambda: {(k,): v for k, v in shadow.counters.items()}, ("outcome",), kind="counter"),
+            Gauge("shadow_candidate_rows", "Rows scored per candidate and how many changed a decision",
+                  lambda: _shadow_candidate_rows(), ("version", "result"), kind="counter"),
+        ]
+    if admission is not None:
+        metrics += [
+            Gauge("admission_in_flight", "Requests holding an admission slot", lambda: admission.in_flight),
+            Gauge("admission_queued", "Requests waiting for an admission slot by lane",
+                  lambda: {(lane,): n for lane, n in admission.queued().items()}, ("lane",)),
+            Gauge("admission_admitted", "Admitted requests by lane",
+                  lambda: {(lane,): n for lane, n in admission.admitted.items()}, ("lane",), kind="counter"),
+            Gauge("admission_shed", "Requests rejected with 503 by lane and reason",
+                  lambda: dict(admission.shed), ("lane", "reason"), kind="counter"),
+        ]
+    if batcher is not None:
+        metrics += [
+            batcher.batch_size,
+            batcher.queue_wait,
+            Gauge("batcher_queued", "Requests waiting for a batch",
+                  lambda: batcher.stats()["queued"]),
+        ]
+    if audit is not None:
+        metrics += [
+            Gauge("audit_queue_depth", "Audit rows buffered in memory", lambda: audit.stats()["queue_depth"]),
+            Gauge("audit_rows", "Audit rows by outcome",
+                  lambda: {(k,): v for k, v in audit.counters.items() if "flushes" not in k},
+                  ("outcome",), kind="counter"),
+            Gauge("audit_flushes", "Audit bulk INSERTs by result",
+                  lambda: {("ok",): audit.counters["flushes"], ("failed",): audit.counters["failed_flushes"]},
+                  ("result",), kind="counter"),
+        ]
+    return metrics
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(
+        render_prometheus(_metrics(), prefix=METRICS_PREFIX),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+# -------------------------------------------------
+# SAMPLING PROFILER (OFF UNTIL STARTED)
+# -------------------------------------------------
+@app.get("/admin/profiler")
+def profiler_status(x_admin_token: str = Header(None)):
+    _check_admin(x_admin_token)
+    return profiler.status()
+
+
+@app.post("/admin/profiler/start", status_code=202)
+def profiler_start(interval_ms: float = 5.0, duration_s: Optional[float] = None,
+                   x_admin_token: str = Header(None)):
+    _check_admin(x_admin_token)
+    if interval_ms <= 0:
+        raise HTTPException(status_code=400, detail="interval_ms must be positive")
+    if not profiler.start(interval_ms / 1000.0, duration_s):
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    return profiler.status()
+
+
+@app.post("/admin/profiler/stop")
+def profiler_stop(x_admin_token: str = Header(None)):
+    _check_admin(x_admin_token)
+    profiler.stop()
+    return profiler.status()
+
+
+@app.get("/admin/profiler/stacks", response_class=PlainTextResponse)
+def profiler_stacks(limit: Optional[int] = None, x_admin_token: str = Header(None)):
+    # Collapsed stacks ("frame;frame;frame count"), feed to flamegraph.pl or speedscope
+    _check_admin(x_admin_token)
+    return PlainTextResponse(profiler.collapsed(limit))
+
+# -------------------------------------------------
+# MODEL ADMIN (ROLL FORWARD / BACK WITHOUT RESTARTS)
+# -------------------------------------------------
+@app.get("/admin/models")
+def list_models(x_admin_token: str = Header(None)):
+    _check_admin(x_admin_token)
+    return {
+        "active": active.version,
+        "registry_active": registry.active_version(),
+        "reload": active.status,
+        "versions": [registry.metadata(v) for v in registry.versions()]
+    }
+
+
+@app.post("/admin/models/reload", status_code=202)
+def reload_model(request: ModelActivateRequest = None, x_admin_token: str = Header(None)):
+    # Load + warm in the background, then swap; serving continues meanwhile
+    _check_admin(x_admin_token)
+    version = request.version if request is not None else None
+    if version is not None and version not in registry.versions() + ["baseline"]:
+        raise HTTPException(status_code=404, detail=f"Unknown model version '{version}'")
+    if not active.reload(version):
+        raise HTTPException(status_code=409, detail="A model reload is already running")
+    return active.status
+
+
+@app.post("/admin/models/activate", status_code=202)
+def activate_model(request: ModelActivateRequest, x_admin_token: str = Header(None)):
+    # Moves the registry pointer (picked up by every watching worker) and
+    # reloads this worker right away
+    _check_admin(x_admin_token)
+    if request.version is None:
+        raise HTTPException(status_code=400, detail="version is required")
+    try:
+        registry.set_active(request.version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not active.reload(request.version):
+        raise HTTPException(status_code=409, detail="A model reload is already running")
+    return active.status
+
+# -------------------------------------------------
+# HELPERS
+# -------------------------------------------------
+def _current_model():
+    current = active.current
+    if current is None:
+        if startup["state"] == "starting":
+            errors_total.inc(("model_starting",))
+            raise HTTPException(
+                status_code=503,
+                detail="Fraud model is still loading",
+                headers={"Retry-After": "1"}
+            )
+        errors_total.inc(("model_not_loaded",))
+        raise HTTPException(
+            status_code=500,
+            detail="Fraud model not loaded"
+        )
+    return current
+
+
+def _check_feature_count(current, n_features):
+    expected = current.n_features_in_
+    if expected is not None and n_features != expected:
+        errors_total.inc(("feature_count",))
+        raise HTTPException(
+            status_code=500,
+            detail=f"Model expects {expected} features but received {n_features}"
+        )
+
+
+def _check_batch_size(n_rows):
+    if n_rows > MAX_BATCH_ROWS:
+        errors_total.inc(("batch_too_large",))
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {n_rows} rows, limit is {MAX_BATCH_ROWS}"
+        )
+
+
+async def _admit(lane):
+    try:
+        await admission.acquire(lane)
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server overloaded ({e.reason}), retry later",
+            headers={"Retry-After": str(admission.retry_after)}
+        )
+
+
+def _score(current, features):
+    try:
+        started = perf_counter()
+        probabilities = score_matrix(current.scorer, features, current.policy)
+        model_call_seconds.observe(perf_counter() - started)
+        return probabilities
     except Exception as e:
+        errors_total.inc(("prediction_failed",))
         raise HTTPException(
             status_code=500,
             detail=f"Prediction failed: {str(e)}"
         )
 
-    # 5️⃣ Risk logic
-    fraud = probability >= 0.5
 
-    if probability < 0.30:
-        risk = "LOW"
-    elif probability < 0.70:
-        risk = "MEDIUM"
-    else:
-        risk = "HIGH"
+def _check_explainer(current):
+    if current.explainer is None:
+        errors_total.inc(("explain_unavailable",))
+        raise HTTPException(
+            status_code=400,
+            detail="Explanations are not available for this model (EXPLAIN_ENABLED is off "
+                   "or the engine has no tree structure)"
+        )
 
-    return FraudResponse(
-        fraud=fraud,
-        probability=round(probability, 4),
-        risk_level=risk
-    )
\ No newline at end of file
+
+def _explain(current, features):
+    # One leaf walk gives the score and the attributions
+    try:
+        started = perf_counter()
+        raw, contributions = current.explainer.explain(features)
+        model_call_seconds.observe(perf_counter() - started)
+        return current.policy.calibrate(raw), raw, contributions
+    except Exception as e:
+        errors_total.inc(("prediction_failed",))
+        raise HTTPException(
+            status_code=500,
+            detail=f"Prediction failed: {str(e)}"
+        )
+
+
+def _explanations(current, raw, contributions):
+    # API field names; velocity columns are named after what fills them
+    names = list(FEATURE_NAMES)
+    for column, k in current.velocity_slots:
+        names[column] = VELOCITY_FEATURES[k]
+    base = round(current.explainer.bias, 6)
+    return [
+        Explanation(base_value=base, raw_score=round(score, 6),
+                    contributions=dict(zip(names, np.round(row, 6).tolist())))
+        for score, row in zip(raw.tolist(), contributions)
+    ]
+
+
+def _fill_velocity(current, row, card_id, timestamp, now=None):
+    # Client timestamps are trusted only within FEATURE_STORE_MAX_SKEW_SECONDS
+    # of the server clock; anything further off would move the card's ring
+    # into the future (or past) and skip its real transactions
+    now = time.time() if now is None else now
+    ts = now
+    if timestamp is not None:
+        ts = min(max(timestamp, now - FEATURE_STORE_MAX_SKEW), now + FEATURE_STORE_MAX_SKEW)
+    velocity = feature_store.observe(card_id, ts, row[0])
+    for column, k in current.velocity_slots:
+        row[column] = velocity[k]
+
+
+def _velocity_filler(current):
+    # fill(features, records) for the batch / stream paths: what /predict
+    # does, for every record with a card_id, in row order
+    if feature_store is None:
+        return None
+
+    def fill(features, records):
+        now = time.time()
+        for row, record in zip(features, records):
+            if record.get("card_id") is not None:
+                _fill_velocity(current, row, record["card_id"], record.get("timestamp"), now)
+    return fill
+
+
+def _check_no_velocity(current, path):
+    # columns / binary matrices carry no card_id to look the history up by
+    if current.velocity_slots:
+        errors_total.inc(("velocity_unsupported",))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model {current.version} uses velocity features, which {path} cannot fill "
+                   f"(no card_id); send records to /predict/batch or /predict/stream"
+        )
+
+
+def _score_batched(features):
+    # One model for the whole micro-batch; each row learns which one scored it
+    current = _current_model()
+    return [(p, current.version) for p in _score(current, features).tolist()]
+
+
+def _record_scored(current, features, probabilities, flags, risks):
+    # Audit log (buffered, never blocks on the database), drift sketch and
+    # shadow sample for a scored matrix; flags / risks: per-row lists, only
+    # read when the audit log is on
+    if audit is not None:
+        audit.record([
+            {"amount": amount, "probability": p, "fraud": f, "risk_level": r}
+            for amount, p, f, r in zip(
+                features[:, 0].tolist(), probabilities.tolist(), flags, risks
+            )
+        ])
+    sketch = drift
+    if sketch is not None:
+        sketch.observe_many(features, probabilities)
+    shadow.offer(features, probabilities, current.policy)
+
+
+def _count_predictions(endpoint, risks):
+    labels, counts = np.unique(risks, return_counts=True)
+    for label, count in zip(labels.tolist(), counts.tolist()):
+        predictions_total.inc((endpoint, label), count)
+
+
+def _on_stream_scored(current, features, probabilities, flags, risks):
+    # same post-score hook as /predict/batch and /predict/matrix
+    _count_predictions("predict_stream", risks)
+    _record_scored(current, features, probabilities, flags, risks)
+
+
+async def _monitor_loop_lag(interval):
+    # A starved loop wakes this timer late; the delay is the lag every
+    # request on this worker saw at that moment
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        loop_lag_seconds.observe(max(0.0, loop.time() - expected))
+
+
+def _shadow_candidate_rows():
+    out = {}
+    for version, (_, stats) in list(shadow.candidates.items()):
+        tiers = stats.tiers
+        out[(version, "scored")] = stats.rows
+        out[(version, "flag_changed")] = stats.rows - stats.flag_agreements
+        out[(version, "tier_changed")] = int(tiers.sum() - np.trace(tiers))
+    return out
+
+
+def _drift_snapshot_path():
+    return snapshot_path(DRIFT_SHARED_DIR, os.getpid())
+
+
+def _drift_report(sketch, window_seconds=None, local=False):
+    now = time.time()
+    buckets, workers = sketch.buckets(now), 1
+    if DRIFT_SHARED_DIR and not local:
+        others, n = shared_buckets(sketch, DRIFT_SHARED_DIR, exclude=_drift_snapshot_path(), now=now)
+        buckets, workers = merge_buckets(buckets, others), workers + n
+    return sketch.report(sketch.window_counts(buckets, window_seconds, now), DRIFT_PSI_ALERT), workers
+
+
+def _save_drift_snapshot():
+    sketch = drift
+    if sketch is None:
+        return
+    try:
+        os.makedirs(DRIFT_SHARED_DIR, exist_ok=True)
+        sketch.save(_drift_snapshot_path())
+    except Exception as e:
+        print("⚠️ Drift snapshot failed:", str(e))
+
+
+def _remove_drift_snapshot():
+    try:
+        os.remove(_drift_snapshot_path())
+    except FileNotFoundError:
+        pass
+
+
+async def _share_drift(interval):
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(_save_drift_snapshot)
+
+
+def _save_feature_store():
+    try:
+        feature_store.evict_idle(time.time())
+        feature_store.save(FEATURE_STORE_SNAPSHOT_PATH)
+    except Exception as e:
+        print("⚠️ Feature store snapshot failed:", str(e))
+
+
+async def _snapshot_feature_store(interval):
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(_save_feature_store)
+
+
+async def _fold_metrics(interval):
+    # keeps pending stage timings short so a scrape never folds a backlog
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(predict_stages.fold)
+
+
+def _check_admin(token):
+    # fail closed: no ADMIN_TOKEN configured means no admin access at all
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+startup["import_seconds"] = round(perf_counter() - IMPORT_STARTED, 3)
@@ -0,0 +1,223 @@
+import bisect
+import threading
+from collections import Counter as Tally, deque
+from itertools import chain
+
+import numpy as np
+
+# -------------------------------------------------
+# FIXED-BUCKET HISTOGRAM
+# -------------------------------------------------
+# Buckets are fixed up front so observe() is a bisect and three increments
+# under a lock (threadpool handlers observe concurrently), cheap enough to
+# call on every request.
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": buckets,
+        }
+
+    def collect(self):
+        cumulative = 0
+        samples = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            samples.append(("_bucket", {"le": _format_bound(bound)}, cumulative))
+        samples.append(("_sum", {}, self.sum))
+        samples.append(("_count", {}, self.count))
+        return "histogram", samples
+
+
+# -------------------------------------------------
+# STAGE TIMINGS (DEFERRED AGGREGATION)
+# -------------------------------------------------
+# The hot path only appends one tuple of stage durations per request to a
+# deque (append / popleft are thread-safe, so no lock on the event loop).
+# The tuples are folded into fixed-bucket histograms with NumPy on scrape
+# and by a periodic background fold (off the request path). A tuple can
+# also carry a label for `tally`, a Counter bumped at fold time, so a
+# per-request count costs nothing extra on the hot path. The caller still
+# pays a clock read per stage boundary it measures. MAX_PENDING only
+# bounds memory when nothing folds.
+
+
+class StageHistograms:
+    MAX_PENDING = 65536
+
+    def __init__(self, name, description, stages, buckets, tally=None):
+        self.name = name
+        self.description = description
+        self.stages = tuple(stages)
+        self.buckets = np.asarray(sorted(buckets), dtype=np.float64)
+        self.counts = np.zeros((len(self.stages), len(self.buckets) + 1), dtype=np.int64)
+        self.sums = np.zeros(len(self.stages))
+        self.count = 0
+        self.tally = tally
+        self._pending = deque()
+        self._fold_lock = threading.Lock()
+
+    def record(self, durations, label=None):
+        # durations: one float per stage, in self.stages order (NaN = skipped);
+        # label: labels tuple for self.tally, or None
+        self._pending.append((durations, label))
+        if len(self._pending) >= self.MAX_PENDING:
+            self.fold()
+
+    def fold(self):
+        with self._fold_lock:
+            # only what was there when the fold started; later appends wait
+            pending = self._pending
+            batch = [pending.popleft() for _ in range(len(pending))]
+            if batch:
+                self._fold(batch)
+
+    def _fold(self, pending):
+        n_stages = len(self.stages)
+        values = np.fromiter(
+            chain.from_iterable(d for d, _ in pending), np.float64, count=len(pending) * n_stages
+        ).reshape(len(pending), n_stages)
+        n_slots = self.counts.shape[1]
+        observed = ~np.isnan(values)
+        # one bincount over (stage, bucket) pairs for every stage at once
+        slots = np.searchsorted(self.buckets, values, side="left")
+        slots += np.arange(len(self.stages)) * n_slots
+        self.counts += np.bincount(slots[observed], minlength=self.counts.size).reshape(self.counts.shape)
+        self.sums += np.where(observed, values, 0.0).sum(axis=0)
+        self.count += len(pending)
+        if self.tally is not None:
+            for label, n in Tally(label for _, label in pending if label is not None).items():
+                self.tally.inc(label, n)
+
+    def snapshot(self):
+        self.fold()
+        out = {}
+        for i, stage in enumerate(self.stages):
+            cumulative = np.cumsum(self.counts[i]).tolist()
+            out[stage] = {
+                "count": cumulative[-1],
+                "sum": round(float(self.sums[i]), 6),
+                "buckets": dict(zip(
+                    [_format_bound(b) for b in self.buckets.tolist()] + ["+Inf"], cumulative
+                )),
+            }
+        return out
+
+    def collect(self):
+        self.fold()
+        samples = []
+        bounds = [_format_bound(b) for b in self.buckets.tolist()] + ["+Inf"]
+        for i, stage in enumerate(self.stages):
+            for bound, cumulative in zip(bounds, np.cumsum(self.counts[i]).tolist()):
+                samples.append(("_bucket", {"stage": stage, "le": bound}, cumulative))
+            samples.append(("_sum", {"stage": stage}, float(self.sums[i])))
+            samples.append(("_count", {"stage": stage}, int(self.counts[i].sum())))
+        return "histogram", samples
+
+
+# -------------------------------------------------
+# COUNTERS / GAUGES
+# -------------------------------------------------
+class Counter:
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()  # inc() runs in threadpool handlers too
+
+    def inc(self, labels=(), amount=1):
+        # labels: tuple of label values in labelnames order
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def _items(self):
+        with self._lock:
+            return list(self.values.items())
+
+    def snapshot(self):
+        if not self.labelnames:
+            return self.values.get((), 0)
+        return {"/".join(map(str, k)): v for k, v in self._items()}
+
+    def collect(self):
+        return "counter", [
+            ("_total", dict(zip(self.labelnames, labels)), value)
+            for labels, value in sorted(self._items())
+        ]
+
+
+class Gauge:
+    # Read at scrape time: fn() returns a number, or {label tuple: number}
+    def __init__(self, name, description, fn, labelnames=(), kind="gauge"):
+        self.name = name
+        self.description = description
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind  # "counter" for monotonic totals owned by another object
+
+    def collect(self):
+        value = self.fn()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        suffix = "_total" if self.kind == "counter" else ""
+        return self.kind, [
+            (suffix, dict(zip(self.labelnames, labels)), v)
+            for labels, v in items if v is not None
+        ]
+
+
+# -------------------------------------------------
+# PROMETHEUS TEXT EXPOSITION
+# -------------------------------------------------
+def render_prometheus(metrics, prefix=""):
+    lines = []
+    for metric in metrics:
+        kind, samples = metric.collect()
+        name = prefix + metric.name
+        lines.append(f"# HELP {name} {metric.description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -1,4 +1,113 @@
-import joblib
+import os
+import time
 
-# Load trained model
-model = joblib.load("artifacts/fraud_model.pkl")
\ No newline at end of file
+import numpy as np
+
+from .feature_store import velocity_slots
+from .forest import (
+    CompiledForest,
+    ForestExplainer,
+    compile_forest,
+    file_sha256,
+    forest_path_for,
+    load_forest,
+    verify_forest,
+)
+from .scoring import DecisionPolicy
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = os.path.join(os.path.dirname(BASE_DIR), "artifacts")
+MODEL_PATH = os.path.join(ARTIFACTS_DIR, "fraud_model.pkl")
+
+
+# -------------------------------------------------
+# LOADED MODEL (ONE IMMUTABLE UNIT PER VERSION)
+# -------------------------------------------------
+class LoadedModel:
+    def __init__(self, version, estimator, scorer, engine, metadata=None):
+        self.version = version
+        self.estimator = estimator    # original fitted object (None when memory-mapped)
+        self.scorer = scorer          # what predict_proba is called on
+        self.engine = engine          # "native-mmap", "native" or "sklearn"
+        self.metadata = metadata or {}
+        self.loaded_at = time.time()
+        # model columns the feature store fills, from the training feature list
+        self.velocity_slots = velocity_slots(self.metadata.get("features"))
+        # cutoffs / calibration chosen at training time (defaults otherwise)
+        self.policy = DecisionPolicy.from_metadata(self.metadata)
+        self.explainer = None         # ForestExplainer when loaded with explain=True
+
+    @property
+    def n_features_in_(self):
+        source = self.estimator if self.estimator is not None else self.scorer
+        return getattr(source, "n_features_in_", None)
+
+
+def load_model(path=MODEL_PATH, version="baseline", engine="native", metadata=None, explain=False):
+    # explain: precompute per-node feature attributions (ForestExplainer)
+    loaded = _load_model(path, version, engine, metadata)
+    if explain:
+        try:
+            loaded.explainer = ForestExplainer(_full_forest(loaded))
+        except Exception as e:
+            print(f"⚠️ [{version}] Explanations unavailable:", str(e))
+    return loaded
+
+
+def _full_forest(loaded):
+    # the flattened forest behind any engine (compiled on demand for sklearn)
+    if isinstance(loaded.scorer, CompiledForest):
+        return loaded.scorer
+    return compile_forest(loaded.estimator)
+
+
+def _load_model(path, version, engine, metadata):
+    # Native engine: map the .forest export when present (shared across
+    # workers, no unpickling); otherwise unpickle and compile in-process
+    forest_file = forest_path_for(path)
+    if engine == "native" and os.path.exists(forest_file):
+        try:
+            forest = load_forest(forest_file)
+            source = forest.metadata.get("source_sha256")
+            if not os.path.exists(path) or source is None or source == file_sha256(path):
+                return LoadedModel(version, None, forest, "native-mmap", metadata)
+            print(f"⚠️ [{version}] {forest_file} was exported from a different pickle, ignoring it")
+        except Exception as e:
+            print(f"⚠️ [{version}] Could not map {forest_file}:", str(e))
+
+    import joblib
+
+    estimator = joblib.load(path)
+
+    scorer = estimator
+    used_engine = "sklearn"
+    if engine == "native":
+        try:
+            compiled = compile_forest(estimator)
+            if verify_forest(compiled, estimator):
+                scorer = compiled
+                used_engine = "native"
+            else:
+                print(f"⚠️ [{version}] Native forest disagrees with sklearn, using sklearn")
+        except Exception as e:
+            print(f"⚠️ [{version}] Native forest compile failed, using sklearn:", str(e))
+
+    return LoadedModel(version, estimator, scorer, used_engine, metadata)
+
+
+def warm_model(loaded, batch_sizes=(1, 64)):
+    # First calls allocate buffers and fault pages in; pay that before
+    # the model takes traffic
+    n_features = loaded.n_features_in_ or 7
+    for n in batch_sizes:
+        loaded.scorer.predict_proba(np.zeros((n, n_features)))
+        if loaded.explainer is not None:
+            loaded.explainer.explain(np.zeros((n, n_features)))
+
+
+def __getattr__(name):
+    # Legacy `from inference_api.model_loader import model`, loaded on first use
+    if name == "model":
+        globals()["model"] = load_model(MODEL_PATH, engine="sklearn").estimator
+        return globals()["model"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, Boolean, String, DateTime
+from sqlalchemy import Column, Integer, Float, Boolean, String, DateTime, Index
 from datetime import datetime
 from .database import Base
 
@@ -10,4 +10,27 @@ class FraudPrediction(Base):
     probability = Column(Float)
     fraud = Column(Boolean)
     risk_level = Column(String(10))
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # time-range queries filtered by tier
+    __table_args__ = (
+        Index("ix_fraud_predictions_risk_level_created_at", "risk_level", "created_at"),
+    )
+
+
+# Per-bucket aggregates kept up to date by the audit writer (see rollups.py);
+# the primary key is the range-scan index
+class RollupColumns:
+    bucket_start = Column(DateTime, primary_key=True)
+    risk_level = Column(String(10), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    fraud_count = Column(Integer, nullable=False, default=0)
+    probability_sum = Column(Float, nullable=False, default=0.0)
+
+
+class PredictionRollupMinute(RollupColumns, Base):
+    __tablename__ = "prediction_rollups_minute"
+
+
+class PredictionRollupHour(RollupColumns, Base):
+    __tablename__ = "prediction_rollups_hour"
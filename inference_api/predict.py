@@ -1,5 +1,6 @@
 import numpy as np
 from inference_api.model_loader import model
+from inference_api.scoring import fraud_flags, risk_levels
 
 def predict_fraud(data):
     X = np.array([[
@@ -12,13 +13,7 @@ def predict_fraud(data):
         data.v5
     ]])
 
-    prob = model.predict_proba(X)[0][1]
+    prob = model.predict_proba(X)[:, 1]
 
-    if prob > 0.8:
-        risk = "HIGH"
-    elif prob > 0.5:
-        risk = "MEDIUM"
-    else:
-        risk = "LOW"
-
-    return prob > 0.5, round(prob, 4), risk
\ No newline at end of file
+    # same cutoffs as the API (scoring.py)
+    return bool(fraud_flags(prob)[0]), round(float(prob[0]), 4), str(risk_levels(prob)[0])
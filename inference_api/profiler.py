@@ -0,0 +1,95 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+# -------------------------------------------------
+# SAMPLING PROFILER (SWITCHED ON AT RUNTIME)
+# -------------------------------------------------
+# A daemon thread wakes every `interval` seconds, grabs every other
+# thread's current stack with sys._current_frames() and counts it in
+# collapsed "outer;...;inner" form (flamegraph.pl / speedscope input).
+# Nothing runs while it is stopped, so it costs nothing until switched on.
+
+MAX_DEPTH = 64
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = None
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.005, duration=None):
+        # Returns False when already running. duration: auto-stop after N seconds
+        with self._lock:
+            if self.running:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = float(interval)
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(duration,), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _run(self, duration):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        names = {}
+        while not self._stop.wait(self.interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own_id:
+                    continue
+                self.stacks[_collapse(frame, names)] += 1
+            self.samples += 1
+            del frames
+        self.stopped_at = time.time()
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000 if self.interval else None,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
+
+    def collapsed(self, limit=None):
+        # Text with one "stack count" line per distinct stack, hottest first
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common(limit))
+
+
+def _collapse(frame, names):
+    parts = []
+    while frame is not None and len(parts) < MAX_DEPTH:
+        code = frame.f_code
+        name = names.get(code)
+        if name is None:
+            name = names[code] = f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+        parts.append(name)
+        frame = frame.f_back
+    return ";".join(reversed(parts))
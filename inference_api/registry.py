@@ -0,0 +1,256 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from .forest import forest_path_for
+from .model_loader import ARTIFACTS_DIR, MODEL_PATH, load_model, warm_model
+
+# -------------------------------------------------
+# VERSIONED MODEL REGISTRY
+# -------------------------------------------------
+# Layout:
+#   artifacts/registry/<version>/fraud_model.pkl
+#   artifacts/registry/<version>/fraud_model.forest   (optional mmap export)
+#   artifacts/registry/<version>/metadata.json
+#   artifacts/registry/ACTIVE            <- name of the version to serve
+#
+# With an empty registry the legacy artifacts/fraud_model.pkl is served
+# as version "baseline".
+
+REGISTRY_DIR = os.path.join(ARTIFACTS_DIR, "registry")
+MODEL_FILENAME = "fraud_model.pkl"
+METADATA_FILENAME = "metadata.json"
+ACTIVE_FILENAME = "ACTIVE"
+BASELINE_VERSION = "baseline"
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR, fallback_path=MODEL_PATH):
+        self.root = root
+        self.fallback_path = fallback_path
+
+    def version_dir(self, version):
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            v for v in os.listdir(self.root)
+            if not v.endswith(".staging") and self._has_model(v)
+        )
+
+    def _has_model(self, version):
+        path = os.path.join(self.version_dir(version), MODEL_FILENAME)
+        return os.path.isfile(path) or os.path.isfile(forest_path_for(path))
+
+    def metadata(self, version):
+        path = os.path.join(self.version_dir(version), METADATA_FILENAME)
+        if not os.path.exists(path):
+            return {"version": version}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def active_version(self):
+        path = os.path.join(self.root, ACTIVE_FILENAME)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                version = f.read().strip()
+            if version:
+                return version
+        versions = self.versions()
+        return versions[-1] if versions else BASELINE_VERSION
+
+    def active_marker(self):
+        # Cheap change detector for the file watcher
+        path = os.path.join(self.root, ACTIVE_FILENAME)
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def set_active(self, version):
+        if version != BASELINE_VERSION and version not in self.versions():
+            raise KeyError(f"Unknown model version '{version}'")
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, ACTIVE_FILENAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILENAME))
+
+    def model_path(self, version):
+        if version == BASELINE_VERSION:
+            return self.fallback_path
+        if not self._has_model(version):
+            raise KeyError(f"Unknown model version '{version}'")
+        return os.path.join(self.version_dir(version), MODEL_FILENAME)
+
+    def load(self, version, engine="native", explain=False):
+        return load_model(self.model_path(version), version, engine, self.metadata(version), explain)
+
+    def register(self, model_file, metadata=None, version=None, activate=False):
+        # Copy a saved model into the registry as a new immutable version
+        version = version or datetime.utcnow().strftime("v%Y%m%d-%H%M%S")
+        target = self.version_dir(version)
+        if os.path.exists(target):
+            raise FileExistsError(f"Model version '{version}' already exists")
+
+        staging = target + ".staging"
+        os.makedirs(staging, exist_ok=True)
+        shutil.copyfile(model_file, os.path.join(staging, MODEL_FILENAME))
+        if os.path.exists(forest_path_for(model_file)):
+            shutil.copyfile(
+                forest_path_for(model_file),
+                forest_path_for(os.path.join(staging, MODEL_FILENAME))
+            )
+        metadata = {
+            "version": version,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            **(metadata or {}),
+        }
+        with open(os.path.join(staging, METADATA_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(staging, target)
+
+        if activate:
+            self.set_active(version)
+        return version
+
+
+# -------------------------------------------------
+# ACTIVE MODEL (LOAD + WARM IN BACKGROUND, ATOMIC SWAP)
+# -------------------------------------------------
+# Handlers read `active.current` once per request and use that object for
+# the whole request, so a swap never mixes two models inside one call and
+# in-flight requests finish on the model they started with.
+
+
+class ActiveModel:
+    def __init__(self, registry, engine="native", on_swap=None, explain=False):
+        self.registry = registry
+        self.engine = engine
+        self.explain = explain      # precompute feature attributions at load
+        self.on_swap = on_swap
+        self.current = None
+        self.status = {"state": "idle", "version": None, "error": None}
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._marker = None
+
+    def load_initial(self):
+        # Blocking; holds the reload lock so an admin reload cannot race it
+        with self._reload_lock:
+            self._marker = self.registry.active_marker()
+            version = self.registry.active_version()
+            self.status = {"state": "loading", "version": version, "error": None}
+            try:
+                self._activate(version)
+            except Exception as e:
+                self.status = {"state": "failed", "version": version, "error": str(e)}
+                print(f"❌ Model {version} loading failed:", str(e))
+
+    def reload(self, version=None, background=True):
+        # Returns False if a reload is already running
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        version = version or self.registry.active_version()
+        self.status = {"state": "loading", "version": version, "error": None}
+
+        def run():
+            try:
+                self._activate(version)
+            except Exception as e:
+                self.status = {"state": "failed", "version": version, "error": str(e)}
+                print(f"❌ Model {version} reload failed, keeping {self.version}:", str(e))
+            finally:
+                self._reload_lock.release()
+
+        if background:
+            threading.Thread(target=run, name="model-reload", daemon=True).start()
+        else:
+            run()
+        return True
+
+    def _activate(self, version):
+        started = time.perf_counter()
+        loaded = self.registry.load(version, self.engine, self.explain)
+        warm_model(loaded)
+
+        previous = self.current
+        self.current = loaded  # the swap: a single reference assignment
+        self.status = {
+            "state": "ready",
+            "version": version,
+            "error": None,
+            "load_seconds": round(time.perf_counter() - started, 3),
+        }
+        print(f"✅ Model {version} active ({loaded.engine} engine)")
+        if self.on_swap is not None and previous is not loaded:
+            self.on_swap(previous, loaded)
+
+    # ---------------- file watch trigger ----------------
+    def start_watcher(self, interval):
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="model-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            marker = self.registry.active_marker()
+            if marker == self._marker:
+                continue
+            version = self.registry.active_version()
+            if version == self.version:
+                self._marker = marker
+            elif self.reload(version):
+                print("🔄 Active model pointer changed:", version)
+                self._marker = marker
+            # else a reload is already running; look again next interval
+
+    @property
+    def version(self):
+        return self.current.version if self.current is not None else None
+
+
+def main(argv=None):
+    # python -m inference_api.registry register path/to/model.pkl [--version v] [--activate]
+    # python -m inference_api.registry activate <version>
+    # python -m inference_api.registry list
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fraud model registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    reg = sub.add_parser("register")
+    reg.add_argument("model_file")
+    reg.add_argument("--version")
+    reg.add_argument("--activate", action="store_true")
+
+    act = sub.add_parser("activate")
+    act.add_argument("version")
+
+    sub.add_parser("list")
+
+    args = parser.parse_args(argv)
+    registry = ModelRegistry()
+
+    if args.command == "register":
+        print(registry.register(args.model_file, version=args.version, activate=args.activate))
+    elif args.command == "activate":
+        registry.set_active(args.version)
+        print("Active:", args.version)
+    else:
+        active = registry.active_version()
+        for version in registry.versions() or [BASELINE_VERSION]:
+            print(("* " if version == active else "  ") + version)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .database import Base
+from .models import FraudPrediction, PredictionRollupHour, PredictionRollupMinute
+
+# -------------------------------------------------
+# TIME-BUCKETED PREDICTION ROLLUPS
+# -------------------------------------------------
+# The audit writer folds every flushed batch into per-minute and per-hour
+# rows keyed by (bucket_start, risk_level) holding count, fraud count and
+# probability sum, in the same transaction as the raw INSERT. The batch is
+# aggregated in Python first, so a flush costs one upsert per touched
+# bucket and tier, not per prediction. Range queries then read at most
+# tiers x buckets rows through the primary key, however large
+# fraud_predictions grows.
+#
+# Timestamps are naive UTC, like fraud_predictions.created_at.
+
+RESOLUTIONS = {
+    "minute": (PredictionRollupMinute.__table__, timedelta(minutes=1)),
+    "hour": (PredictionRollupHour.__table__, timedelta(hours=1)),
+}
+MEASURES = ("count", "fraud_count", "probability_sum")
+MAX_QUERY_BUCKETS = 10000
+REBUILD_CHUNK_ROWS = 10000
+
+
+def bucket_start(ts, resolution):
+    if resolution == "minute":
+        return ts.replace(second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def aggregate(rows):
+    # {resolution: [rollup row dicts]} for audit rows (created_at /
+    # risk_level / fraud / probability)
+    out = {}
+    for resolution in RESOLUTIONS:
+        totals = defaultdict(lambda: [0, 0, 0.0])
+        for row in rows:
+            total = totals[(bucket_start(row["created_at"], resolution), row["risk_level"])]
+            total[0] += 1
+            total[1] += 1 if row["fraud"] else 0
+            total[2] += row["probability"]
+        out[resolution] = [
+            {"bucket_start": bucket, "risk_level": risk, "count": c, "fraud_count": f, "probability_sum": p}
+            for (bucket, risk), (c, f, p) in totals.items()
+        ]
+    return out
+
+
+def upsert_rollups(session, rows):
+    # Adds rows to the rollups inside the caller's transaction
+    for resolution, values in aggregate(rows).items():
+        if values:
+            _upsert(session, RESOLUTIONS[resolution][0], values)
+
+
+def _upsert(session, table, values):
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[c.name for c in table.primary_key],
+            set_={m: table.c[m] + stmt.excluded[m] for m in MEASURES},
+        )
+        session.execute(stmt, values)
+        return
+
+    # other databases: update, insert when the bucket is new
+    for value in values:
+        match = and_(table.c.bucket_start == value["bucket_start"], table.c.risk_level == value["risk_level"])
+        updated = session.execute(
+            table.update().where(match).values({m: table.c[m] + value[m] for m in MEASURES})
+        ).rowcount
+        if not updated:
+            session.execute(table.insert(), value)
+
+
+# -------------------------------------------------
+# READ SIDE
+# -------------------------------------------------
+def _summary(count, fraud_count, probability_sum):
+    return {
+        "count": count,
+        "fraud_count": fraud_count,
+        "fraud_rate": round(fraud_count / count, 6) if count else None,
+        "mean_probability": round(probability_sum / count, 6) if count else None,
+    }
+
+
+def query_rollups(session, start, end, resolution="hour", risk_level=None):
+    # Aggregates for [start, end), widened to whole buckets. Every bucket in
+    # the range is returned (zeros when nothing was scored).
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}', use one of {list(RESOLUTIONS)}")
+    table, step = RESOLUTIONS[resolution]
+    start = bucket_start(_naive_utc(start), resolution)
+    end = _naive_utc(end)
+    if bucket_start(end, resolution) != end:
+        end = bucket_start(end, resolution) + step
+    if end <= start:
+        raise ValueError("end must be after start")
+    n_buckets = int((end - start) / step)
+    if n_buckets > MAX_QUERY_BUCKETS:
+        raise ValueError(f"{n_buckets} {resolution} buckets requested, at most {MAX_QUERY_BUCKETS}")
+
+    query = select(table).where(table.c.bucket_start >= start, table.c.bucket_start < end)
+    if risk_level is not None:
+        query = query.where(table.c.risk_level == risk_level)
+
+    buckets = defaultdict(dict)
+    totals = defaultdict(lambda: [0, 0, 0.0])
+    for row in session.execute(query):
+        buckets[row.bucket_start][row.risk_level] = (row.count, row.fraud_count, row.probability_sum)
+        total = totals[row.risk_level]
+        total[0] += row.count
+        total[1] += row.fraud_count
+        total[2] += row.probability_sum
+
+    series = []
+    for i in range(n_buckets):
+        bucket = start + i * step
+        tiers = buckets.get(bucket, {})
+        series.append({
+            "bucket_start": bucket.isoformat(),
+            **_summary(*_add(tiers.values())),
+            "risk_levels": {risk: _summary(*values) for risk, values in sorted(tiers.items())},
+        })
+    return {
+        "resolution": resolution,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "risk_level": risk_level,
+        "totals": {
+            **_summary(*_add(totals.values())),
+            "risk_levels": {risk: _summary(*values) for risk, values in sorted(totals.items())},
+        },
+        "buckets": series,
+    }
+
+
+def _add(values):
+    count, fraud_count, probability_sum = 0, 0, 0.0
+    for c, f, p in values:
+        count += c
+        fraud_count += f
+        probability_sum += p
+    return count, fraud_count, probability_sum
+
+
+def _naive_utc(ts):
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+# -------------------------------------------------
+# SCHEMA + BACKFILL
+# -------------------------------------------------
+def ensure_schema(bind):
+    # create_all only indexes new tables; add the indexes to an existing
+    # fraud_predictions too
+    Base.metadata.create_all(bind=bind)
+    for index in FraudPrediction.__table__.indexes:
+        index.create(bind=bind, checkfirst=True)
+
+
+def rebuild_rollups(session, since=None):
+    # Recomputes the rollups from fraud_predictions (all of it, or from the
+    # hour containing `since`). Run it while no audit writer is flushing,
+    # e.g. once after upgrading a database that already holds predictions.
+    since = bucket_start(_naive_utc(since), "hour") if since is not None else None
+    for table, _ in RESOLUTIONS.values():
+        stmt = delete(table)
+        if since is not None:
+            stmt = stmt.where(table.c.bucket_start >= since)
+        session.execute(stmt)
+
+    raw = FraudPrediction.__table__
+    query = select(raw.c.created_at, raw.c.risk_level, raw.c.fraud, raw.c.probability).where(
+        raw.c.created_at.is_not(None), raw.c.risk_level.is_not(None)
+    )
+    if since is not None:
+        query = query.where(raw.c.created_at >= since)
+
+    rows = 0
+    result = session.execute(query.execution_options(yield_per=REBUILD_CHUNK_ROWS))
+    for chunk in result.partitions():
+        upsert_rollups(session, [
+            {"created_at": r.created_at, "risk_level": r.risk_level, "fraud": r.fraud,
+             "probability": r.probability or 0.0}
+            for r in chunk
+        ])
+        rows += len(chunk)
+    session.commit()
+    return rows
+
+
+def main(argv=None):
+    # DATABASE_URL=... python -m inference_api.rollups rebuild [--since 2026-01-01T00:00]
+    import argparse
+    from .database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Prediction rollup tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recompute rollups from fraud_predictions")
+    rebuild.add_argument("--since", type=datetime.fromisoformat, default=None,
+                         help="only buckets from this UTC time on (default: everything)")
+    args = parser.parse_args(argv)
+
+    if SessionLocal is None:
+        raise SystemExit("DATABASE_URL is not set")
+    ensure_schema(engine)
+    session = SessionLocal()
+    try:
+        rows = rebuild_rollups(session, args.since)
+    finally:
+        session.close()
+    print(f"✅ Rollups rebuilt from {rows} predictions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Any, Dict, List, Optional
+
 from pydantic import BaseModel, Field
 
 class TransactionInput(BaseModel):
@@ -11,8 +13,55 @@ class TransactionInput(BaseModel):
     feature_6: float = Field(0.0, example=0.0)
     feature_7: float = Field(0.0, example=0.0)
 
+    # Card / account key for the velocity feature store, and when the
+    # transaction happened (epoch seconds, default: now)
+    card_id: Optional[str] = Field(None, example="card-42")
+    timestamp: Optional[float] = Field(None, example=1767225600.0)
+
+
+class Explanation(BaseModel):
+    # raw_score = base_value + sum(contributions); probability is raw_score
+    # passed through the model's calibration map (identical when uncalibrated)
+    base_value: float
+    raw_score: float
+    contributions: Dict[str, float]
+
 
 class FraudResponse(BaseModel):
     fraud: bool
     probability: float
-    risk_level: str
\ No newline at end of file
+    risk_level: str
+    model_version: Optional[str] = None
+    explanation: Optional[Explanation] = None  # only with ?explain=true
+
+class BatchTransactionInput(BaseModel):
+    # Either a list of records or a columnar dict of equal-length lists.
+    # Records stay raw dicts so one bad row doesn't reject the whole batch.
+    transactions: Optional[List[Dict[str, Any]]] = Field(
+        None, example=[{"amount": 200.0, "hour": 14}]
+    )
+    # Cells stay raw too; a non-numeric one only rejects its own row.
+    columns: Optional[Dict[str, List[Any]]] = Field(
+        None, example={"amount": [200.0, 950.0], "hour": [14, 2]}
+    )
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    result: Optional[FraudResponse] = None
+    error: Optional[str] = None
+
+
+class BatchFraudResponse(BaseModel):
+    model_version: Optional[str] = None
+    count: int
+    errors: int
+    results: List[BatchItemResult]
+
+
+class ModelActivateRequest(BaseModel):
+    version: Optional[str] = Field(None, example="v20260101-120000")
+
+
+class ShadowConfigRequest(BaseModel):
+    versions: List[str] = Field(default_factory=list, example=["v20260101-120000"])
@@ -0,0 +1,322 @@
+import io
+
+import numpy as np
+from pydantic import ValidationError
+
+from .schemas import TransactionInput
+
+# -------------------------------------------------
+# FEATURE LAYOUT (ORDER MUST MATCH TRAINING)
+# -------------------------------------------------
+FEATURE_NAMES = (
+    "amount",
+    "hour",
+    "feature_3",
+    "feature_4",
+    "feature_5",
+    "feature_6",
+    "feature_7",
+)
+EXPECTED_FEATURES = len(FEATURE_NAMES)
+
+# -------------------------------------------------
+# DECISION LOGIC
+# -------------------------------------------------
+# Defaults for models registered without a "decision" entry; train.py
+# picks cutoffs (and optionally a calibration map) per model, see
+# training_service/evaluation.py.
+FRAUD_THRESHOLD = 0.5
+RISK_CUTOFFS = np.array([0.30, 0.70])
+RISK_LABELS = np.array(["LOW", "MEDIUM", "HIGH"])
+
+
+class DecisionPolicy:
+    # Raw model score -> served probability (calibration map, piecewise
+    # linear, applied with one np.interp), then fraud flag and risk tier
+    def __init__(self, fraud_threshold=FRAUD_THRESHOLD, risk_cutoffs=RISK_CUTOFFS, calibration=None):
+        self.fraud_threshold = float(fraud_threshold)
+        self.risk_cutoffs = np.sort(np.asarray(risk_cutoffs, dtype=np.float64))
+        self.calibration = None
+        if calibration is not None:
+            self.calibration = (
+                np.asarray(calibration["x"], dtype=np.float64),
+                np.asarray(calibration["y"], dtype=np.float64),
+            )
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        decision = (metadata or {}).get("decision") or {}
+        return cls(
+            decision.get("fraud_threshold", FRAUD_THRESHOLD),
+            decision.get("risk_cutoffs", RISK_CUTOFFS),
+            decision.get("calibration"),
+        )
+
+    def calibrate(self, scores):
+        if self.calibration is None:
+            return scores
+        return np.interp(scores, *self.calibration)
+
+    def fraud_flags(self, probabilities):
+        return np.asarray(probabilities) >= self.fraud_threshold
+
+    def risk_levels(self, probabilities):
+        return RISK_LABELS[self.risk_codes(probabilities)]
+
+    def risk_codes(self, probabilities):
+        # index into RISK_LABELS
+        return np.searchsorted(self.risk_cutoffs, probabilities, side="right")
+
+    def describe(self):
+        return {
+            "fraud_threshold": self.fraud_threshold,
+            "risk_cutoffs": dict(zip(RISK_LABELS[1:].tolist(), self.risk_cutoffs.tolist())),
+            "calibrated": self.calibration is not None,
+        }
+
+
+DEFAULT_POLICY = DecisionPolicy()
+
+
+def features_from_input(data):
+    return [float(getattr(data, name)) for name in FEATURE_NAMES]
+
+
+def build_matrix(rows):
+    return np.asarray(rows, dtype=np.float64).reshape(-1, EXPECTED_FEATURES)
+
+
+def score_matrix(model, features, policy=None):
+    # One model call for the whole matrix, positive-class probability per
+    # row (calibrated when the policy has a calibration map)
+    if hasattr(model, "predict_proba"):
+        scores = np.asarray(model.predict_proba(features)[:, 1], dtype=np.float64)
+    else:
+        # fallback if model has no predict_proba
+        scores = np.asarray(model.predict(features), dtype=np.float64)
+    return policy.calibrate(scores) if policy is not None else scores
+
+
+def risk_levels(probabilities, policy=None):
+    # p < cutoffs[0] -> LOW, p < cutoffs[1] -> MEDIUM, else HIGH
+    return (policy or DEFAULT_POLICY).risk_levels(probabilities)
+
+
+def fraud_flags(probabilities, policy=None):
+    return (policy or DEFAULT_POLICY).fraud_flags(probabilities)
+
+
+# -------------------------------------------------
+# COLUMNAR INPUT
+# -------------------------------------------------
+def columns_to_matrix(columns):
+    # Returns the (N, 7) matrix plus an error message (or None) per row
+    if "amount" not in columns or "hour" not in columns:
+        raise ValueError("columns must include 'amount' and 'hour'")
+
+    unknown = set(columns) - set(FEATURE_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown columns: {sorted(unknown)}")
+
+    n_rows = len(columns["amount"])
+    for name, values in columns.items():
+        if len(values) != n_rows:
+            raise ValueError(
+                f"Column '{name}' has {len(values)} values, expected {n_rows}"
+            )
+
+    features = np.zeros((n_rows, EXPECTED_FEATURES), dtype=np.float64)
+    cell_errors = {}
+    for i, name in enumerate(FEATURE_NAMES):
+        if name in columns:
+            # None -> NaN so one bad cell only rejects its own row
+            try:
+                features[:, i] = np.array(columns[name], dtype=np.float64)
+            except (TypeError, ValueError, OverflowError):
+                # slow path only for a column with a non-numeric cell
+                for row, value in enumerate(columns[name]):
+                    try:
+                        features[row, i] = np.nan if value is None else float(value)
+                    except (TypeError, ValueError, OverflowError):
+                        features[row, i] = np.nan
+                        cell_errors.setdefault(row, f"Column '{name}' is not numeric: {value!r}")
+
+    errors = [None] * n_rows
+    for i, error in {**matrix_errors(features), **cell_errors}.items():
+        errors[i] = error
+    return features, errors
+
+
+def matrix_errors(features):
+    # {row index: message} for rows the model must not score
+    hour = features[:, 1]
+    bad_value = ~np.isfinite(features).all(axis=1)
+    bad_hour = (hour < 0) | (hour > 23) | (hour != np.floor(hour))
+
+    errors = {}
+    for i in np.flatnonzero(bad_value | bad_hour).tolist():
+        if bad_value[i]:
+            errors[i] = "Invalid input values: missing or non-finite feature"
+        else:
+            errors[i] = f"hour must be an integer between 0 and 23, got {hour[i]}"
+    return errors
+
+
+# -------------------------------------------------
+# BINARY MATRIX INPUT / COLUMNAR BINARY OUTPUT
+# -------------------------------------------------
+# For high-volume callers: the request body is the feature matrix itself,
+# row-major in FEATURE_NAMES order, either raw little-endian float32 or a
+# .npy file (float32 / float64, C order). It is decoded with one
+# np.frombuffer, no per-row Python objects. The binary response is three
+# packed columns: probability float32 x N, risk code uint8 x N (index into
+# RISK_LABELS, 255 = row rejected), fraud flag uint8 x N.
+RAW_MATRIX_TYPE = "application/octet-stream"
+NPY_MATRIX_TYPE = "application/x-npy"
+JSON_TYPE = "application/json"
+NPY_DTYPES = ("<f4", "<f8")
+REJECTED_CODE = 255
+
+
+def decode_matrix(body, content_type, n_features=EXPECTED_FEATURES):
+    # -> (N, n_features) read-only view of body (float32, or float64 .npy)
+    if content_type == RAW_MATRIX_TYPE:
+        row_bytes = 4 * n_features
+        if len(body) % row_bytes:
+            raise ValueError(
+                f"Body is {len(body)} bytes, not a whole number of {n_features}-column float32 rows"
+            )
+        return np.frombuffer(body, dtype="<f4").reshape(-1, n_features)
+
+    if content_type == NPY_MATRIX_TYPE:
+        stream = io.BytesIO(body)
+        try:
+            version = np.lib.format.read_magic(stream)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+        except ValueError as e:
+            raise ValueError(f"Not a .npy body: {e}")
+        if dtype.str not in NPY_DTYPES or fortran_order:
+            raise ValueError(f".npy must be C-ordered {' or '.join(NPY_DTYPES)}, got {dtype.str}"
+                             f"{' (Fortran order)' if fortran_order else ''}")
+        if len(shape) != 2 or shape[1] != n_features:
+            raise ValueError(f".npy must have shape (n, {n_features}), got {shape}")
+        offset = stream.tell()
+        if len(body) - offset != shape[0] * n_features * dtype.itemsize:
+            raise ValueError(".npy body is truncated or has trailing bytes")
+        return np.frombuffer(body, dtype=dtype, offset=offset).reshape(shape)
+
+    raise ValueError(f"Unsupported Content-Type '{content_type}', use {RAW_MATRIX_TYPE} or {NPY_MATRIX_TYPE}")
+
+
+def encode_columns(probabilities, risk_codes, flags):
+    return b"".join((
+        np.asarray(probabilities, dtype="<f4").tobytes(),
+        np.asarray(risk_codes, dtype=np.uint8).tobytes(),
+        np.asarray(flags, dtype=np.uint8).tobytes(),
+    ))
+
+
+def matrix_response_type(accept):
+    # Accept header -> JSON_TYPE, RAW_MATRIX_TYPE, or None if neither is
+    # acceptable. Each type takes the q of its most specific matching range
+    # (q=0: not acceptable); ties go to the more specific match, then JSON.
+    if not accept or not accept.strip():
+        return JSON_TYPE
+    ranks = {JSON_TYPE: (0.0, -1), RAW_MATRIX_TYPE: (0.0, -1)}  # type -> (q, specificity)
+    for media_range in accept.split(","):
+        media, *params = [part.strip() for part in media_range.split(";")]
+        media = media.lower()
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = None
+        if q is None:
+            continue
+        for media_type in ranks:
+            if media == media_type:
+                specificity = 2
+            elif media == media_type.split("/")[0] + "/*":
+                specificity = 1
+            elif media == "*/*":
+                specificity = 0
+            else:
+                continue
+            if specificity > ranks[media_type][1]:
+                ranks[media_type] = (q, specificity)
+
+    if ranks[RAW_MATRIX_TYPE][0] == 0 and ranks[JSON_TYPE][0] == 0:
+        return None
+    return RAW_MATRIX_TYPE if ranks[RAW_MATRIX_TYPE] > ranks[JSON_TYPE] else JSON_TYPE
+
+
+def decode_columns(body):
+    # client side of encode_columns -> (probability, risk code, fraud flag)
+    n = len(body) // 6
+    return (
+        np.frombuffer(body, dtype="<f4", count=n),
+        np.frombuffer(body, dtype=np.uint8, count=n, offset=4 * n),
+        np.frombuffer(body, dtype=np.uint8, count=n, offset=5 * n).astype(bool),
+    )
+
+
+# -------------------------------------------------
+# RECORD INPUT (BATCH / STREAM / BULK FILES)
+# -------------------------------------------------
+def record_to_row(record):
+    # record: parsed JSON object, or an error message from parsing it.
+    # Returns (row, None) or (None, error) so one bad record never fails a chunk.
+    if isinstance(record, str):
+        return None, record
+    if not isinstance(record, dict):
+        return None, "Record must be a JSON object"
+    try:
+        return features_from_input(TransactionInput(**record)), None
+    except ValidationError as e:
+        return None, format_validation_error(e)
+
+
+def format_validation_error(e):
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}"
+        for err in e.errors()
+    )
+
+
+def score_records(scorer, records, policy=None, fill=None):
+    # One model call per chunk. Returns one result dict per record (in order)
+    # plus (features, probabilities, flags, risks) for the records that
+    # scored, or None. fill(features, valid records) may overwrite columns
+    # before scoring.
+    policy = policy or DEFAULT_POLICY
+    results = [None] * len(records)
+    rows, valid = [], []
+    for i, record in enumerate(records):
+        row, error = record_to_row(record)
+        if error is not None:
+            results[i] = {"error": error}
+        else:
+            rows.append(row)
+            valid.append(i)
+
+    scored = None
+    if rows:
+        features = build_matrix(rows)
+        if fill is not None:
+            fill(features, [records[i] for i in valid])
+        probabilities = score_matrix(scorer, features, policy)
+        flags = policy.fraud_flags(probabilities).tolist()
+        risks = policy.risk_levels(probabilities).tolist()
+        rounded = np.round(probabilities, 4).tolist()
+
+        for j, i in enumerate(valid):
+            results[i] = {"fraud": flags[j], "probability": rounded[j], "risk_level": risks[j]}
+        scored = (features, probabilities, flags, risks)
+
+    return results, scored
@@ -0,0 +1,220 @@
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .model_loader import warm_model
+from .scoring import RISK_LABELS, score_matrix
+
+# -------------------------------------------------
+# SHADOW SCORING OF CANDIDATE MODELS
+# -------------------------------------------------
+# Request handlers hand a sampled copy of the feature rows they just scored
+# (plus the primary probabilities) to a bounded buffer: one append, never a
+# wait. A single background thread takes the buffer in batches, scores each
+# candidate model on the same rows with one call per batch, and folds the
+# comparison into running statistics. A full buffer drops the new rows, so
+# shadow work can fall behind or lose samples but never slows /predict.
+
+DELTA_BUCKETS = (0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5)  # |candidate - primary|
+
+
+class ShadowStats:
+    # Incremental comparison of one candidate against the primary model
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.flag_agreements = 0
+        self.delta_mean = 0.0
+        self.delta_m2 = 0.0          # sum of squared deviations (Welford / Chan)
+        self.abs_delta_sum = 0.0
+        self.abs_delta_max = 0.0
+        self.tiers = np.zeros((len(RISK_LABELS), len(RISK_LABELS)), dtype=np.int64)  # primary x candidate
+        self.abs_delta_counts = np.zeros(len(DELTA_BUCKETS) + 1, dtype=np.int64)
+        self.model_seconds = 0.0
+
+    def update(self, primary, candidate, seconds, primary_policy, candidate_policy):
+        # each side's tier / flag under its own cutoffs
+        delta = candidate - primary
+        n = len(delta)
+        batch_mean = float(delta.mean())
+        batch_m2 = float(((delta - batch_mean) ** 2).sum())
+        abs_delta = np.abs(delta)
+        primary_tier = np.searchsorted(primary_policy.risk_cutoffs, primary, side="right")
+        candidate_tier = np.searchsorted(candidate_policy.risk_cutoffs, candidate, side="right")
+        tiers = np.bincount(primary_tier * len(RISK_LABELS) + candidate_tier, minlength=self.tiers.size)
+        buckets = np.bincount(np.searchsorted(DELTA_BUCKETS, abs_delta, side="left"),
+                              minlength=len(DELTA_BUCKETS) + 1)
+        agreements = int((primary_policy.fraud_flags(primary) == candidate_policy.fraud_flags(candidate)).sum())
+
+        with self._lock:
+            total = self.rows + n
+            shift = batch_mean - self.delta_mean
+            self.delta_m2 += batch_m2 + shift * shift * self.rows * n / total
+            self.delta_mean += shift * n / total
+            self.rows = total
+            self.flag_agreements += agreements
+            self.abs_delta_sum += float(abs_delta.sum())
+            self.abs_delta_max = max(self.abs_delta_max, float(abs_delta.max()))
+            self.tiers += tiers.reshape(self.tiers.shape)
+            self.abs_delta_counts += buckets
+            self.model_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            rows = self.rows
+            tiers = self.tiers.copy()
+            out = {
+                "rows": rows,
+                "flag_agreement": round(self.flag_agreements / rows, 6) if rows else None,
+                "tier_flip_rate": round(1 - np.trace(tiers) / rows, 6) if rows else None,
+                "tier_flips": {
+                    f"{RISK_LABELS[i]}->{RISK_LABELS[j]}": int(tiers[i, j])
+                    for i in range(len(RISK_LABELS)) for j in range(len(RISK_LABELS))
+                    if i != j and tiers[i, j]
+                },
+                "delta_mean": self.delta_mean if rows else None,
+                "delta_std": (self.delta_m2 / rows) ** 0.5 if rows else None,
+                "abs_delta_mean": self.abs_delta_sum / rows if rows else None,
+                "abs_delta_max": self.abs_delta_max if rows else None,
+                "abs_delta_le": {
+                    str(bound): int(count)
+                    for bound, count in zip(DELTA_BUCKETS, np.cumsum(self.abs_delta_counts).tolist())
+                },
+                "model_us_per_row": round(self.model_seconds / rows * 1e6, 3) if rows else None,
+            }
+        return out
+
+
+class ShadowScorer:
+    def __init__(self, registry, engine="native", sample_rate=1.0, max_queue_rows=10000,
+                 batch_rows=256, flush_interval=0.05):
+        self.registry = registry
+        self.engine = engine
+        self.sample_rate = float(sample_rate)
+        self.max_queue_rows = int(max_queue_rows)
+        self.batch_rows = int(batch_rows)
+        self.flush_interval = float(flush_interval)
+
+        self.candidates = {}   # version -> (LoadedModel, ShadowStats)
+        self._buffer = deque()  # (features (k, n), primary probabilities (k,), primary DecisionPolicy)
+        self._queued_rows = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closing = False
+        self.counters = {"offered": 0, "enqueued": 0, "dropped": 0, "scored": 0, "failed": 0}
+
+    # ---------------- candidates ----------------
+    def set_candidates(self, versions):
+        # Loads + warms every version first, then swaps the set in; stats restart
+        loaded = {}
+        for version in versions:
+            model = self.registry.load(version, self.engine)
+            warm_model(model)
+            loaded[version] = (model, ShadowStats())
+        self.candidates = loaded
+        return list(loaded)
+
+    def reset(self):
+        self.candidates = {v: (model, ShadowStats()) for v, (model, _) in self.candidates.items()}
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        # Pending rows are discarded, shadow results are best effort
+        if self._thread is None:
+            return
+        self._closing = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---------------- request side ----------------
+    def offer(self, features, probabilities, policy):
+        # features: (k, n) rows the primary just scored. Never blocks.
+        if not self.candidates:
+            return
+        k = len(probabilities)
+        self.counters["offered"] += k
+        if self.sample_rate < 1.0:
+            if k == 1:
+                if random.random() >= self.sample_rate:
+                    return
+            else:
+                keep = np.random.random(k) < self.sample_rate
+                features, probabilities = features[keep], probabilities[keep]
+                k = len(probabilities)
+                if not k:
+                    return
+        with self._lock:
+            room = self.max_queue_rows - self._queued_rows
+            if k > room:
+                # keep what fits, a big batch still gets sampled
+                self.counters["dropped"] += k - max(room, 0)
+                if room <= 0:
+                    return
+                features, probabilities, k = features[:room], probabilities[:room], room
+            self._buffer.append((features, probabilities, policy))
+            self._queued_rows += k
+            self.counters["enqueued"] += k
+            if self._queued_rows >= self.batch_rows:
+                self._wake.set()
+
+    def queued_rows(self):
+        return self._queued_rows
+
+    def stats(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "queued_rows": self._queued_rows,
+            "max_queue_rows": self.max_queue_rows,
+            **self.counters,
+            "candidates": {
+                version: {"engine": model.engine, **stats.snapshot()}
+                for version, (model, stats) in self.candidates.items()
+            },
+        }
+
+    # ---------------- worker side ----------------
+    def _run(self):
+        while not self._closing:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while not self._closing:
+                batch = self._take(self.batch_rows)
+                if not batch:
+                    break
+                self._score(batch)
+
+    def _take(self, max_rows):
+        with self._lock:
+            batch, rows = [], 0
+            while self._buffer and rows < max_rows:
+                item = self._buffer.popleft()
+                batch.append(item)
+                rows += len(item[1])
+            self._queued_rows -= rows
+        return batch
+
+    def _score(self, batch):
+        features = np.concatenate([np.asarray(f, dtype=np.float64).reshape(len(p), -1) for f, p, _ in batch])
+        primary = np.concatenate([p for _, p, _ in batch])
+        primary_policy = batch[-1][2]  # stats restart when the primary changes
+        for version, (model, stats) in list(self.candidates.items()):
+            try:
+                started = time.perf_counter()
+                candidate = score_matrix(model.scorer, features, model.policy)
+                stats.update(primary, candidate, time.perf_counter() - started, primary_policy, model.policy)
+            except Exception as e:
+                self.counters["failed"] += len(primary)
+                print(f"⚠️ Shadow scoring with {version} failed:", str(e))
+        self.counters["scored"] += len(primary)
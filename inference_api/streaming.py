@@ -0,0 +1,130 @@
+import asyncio
+import json
+import tempfile
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from .scoring import score_records
+
+# -------------------------------------------------
+# NDJSON STREAM SCORING
+# -------------------------------------------------
+# The request body is read incrementally and scored in fixed-size chunks.
+# Scored lines go into a spool file (memory up to spool_memory bytes, then
+# disk) that the response drains as it fills. Reading the upload therefore
+# never waits on the client reading results, so plain clients that upload
+# everything before reading don't deadlock. Clients that read while
+# uploading get results as soon as each chunk is scored. Memory stays
+# bounded by chunk size + spool_memory whatever the upload size.
+
+READ_BLOCK_BYTES = 1 << 20
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    # StreamingResponse listens for disconnects by calling receive() on
+    # pre-2.4 ASGI servers, which would swallow request body messages
+    # while the handler is still reading them. Skip that listener.
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def parse_ndjson_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return f"Invalid JSON: {e}"
+
+
+class NDJSONScorer:
+    def __init__(self, current, chunk_rows=1000, max_line_bytes=65536, spool_memory=8 << 20, on_scored=None,
+                 fill=None):
+        self.current = current        # LoadedModel pinned for the whole stream
+        self.chunk_rows = chunk_rows
+        self.max_line_bytes = max_line_bytes
+        self.spool_memory = spool_memory
+        self.on_scored = on_scored    # callback(current, features, probabilities, flags, risks)
+        self.fill = fill              # fill(features, records), e.g. velocity features
+
+        self._spool = None
+        self._written = 0
+        self._read = 0
+        self._ready = asyncio.Event()
+        self._done = False
+
+    async def stream(self, body):
+        self._spool = tempfile.SpooledTemporaryFile(max_size=self.spool_memory)
+        producer = asyncio.ensure_future(self._produce(body))
+        try:
+            while True:
+                if self._written > self._read:
+                    self._spool.seek(self._read)
+                    data = self._spool.read(min(self._written - self._read, READ_BLOCK_BYTES))
+                    self._read += len(data)
+                    if self._read == self._written:
+                        # fully drained: rewind so the spool doesn't keep growing
+                        self._spool.seek(0)
+                        self._spool.truncate()
+                        self._read = self._written = 0
+                    yield data
+                elif self._done:
+                    break
+                else:
+                    self._ready.clear()
+                    await self._ready.wait()
+            await producer  # surface unexpected producer errors
+        finally:
+            producer.cancel()
+            self._spool.close()
+
+    async def _produce(self, body):
+        index = 0
+        pending = b""
+        chunk = []
+        try:
+            async for part in body:
+                *lines, pending = (pending + part).split(b"\n")
+                if len(pending) > self.max_line_bytes:
+                    raise ValueError(f"NDJSON line exceeds {self.max_line_bytes} bytes")
+                for line in lines:
+                    if line.strip():
+                        chunk.append(line)
+                    if len(chunk) >= self.chunk_rows:
+                        index = await self._score_chunk(chunk, index)
+                        chunk = []
+            if pending.strip():
+                chunk.append(pending)
+            if chunk:
+                await self._score_chunk(chunk, index)
+        except Exception as e:
+            # status line is already sent; report the failure in-band
+            self._append((json.dumps({"error": f"Stream aborted: {e}"}) + "\n").encode())
+        finally:
+            self._done = True
+            self._ready.set()
+
+    async def _score_chunk(self, lines, index):
+        data = await run_in_threadpool(self._score_lines, lines, index)
+        self._append(data)
+        return index + len(lines)
+
+    def _score_lines(self, lines, index):
+        records = [parse_ndjson_line(line) for line in lines]
+        results, scored = score_records(self.current.scorer, records, self.current.policy, self.fill)
+        if self.on_scored is not None and scored is not None:
+            # still in the worker thread, off the event loop
+            self.on_scored(self.current, *scored)
+        out = []
+        for i, result in enumerate(results, start=index):
+            if "error" not in result:
+                result["model_version"] = self.current.version
+            out.append(json.dumps({"index": i, **result}))
+        return ("\n".join(out) + "\n").encode()
+
+    def _append(self, data):
+        self._spool.seek(self._written)
+        self._spool.write(data)
+        self._written += len(data)
+        self._ready.set()
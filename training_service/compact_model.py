@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.metrics import roc_auc_score
+
+from inference_api.forest import (
+    CompiledForest,
+    compile_forest,
+    file_sha256,
+    forest_path_for,
+    load_forest,
+    save_forest,
+    subtree_value_bounds,
+)
+from inference_api.scoring import DEFAULT_POLICY, DecisionPolicy
+
+# -------------------------------------------------
+# COMPACT FOREST
+# -------------------------------------------------
+# Serving needs split feature, threshold, children and value per node, and
+# nothing else. The compact export keeps only those:
+#   - thresholds rounded *down* to float32. Inputs are float32, and for a
+#     float32 x, x <= t holds exactly when x <= floor32(t), so every split
+#     goes the same way as in the float64 forest
+#   - node values as float32 (still averaged in float64)
+#   - the smallest integer dtypes that fit features / node indices
+#   - the walk arrays stay in the file, so workers share the mapped pages
+#     instead of each rebuilding them (see forest.save_forest)
+# Pruning collapses every subtree whose leaf values span at most
+# `tolerance` into one leaf. Tolerance 0 only merges subtrees whose leaves
+# all agree, which changes no prediction.
+
+DEFAULT_TOLERANCES = (0.0, 0.001, 0.005, 0.01, 0.02)
+# responses round probability to 4 dp; an "identical" variant must stay
+# within half of that unit so no served probability can change
+IDENTICAL_MAX_ABS_DIFF = 0.5e-4
+BATCH_ROWS = 1000
+
+
+def floor_float32(values):
+    # largest float32 <= each value
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def prune_forest(forest, tolerance=0.0):
+    lo, hi = subtree_value_bounds(forest)
+    index = np.arange(forest.n_nodes)
+    collapse = (hi - lo) <= tolerance   # true on every leaf too
+    left = np.where(collapse, index, np.asarray(forest.left, dtype=np.intp))
+    right = np.where(collapse, index, np.asarray(forest.right, dtype=np.intp))
+    # a collapsed node keeps its training average; clipping makes it the
+    # shared leaf value exactly when all leaves below agree
+    value = np.clip(np.asarray(forest.value, dtype=np.float64), lo, hi)
+
+    # keep only nodes still reachable from a root, in the original order
+    keep = np.zeros(forest.n_nodes, dtype=bool)
+    max_depth = 0
+    frontier = np.asarray(forest.roots, dtype=np.intp)
+    for depth in range(forest.max_depth + 1):
+        keep[frontier] = True
+        internal = frontier[left[frontier] != frontier]
+        if len(internal) == 0:
+            break
+        max_depth = depth + 1
+        frontier = np.concatenate((left[internal], right[internal]))
+
+    new_index = (np.cumsum(keep) - 1).astype(np.int32)
+    return CompiledForest(
+        feature=np.where(collapse, 0, forest.feature)[keep].astype(np.int32),
+        threshold=np.where(collapse, 0.0, forest.threshold)[keep].astype(np.float64),
+        left=new_index[left[keep]],
+        right=new_index[right[keep]],
+        value=value[keep],
+        roots=new_index[np.asarray(forest.roots, dtype=np.intp)],
+        max_depth=max_depth,
+        n_features=forest.n_features_in_,
+    )
+
+
+def compact_forest(forest, tolerance=None):
+    # tolerance None: no pruning, only the float32 / small-int layout
+    if tolerance is not None:
+        forest = prune_forest(forest, tolerance)
+    node_dtype = np.min_scalar_type(max(forest.n_nodes - 1, 0))
+    return CompiledForest(
+        feature=np.asarray(forest.feature).astype(np.min_scalar_type(max(forest.n_features_in_ - 1, 0))),
+        threshold=floor_float32(forest.threshold),
+        left=np.asarray(forest.left).astype(node_dtype),
+        right=np.asarray(forest.right).astype(node_dtype),
+        value=np.asarray(forest.value).astype(np.float32),
+        roots=np.asarray(forest.roots).astype(node_dtype),
+        max_depth=forest.max_depth,
+        n_features=forest.n_features_in_,
+    )
+
+
+# -------------------------------------------------
+# ACCURACY-VS-SIZE REPORT
+# -------------------------------------------------
+# Pickle vs float64 .forest vs float32 compact exports (optionally with
+# near-constant subtrees collapsed) on the held-out split: size, load time,
+# latency, nodes, ROC-AUC and tier / flag changes against the pickle.
+#   python training_service/compact_model.py [--version v2] [--report compact.json] [--install]
+
+
+def _median_seconds(fn, repeat):
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - started
+    return float(np.median(samples))
+
+
+def _measure(name, path, load, X, y, reference, repeat, policy):
+    started = time.perf_counter()
+    scorer = load()
+    load_ms = (time.perf_counter() - started) * 1000
+    load_ms = min(load_ms, _median_seconds(load, max(repeat // 20, 3)) * 1000)
+
+    probs = scorer.predict_proba(X)[:, 1]
+    served, served_reference = policy.calibrate(probs), policy.calibrate(reference)
+    row, batch = X[:1], X[:BATCH_ROWS]
+    return {
+        "variant": name,
+        "size_bytes": os.path.getsize(path),
+        "load_ms": round(load_ms, 3),
+        "single_row_us": round(_median_seconds(lambda: scorer.predict_proba(row), repeat) * 1e6, 1),
+        f"batch_{BATCH_ROWS}_us": round(_median_seconds(lambda: scorer.predict_proba(batch), max(repeat // 10, 5)) * 1e6, 1),
+        "n_nodes": getattr(scorer, "n_nodes", None),
+        "max_depth": getattr(scorer, "max_depth", None),
+        "roc_auc": float(roc_auc_score(y, probs)),
+        "max_abs_diff": float(np.abs(served - served_reference).max()),  # served probability
+        "tier_changes": int((policy.risk_levels(served) != policy.risk_levels(served_reference)).sum()),
+        "flag_changes": int((policy.fraud_flags(served) != policy.fraud_flags(served_reference)).sum()),
+    }
+
+
+def build_report(model, model_file, X, y, tolerances=DEFAULT_TOLERANCES, repeat=200, policy=DEFAULT_POLICY):
+    # One row per variant; "identical" = no risk-tier or fraud-flag change
+    # (under the model's decision policy) and served probabilities within
+    # IDENTICAL_MAX_ABS_DIFF of the pickled model on (X, y)
+    with warnings.catch_warnings():
+        # fitted with feature names, scored with a bare array
+        warnings.simplefilter("ignore", UserWarning)
+        reference = model.predict_proba(X)[:, 1]
+        rows = [_measure("pickle", model_file, lambda: joblib.load(model_file), X, y, reference, repeat, policy)]
+
+    base = compile_forest(model)
+    variants = [("forest-float64", base, None), ("compact-float32", compact_forest(base), None)]
+    variants += [(f"compact-float32-prune{t:g}", compact_forest(base, t), t) for t in tolerances]
+
+    with tempfile.TemporaryDirectory(prefix="compact-") as scratch:
+        for name, forest, tolerance in variants:
+            path = os.path.join(scratch, name + ".forest")
+            save_forest(forest, path)
+            row = _measure(name, path, lambda: load_forest(path), X, y, reference, repeat, policy)
+            row["prune_tolerance"] = tolerance
+            rows.append(row)
+
+    for row in rows:
+        row["roc_auc_delta"] = row["roc_auc"] - rows[0]["roc_auc"]
+        row["identical"] = (row["tier_changes"] == 0 and row["flag_changes"] == 0
+                            and row["max_abs_diff"] < IDENTICAL_MAX_ABS_DIFF)
+    return rows, dict(zip((v[0] for v in variants), (v[1] for v in variants)))
+
+
+def smallest_identical(rows):
+    compact = [r for r in rows if r["variant"].startswith("compact") and r["identical"]]
+    return min(compact, key=lambda r: r["size_bytes"]) if compact else None
+
+
+def print_report(rows):
+    print(f"{'variant':<28} {'size_kb':>8} {'load_ms':>8} {'1row_us':>8} {'batch_us':>9} "
+          f"{'nodes':>6} {'depth':>5} {'roc_auc':>8} {'Δauc':>9} {'max|Δp|':>9} {'tiers':>5} {'flags':>5}")
+    for r in rows:
+        print(f"{r['variant']:<28} {r['size_bytes'] / 1024:>8.1f} {r['load_ms']:>8.2f} "
+              f"{r['single_row_us']:>8.1f} {r[f'batch_{BATCH_ROWS}_us']:>9.1f} "
+              f"{r['n_nodes'] or '-':>6} {r['max_depth'] or '-':>5} {r['roc_auc']:>8.5f} "
+              f"{r['roc_auc_delta']:>+9.1e} {r['max_abs_diff']:>9.2e} {r['tier_changes']:>5} {r['flag_changes']:>5}")
+
+
+def compact_export(model, model_file, X, y, tolerances=DEFAULT_TOLERANCES, report_path=None,
+                   output=None, write=True, policy=DEFAULT_POLICY):
+    # Replace the .forest next to model_file (or write `output`) with the
+    # smallest compact variant that scores identically; returns its report
+    # row, or None when every compact variant changes a decision
+    rows, forests = build_report(model, model_file, X, y, tolerances, policy=policy)
+    print_report(rows)
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(rows, f, indent=2)
+        print("✅ Report written to", report_path)
+
+    chosen = smallest_identical(rows)
+    if chosen is None:
+        print("⚠️ Every compact variant changes a decision or a served probability, keeping the float64 export")
+        return None
+    if not write:
+        print("🏆 Smallest identical:", chosen["variant"])
+        return chosen
+
+    output = output or forest_path_for(model_file)
+    save_forest(forests[chosen["variant"]], output, {
+        "source_sha256": file_sha256(model_file),
+        "compact": {k: chosen[k] for k in ("variant", "prune_tolerance", "n_nodes", "roc_auc_delta", "max_abs_diff")},
+    })
+    print(f"✅ Wrote {chosen['variant']} ({chosen['size_bytes'] / 1024:.1f} KB) to {output}")
+    return chosen
+
+
+def main(argv=None):
+    from data_cache import CACHE_DIR
+    from feature_engineering import DEFAULT_CHUNKSIZE
+    from train import DATA_PATH, load_data, split_data
+
+    from inference_api.feature_store import VELOCITY_FEATURES
+    from inference_api.registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Compact float32 / pruned .forest export with an accuracy-vs-size report")
+    parser.add_argument("--version", help="registry version to compact (default: active)")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--tolerances", nargs="+", type=float, default=list(DEFAULT_TOLERANCES),
+                        help="pruning tolerances to try (max leaf-value spread collapsed)")
+    parser.add_argument("--report", help="write the report to this JSON file")
+    parser.add_argument("--install", action="store_true",
+                        help="replace the version's .forest with the smallest identical variant")
+    parser.add_argument("-o", "--output", help="write the smallest identical variant here instead")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry()
+    version = args.version or registry.active_version()
+    model_file = registry.model_path(version)
+    print("📦 Compacting model version", version)
+    model = joblib.load(model_file)
+
+    metadata = registry.metadata(version)
+    features = metadata.get("features", [])
+    X, y, _ = load_data(args.data, args.chunksize, cache_dir=args.cache_dir,
+                        velocity=any(f in VELOCITY_FEATURES for f in features))
+    _, X_test, _, y_test = split_data(X, y)
+    del X, y
+
+    return compact_export(model, model_file, X_test, y_test, args.tolerances, args.report,
+                          args.output, write=args.install or bool(args.output),
+                          policy=DecisionPolicy.from_metadata(metadata))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from feature_engineering import DEFAULT_CHUNKSIZE, PREPROCESS_VERSION, load_training_data
+
+# -------------------------------------------------
+# PREPROCESSED TRAINING SET CACHE
+# -------------------------------------------------
+# The first run parses the CSV and writes X.npy (float32), y.npy (int8) and
+# meta.json to <cache_dir>/<source sha256>-p<PREPROCESS_VERSION>/. Later runs
+# memory-map the arrays directly. A changed file or a bump of
+# PREPROCESS_VERSION gives a new key, so a stale matrix is never reused.
+# Hashing is skipped when the file's size and mtime match the last hash.
+
+CACHE_DIR = os.getenv(
+    "TRAINING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+HASH_INDEX = "source_hashes.json"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_sha256(path, cache_dir=CACHE_DIR):
+    st = os.stat(path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    index_path = os.path.join(cache_dir, HASH_INDEX)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    entry = index.get(os.path.abspath(path))
+    if entry and entry["stamp"] == stamp:
+        return entry["sha256"]
+
+    sha = file_sha256(path)
+    index[os.path.abspath(path)] = {"stamp": stamp, "sha256": sha}
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = index_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, index_path)
+    return sha
+
+
+def cache_key(sha, velocity=False):
+    return f"{sha[:16]}-p{PREPROCESS_VERSION}" + ("-velocity" if velocity else "")
+
+
+def open_cached(entry_dir):
+    with open(os.path.join(entry_dir, "meta.json")) as f:
+        meta = json.load(f)
+    X = np.load(os.path.join(entry_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(entry_dir, "y.npy"), mmap_mode="r")
+    return X, y, meta
+
+
+def write_cache(entry_dir, X, y, meta):
+    parent = os.path.dirname(entry_dir)
+    os.makedirs(parent, exist_ok=True)
+    # write into a scratch dir and rename, so readers never see half a cache
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=parent)
+    try:
+        np.save(os.path.join(staging, "X.npy"), np.ascontiguousarray(X))
+        np.save(os.path.join(staging, "y.npy"), np.ascontiguousarray(y))
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        try:
+            os.rename(staging, entry_dir)
+        except OSError:
+            if not os.path.isdir(entry_dir):  # lost a race to a concurrent writer
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def load_training_set(path, chunksize=DEFAULT_CHUNKSIZE, cache_dir=CACHE_DIR, refresh=False, velocity=False):
+    # Returns (X, y, meta); X and y are read-only memmaps of the cache.
+    sha = source_sha256(path, cache_dir)
+    entry_dir = os.path.join(cache_dir, cache_key(sha, velocity))
+
+    if refresh:
+        shutil.rmtree(entry_dir, ignore_errors=True)
+    if os.path.isfile(os.path.join(entry_dir, "meta.json")):
+        print("⚡ Training set cache hit:", entry_dir)
+        return open_cached(entry_dir)
+
+    print("🐢 Training set cache miss, parsing", path)
+    X, y, features = load_training_data(path, chunksize=chunksize, velocity=velocity)
+    write_cache(entry_dir, X, y, {
+        "source": os.path.abspath(path),
+        "source_sha256": sha,
+        "preprocess_version": PREPROCESS_VERSION,
+        "features": features,
+        "velocity": velocity,
+        "rows": int(len(y)),
+    })
+    print("💾 Cached training set:", entry_dir)
+    return open_cached(entry_dir)
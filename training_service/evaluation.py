@@ -0,0 +1,154 @@
+import json
+
+import numpy as np
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+# -------------------------------------------------
+# THRESHOLD SWEEP
+# -------------------------------------------------
+# One sort of the held-out scores gives precision / recall / alert rate at
+# every distinct score: flagging "score >= t" flags exactly the rows up to
+# the last occurrence of t in descending order, so cumulative sums of the
+# labels are the true / false positive counts at every threshold at once.
+
+CALIBRATION_METHODS = ("none", "isotonic", "sigmoid")
+SIGMOID_KNOTS = 257      # tabulated Platt map, piecewise linear at serving time
+DEFAULT_REVIEW_RECALL = 0.95
+DEFAULT_BLOCK_PRECISION = 0.90
+
+
+def threshold_sweep(y_true, scores):
+    # Arrays over the distinct scores, highest threshold first
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind="mergesort")
+    sorted_scores = scores[order]
+    labels = np.asarray(y_true)[order].astype(np.int64)
+
+    last = np.append(np.flatnonzero(np.diff(sorted_scores)), len(sorted_scores) - 1)
+    tp = np.cumsum(labels)[last]
+    alerts = last + 1
+    fp = alerts - tp
+    positives = max(int(labels.sum()), 1)
+
+    precision = tp / alerts
+    recall = tp / positives
+    with np.errstate(invalid="ignore", divide="ignore"):
+        f1 = np.where(tp > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {
+        "threshold": sorted_scores[last],
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "alert_rate": alerts / len(scores),
+        "tp": tp,
+        "fp": fp,
+    }
+
+
+def choose_cutoffs(sweep, review_recall=DEFAULT_REVIEW_RECALL, block_precision=DEFAULT_BLOCK_PRECISION):
+    # fraud flag: best F1
+    # LOW | MEDIUM: highest threshold still catching review_recall of fraud
+    # MEDIUM | HIGH: lowest threshold whose alerts are block_precision fraud
+    fraud = int(np.argmax(sweep["f1"]))
+    reaches = np.flatnonzero(sweep["recall"] >= review_recall)
+    medium = reaches[0] if len(reaches) else len(sweep["threshold"]) - 1
+    precise = np.flatnonzero(sweep["precision"] >= block_precision)
+    high = precise[-1] if len(precise) else 0
+    return _cut(sweep, fraud), [_cut(sweep, medium), _cut(sweep, min(medium, high))]
+
+
+def _cut(sweep, i):
+    # Halfway between the i-th distinct score and the next lower one: same
+    # split of the evaluation rows, but rows sitting exactly on a score
+    # (frequent after isotonic calibration) are not flipped by rounding
+    thresholds = sweep["threshold"]
+    lower = thresholds[i + 1] if i + 1 < len(thresholds) else 0.0
+    return float((thresholds[i] + lower) / 2)
+
+
+def at_threshold(sweep, threshold):
+    # sweep row in effect for "score >= threshold"
+    i = int(np.searchsorted(-sweep["threshold"], -threshold, side="right")) - 1
+    if i < 0:
+        return {"threshold": threshold, "precision": None, "recall": 0.0, "alert_rate": 0.0}
+    return {
+        "threshold": threshold,
+        **{k: round(float(sweep[k][i]), 6) for k in ("precision", "recall", "f1", "alert_rate")},
+    }
+
+# -------------------------------------------------
+# CALIBRATION
+# -------------------------------------------------
+# Both methods end up as a non-decreasing piecewise-linear map (x, y),
+# which serving applies with one np.interp (scoring.DecisionPolicy).
+def fit_calibration(y_true, scores, method="isotonic"):
+    scores = np.asarray(scores, dtype=np.float64)
+    if method == "isotonic":
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(scores, y_true)
+        x, y = iso.X_thresholds_, iso.y_thresholds_
+    elif method == "sigmoid":
+        platt = LogisticRegression().fit(scores.reshape(-1, 1), y_true)
+        x = np.linspace(0.0, 1.0, SIGMOID_KNOTS)
+        y = platt.predict_proba(x.reshape(-1, 1))[:, 1]
+    else:
+        raise ValueError(f"Unknown calibration method '{method}', use one of {CALIBRATION_METHODS}")
+    return {"method": method, "x": np.asarray(x, dtype=np.float64).tolist(), "y": np.maximum.accumulate(y).tolist()}
+
+
+def brier(y_true, probabilities):
+    return float(np.mean((np.asarray(probabilities) - np.asarray(y_true)) ** 2))
+
+# -------------------------------------------------
+# DECISION STAGE (RUN BY train.py)
+# -------------------------------------------------
+def decision_stage(y_true, scores, calibration="none", review_recall=DEFAULT_REVIEW_RECALL,
+                   block_precision=DEFAULT_BLOCK_PRECISION, report_path=None):
+    # Returns the "decision" metadata entry: cutoffs on the served
+    # (calibrated) scale, the calibration map and the sweep at each cutoff.
+    # With calibration, half the split fits the map and the other half
+    # picks the cutoffs.
+    y_true = np.asarray(y_true)
+    scores = np.asarray(scores, dtype=np.float64)
+    decision = {"calibration": None}
+    if calibration != "none":
+        fit_scores, scores, fit_y, y_true = train_test_split(
+            scores, y_true, test_size=0.5, stratify=y_true, random_state=42
+        )
+        decision["calibration"] = fit_calibration(fit_y, fit_scores, calibration)
+        raw_brier = brier(y_true, scores)
+        scores = np.interp(scores, decision["calibration"]["x"], decision["calibration"]["y"])
+        decision["brier"] = {"raw": round(raw_brier, 6), "calibrated": round(brier(y_true, scores), 6)}
+
+    sweep = threshold_sweep(y_true, scores)
+    fraud_threshold, cutoffs = choose_cutoffs(sweep, review_recall, block_precision)
+    decision.update({
+        "fraud_threshold": fraud_threshold,
+        "risk_cutoffs": cutoffs,
+        "policy": {"review_recall": review_recall, "block_precision": block_precision},
+        "rows": int(len(scores)),
+        "at_cutoffs": {
+            "fraud": at_threshold(sweep, fraud_threshold),
+            "MEDIUM": at_threshold(sweep, cutoffs[0]),
+            "HIGH": at_threshold(sweep, cutoffs[1]),
+        },
+    })
+    print_decision(decision)
+
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump({k: v.tolist() for k, v in sweep.items()}, f)
+        print("✅ Threshold sweep written to", report_path)
+    return decision
+
+
+def print_decision(decision):
+    calibration = decision["calibration"]
+    if calibration is not None:
+        print(f"📏 Calibration: {calibration['method']} ({len(calibration['x'])} knots), "
+              f"Brier {decision['brier']['raw']:.5f} -> {decision['brier']['calibrated']:.5f}")
+    print(f"{'cutoff':<8} {'threshold':>10} {'precision':>10} {'recall':>8} {'alerts':>8}")
+    for name, row in decision["at_cutoffs"].items():
+        precision = "-" if row["precision"] is None else f"{row['precision']:.4f}"
+        print(f"{name:<8} {row['threshold']:>10.4f} {precision:>10} {row['recall']:>8.4f} {row['alert_rate']:>8.2%}")
@@ -1,29 +1,127 @@
+import numpy as np
 import pandas as pd
 
-def preprocess(df):
-    df = df.copy()
+from inference_api.feature_store import VELOCITY_FEATURES, VelocityStore
 
+TARGET_COL = "Class"
+N_FEATURES = 7
+SAMPLE_ROWS = 1000
+DEFAULT_CHUNKSIZE = 200_000
+# Bump whenever the features produced below change; keys the training set cache
+PREPROCESS_VERSION = 1
+
+# Velocity features need a card / account key, a time in seconds and the amount
+CARD_COL = "card_id"
+TIME_COL = "Time"
+AMOUNT_COL = "Amount"
+DERIVED_FEATURES = ("hour",) + VELOCITY_FEATURES
+
+
+def preprocess(df, velocity=False):
     # --------- TARGET COLUMN ----------
     # Your dataset uses 'Class' as fraud label
-    target_col = "Class"
+    target_col = TARGET_COL
+
+    # --------- SELECT NUMERIC FEATURES ----------
+    selected_features = select_features(df, velocity)
+
+    # Only the selected columns are copied, never the whole frame
+    out = df[[c for c in selected_features if c not in DERIVED_FEATURES] + [target_col]].copy()
 
     # --------- CREATE HOUR FEATURE ----------
-    if "Time" in df.columns:
-        df["hour"] = (df["Time"] // 3600) % 24
-    else:
-        df["hour"] = 0  # safe default
+    if "hour" in selected_features:
+        out.insert(selected_features.index("hour"), "hour", hour_feature(df))
 
-    # --------- SELECT NUMERIC FEATURES ----------
+    # --------- PER-CARD VELOCITY FEATURES ----------
+    if velocity:
+        # replayed in time order through the serving feature store
+        order = np.argsort(df[TIME_COL].to_numpy(), kind="stable")
+        block = np.empty((len(df), len(VELOCITY_FEATURES)), dtype=np.float32)
+        block[order] = velocity_features(df.iloc[order], VelocityStore())
+        for j, name in enumerate(VELOCITY_FEATURES):
+            out.insert(selected_features.index(name), name, block[:, j])
+
+    # Rename target
+    out.rename(columns={target_col: "is_fraud"}, inplace=True)
+
+    return out
+
+
+def select_features(df, velocity=False):
+    # First 7 numeric columns, with the derived "hour" column counted after
+    # the source columns (the order preprocess() has always used). With
+    # velocity, the velocity features take the last slots.
     numeric_cols = df.select_dtypes(include=["int64", "float64"]).columns.tolist()
-    numeric_cols = [c for c in numeric_cols if c != target_col]
+    numeric_cols = [c for c in numeric_cols if c != TARGET_COL] + ["hour"]
+
+    if velocity:
+        missing = [c for c in (CARD_COL, TIME_COL, AMOUNT_COL) if c not in df.columns]
+        if missing:
+            raise ValueError(f"Velocity features need columns {missing}")
+        numeric_cols = [c for c in numeric_cols if c != CARD_COL]
+        return numeric_cols[:N_FEATURES - len(VELOCITY_FEATURES)] + list(VELOCITY_FEATURES)
 
     # Keep first 7 numeric features (industry safe)
-    selected_features = numeric_cols[:7]
+    return numeric_cols[:N_FEATURES]
 
-    # Final dataframe
-    df = df[selected_features + [target_col]]
 
-    # Rename target
-    df.rename(columns={target_col: "is_fraud"}, inplace=True)
+def hour_feature(df):
+    if "Time" in df.columns:
+        return (df["Time"] // 3600) % 24
+    return 0  # safe default
+
+
+def velocity_features(df, store):
+    # Rows must arrive in time order; `store` carries card history across calls
+    return store.observe_many(
+        df[CARD_COL].tolist(), df[TIME_COL].to_numpy(), df[AMOUNT_COL].to_numpy()
+    )
+
+
+# -------------------------------------------------
+# CHUNKED LOADER (BOUNDED MEMORY)
+# -------------------------------------------------
+# Same features as preprocess(), but only the needed columns are parsed,
+# as float32 from the start, chunk by chunk. Peak memory is one chunk plus
+# the final float32 matrix instead of several copies of the full CSV.
+# Velocity features are computed chunk by chunk through one store, so the
+# file must be sorted by time.
+
+def load_training_data(path, chunksize=DEFAULT_CHUNKSIZE, velocity=False):
+    sample = pd.read_csv(path, nrows=SAMPLE_ROWS)
+    features = select_features(sample, velocity)
+
+    source_cols = [c for c in features if c not in DERIVED_FEATURES]
+    if "hour" in features and "Time" in sample.columns:
+        source_cols.append("Time")
+    if velocity:
+        source_cols += [CARD_COL, TIME_COL, AMOUNT_COL]
+    usecols = list(dict.fromkeys(source_cols + [TARGET_COL]))
+
+    dtypes = {c: np.float32 for c in usecols if c not in (TARGET_COL, CARD_COL)}
+    # Time can exceed float32's exact integer range; keep it wide until hour is derived
+    if "Time" in dtypes:
+        dtypes["Time"] = np.float64
+    # amounts feed the velocity means at full precision, as in serving
+    if velocity:
+        dtypes[AMOUNT_COL] = np.float64
+    dtypes[TARGET_COL] = np.int8
+
+    store = VelocityStore() if velocity else None
+    X_chunks, y_chunks = [], []
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+        X_chunk = np.empty((len(chunk), len(features)), dtype=np.float32)
+        block = velocity_features(chunk, store) if velocity else None
+        for j, name in enumerate(features):
+            if name == "hour":
+                X_chunk[:, j] = hour_feature(chunk)
+            elif name in VELOCITY_FEATURES:
+                X_chunk[:, j] = block[:, VELOCITY_FEATURES.index(name)]
+            else:
+                X_chunk[:, j] = chunk[name].to_numpy()
+        X_chunks.append(X_chunk)
+        y_chunks.append(chunk[TARGET_COL].to_numpy())
 
-    return df
\ No newline at end of file
+    X = np.concatenate(X_chunks) if X_chunks else np.empty((0, len(features)), dtype=np.float32)
+    y = np.concatenate(y_chunks) if y_chunks else np.empty(0, dtype=np.int8)
+    return X, y, features
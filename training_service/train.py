@@ -1,51 +1,261 @@
-print("🚀 train.py started")
-
-import pandas as pd
+import argparse
+import json
+import os
+import sys
+import time
 import joblib
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, roc_auc_score
-from feature_engineering import preprocess
 
-print("📥 Reading CSV...")
+# Make inference_api importable when run as `python training_service/train.py`
+# (the sibling modules below import it too)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feature_engineering import DEFAULT_CHUNKSIZE, load_training_data
+from data_cache import CACHE_DIR, load_training_set
+import tuning
+import compact_model
+import evaluation
+from inference_api.drift import build_profile
+from inference_api.feature_store import VELOCITY_FEATURES, VelocityStore
+from inference_api.forest import export_model
+from inference_api.registry import ModelRegistry
+from inference_api.scoring import DecisionPolicy
+
+DATA_PATH = "training_service/creditcard_2023.csv"
+MODEL_OUTPUT = "artifacts/fraud_model.pkl"
+
+DEFAULT_PARAMS = {
+    "n_estimators": 50,   # smaller for fast test
+    "max_depth": 8,
+    "class_weight": "balanced",
+    "random_state": 42,
+}
+
+
+def load_data(path, chunksize=DEFAULT_CHUNKSIZE, use_cache=True, cache_dir=CACHE_DIR, refresh=False,
+              velocity=False):
+    started = time.perf_counter()
+    if use_cache:
+        X, y, meta = load_training_set(path, chunksize, cache_dir, refresh, velocity)
+        features = meta["features"]
+    else:
+        print("📥 Reading CSV in chunks...")
+        X, y, features = load_training_data(path, chunksize=chunksize, velocity=velocity)
+    print(f"✅ Training matrix: {X.shape} {X.dtype} ({X.nbytes / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - started:.1f}s")
+    print("✅ Features:", features)
+    return X, y, features
+
+
+def split_data(X, y):
+    print("✂️ Splitting data...")
+    return train_test_split(
+        X, y,
+        test_size=0.2,
+        stratify=y,
+        random_state=42
+    )
+
+
+def train_model(X_train, y_train, **params):
+    print("🤖 Training model...")
+    model = RandomForestClassifier(**{**DEFAULT_PARAMS, **params})
+
+    model.fit(X_train, y_train)
+    print("✅ Model trained")
+    return model
+
+
+def evaluate(model, X_test, y_test):
+    print("📊 Evaluating model...")
+    preds = model.predict(X_test)
+    probs = model.predict_proba(X_test)[:, 1]
+
+    print(classification_report(y_test, preds))
+    roc_auc = roc_auc_score(y_test, probs)
+    print("ROC-AUC:", roc_auc)
+    return roc_auc, probs
+
+
+def decide(y_test, probs, args):
+    print("🎚️ Sweeping thresholds...")
+    return evaluation.decision_stage(y_test, probs, args.calibration, args.review_recall,
+                                     args.block_precision, args.sweep_report)
+
+
+def save_and_register(model, features, train_rows, roc_auc, output=MODEL_OUTPUT, extra_metadata=None,
+                      compact_eval=None, reference=None, decision=None):
+    # compact_eval: (X_test, y_test) to serve the smallest float32 / pruned
+    # export that makes the same decisions as the model on that split.
+    # reference: (held-out rows, their raw scores) that serving compares
+    # live inputs / scores against. decision: cutoffs + calibration from
+    # evaluation.decision_stage, applied by serving
+    print("💾 Saving model...")
+    joblib.dump(model, output)
+
+    print("🗺️ Exporting memory-mappable forest...")
+    print("✅ Exported", export_model(model, output))
+
+    if decision is not None:
+        extra_metadata = {**(extra_metadata or {}), "decision": decision}
+    policy = DecisionPolicy.from_metadata(extra_metadata)
+
+    if compact_eval is not None:
+        print("🗜️ Compacting forest...")
+        chosen = compact_model.compact_export(model, output, *compact_eval, policy=policy)
+        if chosen is not None:
+            extra_metadata = {**(extra_metadata or {}), "compact": {
+                k: chosen[k] for k in ("variant", "prune_tolerance", "size_bytes", "n_nodes", "max_abs_diff")
+            }}
+
+    if any(f in VELOCITY_FEATURES for f in features):
+        # serving must window card history the same way
+        extra_metadata = {**(extra_metadata or {}), "velocity": VelocityStore(max_keys=1).settings()}
+
+    if reference is not None:
+        print("📐 Building drift reference profile...")
+        X_reference, scores = reference
+        extra_metadata = {**(extra_metadata or {}), "reference_profile": build_profile(
+            X_reference, policy.calibrate(scores), features  # scores as served
+        )}
+
+    print("🗂️ Registering model version...")
+    version = ModelRegistry().register(
+        output,
+        metadata={
+            "n_estimators": model.n_estimators,
+            "max_depth": model.max_depth,
+            "features": list(features),
+            "train_rows": int(train_rows),
+            "roc_auc": float(roc_auc),
+            **(extra_metadata or {}),
+        },
+        activate=True
+    )
+    print("✅ Active model version:", version)
+    return version
+
+
+def run_search(X, y, features, args):
+    X_train, X_test, y_train, y_test = split_data(X, y)
+    del X, y
+
+    grid = tuning.parse_grid(args.grid) if args.grid else tuning.DEFAULT_GRID
+    candidates = tuning.candidates(grid, args.n_iter)
+    print(f"🔎 Searching {len(candidates)} candidates on {args.workers} workers...")
+    results = tuning.search(X_train, y_train, X_test, y_test, candidates,
+                            base_params=DEFAULT_PARAMS, workers=args.workers,
+                            scratch_dir=args.cache_dir)
+    tuning.print_results(results)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2)
+        print("✅ Report written to", args.report)
+
+    if not args.register_best:
+        return results
+    best = results[0]
+    print("🏆 Refitting best candidate:", best["params"])
+    model = train_model(X_train, y_train, **best["params"], n_jobs=-1)
+    model.set_params(n_jobs=None)  # don't carry a thread pool into sklearn-engine serving
+    roc_auc, probs = evaluate(model, X_test, y_test)
+    save_and_register(model, features, len(X_train), roc_auc, extra_metadata={
+        "params": best["params"],
+        "search_candidates": len(results),
+    }, compact_eval=(X_test, y_test) if args.compact else None, reference=(X_test, probs),
+        decision=decide(y_test, probs, args))
+    return results
+
+
+def run_incremental(X, y, features, args):
+    registry = ModelRegistry()
+    base_version = args.base_version or registry.active_version()
+    print("📦 Warm-starting from model version", base_version)
+    model = joblib.load(registry.model_path(base_version))
+    if model.n_features_in_ != X.shape[1]:
+        raise ValueError(f"Model {base_version} expects {model.n_features_in_} features, "
+                         f"data has {X.shape[1]}")
+
+    if args.tail_rows:
+        X, y = X[-args.tail_rows:], y[-args.tail_rows:]
+    X_train, X_test, y_train, y_test = split_data(X, y)
+    del X, y
+
+    base_auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+    print(f"📊 Base model ROC-AUC on new data: {base_auc:.4f}")
+
+    base_trees = model.n_estimators
+    started = time.perf_counter()
+    model = tuning.add_trees(model, X_train, y_train, args.add_trees)
+    print(f"✅ Added {args.add_trees} trees ({base_trees} -> {model.n_estimators}) "
+          f"in {time.perf_counter() - started:.1f}s")
 
-df = pd.read_csv("training_service/creditcard_2023.csv")
-print("✅ CSV loaded. Shape:", df.shape)
+    roc_auc, probs = evaluate(model, X_test, y_test)
+    return save_and_register(model, features, len(X_train), roc_auc, extra_metadata={
+        "base_version": base_version,
+        "trees_added": args.add_trees,
+        "base_roc_auc": float(base_auc),
+    }, compact_eval=(X_test, y_test) if args.compact else None, reference=(X_test, probs),
+        decision=decide(y_test, probs, args))
 
-print("🧹 Preprocessing data...")
-df = preprocess(df)
-print("✅ After preprocessing:", df.shape)
 
-X = df.drop("is_fraud", axis=1)
-y = df["is_fraud"]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the fraud model and register it")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="CSV rows parsed per chunk")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="always parse the CSV")
+    parser.add_argument("--refresh-cache", action="store_true", help="re-parse and overwrite the cache")
+    parser.add_argument("--velocity", action="store_true",
+                        help="add per-card velocity features (needs card_id, Time, Amount; rows in time order)")
+    parser.add_argument("--mode", choices=("fit", "search", "incremental"), default="fit",
+                        help="single fit, parallel hyperparameter search, or warm-start on new data")
+    parser.add_argument("--grid", help="search space as JSON or a path to a JSON file "
+                                       "(default: tuning.DEFAULT_GRID)")
+    parser.add_argument("--n-iter", type=int,
+                        help="random search: sample this many candidates instead of the full grid")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--report", help="write per-candidate results to this JSON file")
+    parser.add_argument("--register-best", action="store_true",
+                        help="refit the best candidate on all cores and register it")
+    parser.add_argument("--base-version", help="incremental: version to extend (default: active)")
+    parser.add_argument("--add-trees", type=int, default=25, help="incremental: trees to add")
+    parser.add_argument("--tail-rows", type=int,
+                        help="incremental: only use the last N rows of --data")
+    parser.add_argument("--compact", action="store_true",
+                        help="serve the smallest float32 / pruned export with identical decisions "
+                             "(see compact_model.py)")
+    parser.add_argument("--calibration", choices=evaluation.CALIBRATION_METHODS, default="none",
+                        help="fit a probability calibration map on half the test split")
+    parser.add_argument("--review-recall", type=float, default=evaluation.DEFAULT_REVIEW_RECALL,
+                        help="MEDIUM cutoff: share of fraud that must reach MEDIUM or HIGH")
+    parser.add_argument("--block-precision", type=float, default=evaluation.DEFAULT_BLOCK_PRECISION,
+                        help="HIGH cutoff: share of HIGH alerts that must be fraud")
+    parser.add_argument("--sweep-report", help="write the full threshold sweep to this JSON file")
+    args = parser.parse_args(argv)
 
-print("✂️ Splitting data...")
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y,
-    test_size=0.2,
-    stratify=y,
-    random_state=42
-)
+    print("🚀 train.py started")
+    X, y, features = load_data(args.data, args.chunksize, not args.no_cache,
+                               args.cache_dir, args.refresh_cache, args.velocity)
 
-print("🤖 Training model...")
-model = RandomForestClassifier(
-    n_estimators=50,   # smaller for fast test
-    max_depth=8,
-    class_weight="balanced",
-    random_state=42
-)
+    if args.mode == "search":
+        return run_search(X, y, features, args)
+    if args.mode == "incremental":
+        return run_incremental(X, y, features, args)
 
-model.fit(X_train, y_train)
-print("✅ Model trained")
+    X_train, X_test, y_train, y_test = split_data(X, y)
+    del X, y  # the split holds its own copies
 
-print("📊 Evaluating model...")
-preds = model.predict(X_test)
-probs = model.predict_proba(X_test)[:, 1]
+    model = train_model(X_train, y_train)
+    roc_auc, probs = evaluate(model, X_test, y_test)
+    save_and_register(model, features, len(X_train), roc_auc,
+                      compact_eval=(X_test, y_test) if args.compact else None, reference=(X_test, probs),
+                      decision=decide(y_test, probs, args))
 
-print(classification_report(y_test, preds))
-print("ROC-AUC:", roc_auc_score(y_test, probs))
+    print("🎉 DONE. Model saved in artifacts/")
 
-print("💾 Saving model...")
-joblib.dump(model, "artifacts/fraud_model.pkl")
 
-print("🎉 DONE. Model saved in artifacts/")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+# -------------------------------------------------
+# PARALLEL HYPERPARAMETER SEARCH
+# -------------------------------------------------
+# The train / test split is written once as .npy files and every worker
+# memory-maps them read-only, so N workers share one page-cache copy of
+# the training matrix instead of each receiving a pickled copy. Each
+# candidate fits single-threaded; the pool provides the parallelism.
+
+DEFAULT_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [6, 8, 12],
+    "min_samples_leaf": [1, 5],
+    "max_features": ["sqrt", 0.5],
+}
+SPLIT_FILES = ("X_train", "y_train", "X_test", "y_test")
+
+_split = None  # per worker process
+
+
+def parse_grid(value):
+    # JSON string or path to a JSON file: {"param": [values, ...], ...}
+    if os.path.isfile(value):
+        with open(value) as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def candidates(grid, n_iter=None, seed=42):
+    if n_iter:
+        return list(ParameterSampler(grid, n_iter=n_iter, random_state=seed))
+    return list(ParameterGrid(grid))
+
+
+def _init_worker(split_dir):
+    global _split
+    _split = {
+        name: np.load(os.path.join(split_dir, name + ".npy"), mmap_mode="r")
+        for name in SPLIT_FILES
+    }
+
+
+def _evaluate(params, base_params):
+    model = RandomForestClassifier(**{**base_params, **params, "n_jobs": 1})
+    started = time.perf_counter()
+    model.fit(_split["X_train"], _split["y_train"])
+    fit_seconds = time.perf_counter() - started
+    probs = model.predict_proba(_split["X_test"])[:, 1]
+    return {
+        "params": params,
+        "roc_auc": float(roc_auc_score(_split["y_test"], probs)),
+        "fit_seconds": round(fit_seconds, 3),
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "n_nodes": int(sum(t.tree_.node_count for t in model.estimators_)),
+        "worker_pid": os.getpid(),
+    }
+
+
+def search(X_train, y_train, X_test, y_test, candidates, base_params, workers, scratch_dir=None):
+    # Returns one result per candidate, best ROC-AUC first
+    if scratch_dir:
+        os.makedirs(scratch_dir, exist_ok=True)
+    split_dir = tempfile.mkdtemp(prefix=".search-", dir=scratch_dir)
+    try:
+        for name, arr in zip(SPLIT_FILES, (X_train, y_train, X_test, y_test)):
+            np.save(os.path.join(split_dir, name + ".npy"), np.ascontiguousarray(arr))
+
+        results = []
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(split_dir,)) as pool:
+            futures = [pool.submit(_evaluate, params, base_params) for params in candidates]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"  ✔️ {len(results)}/{len(futures)} ROC-AUC {result['roc_auc']:.4f} "
+                      f"in {result['wall_seconds']:.1f}s {result['params']}")
+    finally:
+        shutil.rmtree(split_dir, ignore_errors=True)
+
+    return sorted(results, key=lambda r: (-r["roc_auc"], r["wall_seconds"]))
+
+
+def print_results(results):
+    print(f"{'rank':>4}  {'roc_auc':>8}  {'wall_s':>7}  {'nodes':>7}  params")
+    for rank, r in enumerate(results, start=1):
+        print(f"{rank:>4}  {r['roc_auc']:>8.4f}  {r['wall_seconds']:>7.1f}  {r['n_nodes']:>7}  {r['params']}")
+
+
+# -------------------------------------------------
+# WARM-START INCREMENTAL TRAINING
+# -------------------------------------------------
+# Keeps every existing tree and grows `n_trees` more on the new data only.
+
+def add_trees(model, X_new, y_new, n_trees, n_jobs=-1):
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + n_trees, n_jobs=n_jobs)
+    model.fit(X_new, y_new)
+    model.set_params(warm_start=False, n_jobs=None)
+    return model